@@ -1,17 +1,19 @@
 from __future__ import annotations
 
+import keyword
 import os
+import re
 import sys
 from pathlib import Path
-from typing import cast
+from typing import IO, TYPE_CHECKING, cast
 
 import asyncclick as click
 from asyncclick import Context, UsageError
 
-from aerich import Command
-from aerich.enums import Color
-from aerich.exceptions import DowngradeError
-from aerich.utils import add_src_path, get_tortoise_config
+from aerich.enums import Color, HookEvent, HookStage, Resource
+from aerich.exceptions import DowngradeError, NotSupportError
+from aerich.hooks import Event
+from aerich.utils import add_src_path, get_tortoise_config, init_asyncio_patch
 from aerich.version import __version__
 
 if sys.version_info >= (3, 11):
@@ -22,6 +24,29 @@ else:
     except ImportError:
         import tomlkit as tomllib  # type: ignore
 
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from aerich import Command, TargetResult
+    from aerich.executor import RetryPolicy
+    from aerich.inspectdb import InspectedModel
+
+# What the subcommands need to be initialized, the ones that only read the migration files
+# run without connecting to the database, and only `migrate` loads the models snapshot
+COMMAND_RESOURCES: dict[str | None, Resource] = {
+    "history": Resource.filesystem,
+    "heads": Resource.version_index,
+    "upgrade": Resource.version_index,
+    "downgrade": Resource.version_index,
+    "sql": Resource.version_index,
+    "stats": Resource.version_index,
+    "registry": Resource.version_index,
+    "inspectdb": Resource.version_index,
+    "adopt": Resource.version_index,
+    "drift": Resource.version_index,
+    "migrate": Resource.snapshot,
+}
+
 CONFIG_DEFAULT_VALUES = {
     "src_folder": ".",
 }
@@ -37,8 +62,13 @@ CONFIG_DEFAULT_VALUES = {
     help="Config file.",
 )
 @click.option("--app", required=False, help="Tortoise-ORM app name.")
+@click.option(
+    "--registry-target",
+    required=False,
+    help="Name of the database in the version registry, default is the connection name of the app.",
+)
 @click.pass_context
-async def cli(ctx: Context, config, app) -> None:
+async def cli(ctx: Context, config, app, registry_target) -> None:
     ctx.ensure_object(dict)
     ctx.obj["config_file"] = config
 
@@ -68,14 +98,23 @@ async def cli(ctx: Context, config, app) -> None:
             except KeyError:
                 raise UsageError('Config must define "apps" section')
             app = list(apps_config.keys())[0]
-        command = Command(tortoise_config=tortoise_config, app=app, location=location)
+        # Imported here to keep `--help` away from the cost of importing tortoise
+        from aerich import Command
+
+        command = Command(
+            tortoise_config=tortoise_config,
+            app=app,
+            location=location,
+            registry=tool.get("registry"),
+            registry_target=registry_target or tool.get("registry_target"),
+        )
         ctx.obj["command"] = command
         if invoked_subcommand != "init-db":
-            if not Path(location, app).exists():
+            if invoked_subcommand != "adopt" and not Path(location, app).exists():
                 raise UsageError(
                     "You need to run `aerich init-db` first to initialize the database.", ctx=ctx
                 )
-            await command.init()
+            await command.init(COMMAND_RESOURCES.get(invoked_subcommand, Resource.snapshot))
 
 
 @cli.command(help="Generate a migration file for the current state of the models.")
@@ -104,10 +143,271 @@ async def migrate(ctx: Context, name, empty) -> None:
     is_flag=True,
     help="Mark migrations as run without actually running them.",
 )
+@click.option(
+    "--stats",
+    default=False,
+    is_flag=True,
+    help="Execute statements one by one and record their timing, see `aerich stats`.",
+)
+@click.option(
+    "--per-statement",
+    default=False,
+    is_flag=True,
+    help="Split migration files and execute the statements one by one.",
+)
+@click.option(
+    "--statement-timeout",
+    type=float,
+    help="Seconds that each statement is allowed to run, implies --per-statement. "
+    "The statement that exceeds it is stopped on the server.",
+)
+@click.option(
+    "--progress",
+    default=False,
+    is_flag=True,
+    help="Show each statement when it is done, implies --per-statement.",
+)
+@click.option(
+    "--lock-timeout",
+    type=float,
+    help="Seconds that each statement is allowed to wait for locks, implies --per-statement.",
+)
+@click.option(
+    "--retries",
+    default=0,
+    type=int,
+    show_default=True,
+    help="Times to retry a statement that failed to get locks, with jittered exponential backoff.",
+)
+@click.option(
+    "--retry-budget",
+    type=float,
+    help="Seconds that all the retries are allowed to wait in total.",
+)
+@click.option(
+    "--checkpoint",
+    default=False,
+    is_flag=True,
+    help="Record the last finished statement of each migration run with --in-transaction False, "
+    "so that a failed one can be resumed.",
+)
+@click.option(
+    "--resume/--no-resume",
+    default=True,
+    show_default=True,
+    help="Go on from the statement after the last finished one when a migration failed with --checkpoint.",
+)
+@click.option(
+    "--atomic-batch",
+    default=False,
+    is_flag=True,
+    help="Apply all the pending migrations in one transaction, only for PostgreSQL and SQLite.",
+)
+@click.option(
+    "--relaxed-durability",
+    default=False,
+    is_flag=True,
+    help="Do not wait for the disk flush on commit of --atomic-batch, for ephemeral databases.",
+)
+@click.option(
+    "--all-apps",
+    default=False,
+    is_flag=True,
+    help="Upgrade all the apps, the ones on different connections run concurrently.",
+)
+@click.option(
+    "--targets",
+    type=click.Path(exists=True, dir_okay=False),
+    help="TOML file of the databases to upgrade with the migrations of the app, e.g. shards.",
+)
+@click.option(
+    "--concurrency",
+    default=8,
+    type=int,
+    show_default=True,
+    help="Max number of the databases of --targets (or schemas) to upgrade at the same time.",
+)
+@click.option(
+    "--schema",
+    "schemas",
+    multiple=True,
+    help="PostgreSQL schema to upgrade by switching search_path, can be used multiple times.",
+)
+@click.option(
+    "--schema-pattern",
+    help="Upgrade the PostgreSQL schemas that match the LIKE pattern, e.g.: tenant_%.",
+)
 @click.pass_context
-async def upgrade(ctx: Context, in_transaction: bool, fake: bool) -> None:
+async def upgrade(
+    ctx: Context,
+    in_transaction: bool,
+    fake: bool,
+    stats: bool,
+    per_statement: bool,
+    statement_timeout: float | None,
+    progress: bool,
+    lock_timeout: float | None,
+    retries: int,
+    retry_budget: float | None,
+    checkpoint: bool,
+    resume: bool,
+    atomic_batch: bool,
+    relaxed_durability: bool,
+    all_apps: bool,
+    targets: str | None,
+    concurrency: int,
+    schemas: tuple[str, ...],
+    schema_pattern: str | None,
+) -> None:
+    _check_upgrade_options(ctx.params)
     command = ctx.obj["command"]
-    migrated = await command.upgrade(run_in_transaction=in_transaction, fake=fake)
+    if progress:
+        command.hooks.add(_show_statement_progress, HookEvent.statement)
+    from aerich.executor import RetryPolicy
+
+    retry: RetryPolicy | None = None
+    if retries > 0:
+        retry = RetryPolicy(retries=retries, budget=retry_budget)
+        command.hooks.add(_show_statement_retry, HookEvent.statement_retry)
+    options = dict(
+        run_in_transaction=in_transaction,
+        fake=fake,
+        stats=stats,
+        per_statement=per_statement or progress,
+        statement_timeout=statement_timeout,
+        lock_timeout=lock_timeout,
+        retry=retry,
+        checkpoint=checkpoint,
+        resume=resume,
+        atomic_batch=atomic_batch,
+        relaxed_durability=relaxed_durability,
+    )
+    if targets:
+        await _upgrade_targets(command, Path(targets), concurrency, options)
+        return
+    if schemas or schema_pattern:
+        names = list(schemas)
+        if schema_pattern:
+            names += [s for s in await command.get_schemas(schema_pattern) if s not in names]
+        results = command.upgrade_schemas(names, concurrency, **options)
+        if failed := await _show_target_results(results):
+            click.secho(
+                f"Upgraded {len(names) - len(failed)} of {len(names)} schemas, failed: "
+                + ", ".join(failed),
+                fg=Color.red,
+            )
+            raise click.exceptions.Exit(1)
+        click.secho(f"Upgraded {len(names)} schemas", fg=Color.green)
+        return
+    if not all_apps:
+        migrated = await command.upgrade(**options)
+        _show_migrated(migrated, fake)
+        return
+    results = await command.upgrade_all_apps(**options)
+    for result in results:
+        click.secho(f"[{result.app}]", bold=True)
+        if result.error is None:
+            _show_migrated(result.migrated, fake)
+        else:
+            click.secho(f"Failed upgrading: {result.error}", fg=Color.red)
+    if failed := [r.app for r in results if r.error is not None]:
+        click.secho(
+            f"Upgraded {len(results) - len(failed)} of {len(results)} apps, failed: "
+            + ", ".join(failed),
+            fg=Color.red,
+        )
+        raise click.exceptions.Exit(1)
+    click.secho(f"Upgraded {len(results)} apps", fg=Color.green)
+
+
+def _check_upgrade_options(params: dict) -> None:
+    """
+    Raise UsageError for the options of `upgrade` that conflict, or that would be ignored
+    :param params: value of each option of `upgrade` by the name of its parameter
+    """
+    scopes = [
+        option
+        for option, used in (
+            ("--targets", params["targets"]),
+            ("--all-apps", params["all_apps"]),
+            ("--schema/--schema-pattern", params["schemas"] or params["schema_pattern"]),
+        )
+        if used
+    ]
+    if len(scopes) > 1:
+        raise UsageError(f"{' and '.join(scopes)} can not be used together")
+    executing = [
+        option
+        for option, used in (
+            ("--stats", params["stats"]),
+            ("--per-statement", params["per_statement"]),
+            ("--statement-timeout", params["statement_timeout"] is not None),
+            ("--progress", params["progress"]),
+            ("--lock-timeout", params["lock_timeout"] is not None),
+            ("--retries", params["retries"] > 0),
+            ("--checkpoint", params["checkpoint"]),
+        )
+        if used
+    ]
+    if params["fake"] and executing:
+        raise UsageError(
+            f"--fake does not execute the migrations, it can not be used with {', '.join(executing)}"
+        )
+    if not params["in_transaction"]:
+        if params["atomic_batch"]:
+            raise UsageError("--atomic-batch always runs in a transaction")
+        if params["schemas"] or params["schema_pattern"]:
+            raise UsageError("The schemas are always upgraded in transactions")
+    elif params["checkpoint"]:
+        raise UsageError("--checkpoint only works with --in-transaction False")
+    if not params["resume"] and not params["checkpoint"]:
+        raise UsageError("--no-resume only works with --checkpoint")
+    if params["relaxed_durability"] and not params["atomic_batch"]:
+        raise UsageError("--relaxed-durability only works with --atomic-batch")
+    if params["retry_budget"] is not None and params["retries"] <= 0:
+        raise UsageError("--retry-budget only works with --retries")
+
+
+async def _upgrade_targets(
+    command: Command, targets_file: Path, concurrency: int, options: dict
+) -> None:
+    doc: dict = tomllib.loads(targets_file.read_text("utf-8"))
+    try:
+        targets = {name: target["db_url"] for name, target in doc["targets"].items()}
+    except (KeyError, TypeError, AttributeError) as e:
+        raise UsageError(
+            f"Each target in {targets_file} should be like: [targets.<name>] db_url = ..."
+        ) from e
+    results = command.upgrade_targets(targets, concurrency, **options)
+    if not (failed := await _show_target_results(results)):
+        click.secho(f"Upgraded {len(targets)} targets", fg=Color.green)
+        return
+    failed_file = targets_file.with_suffix(".failed.toml")
+    _write_toml(failed_file, {"targets": {name: doc["targets"][name] for name in failed}})
+    click.secho(
+        f"Upgraded {len(targets) - len(failed)} of {len(targets)} targets, "
+        f"failed ones are saved to {failed_file} to retry with `--targets {failed_file}`",
+        fg=Color.red,
+    )
+    raise click.exceptions.Exit(1)
+
+
+async def _show_target_results(results: AsyncIterator[TargetResult]) -> list[str]:
+    """Show each result when it is done, and return the names of the failed ones"""
+    failed: list[str] = []
+    async for result in results:
+        if result.error is not None:
+            failed.append(result.target)
+            click.secho(f"[{result.target}] Failed upgrading: {result.error}", fg=Color.red)
+        elif not result.migrated:
+            click.secho(f"[{result.target}] No upgrade items found", fg=Color.yellow)
+        else:
+            versions = ", ".join(result.migrated)
+            click.secho(f"[{result.target}] Success upgrading to {versions}", fg=Color.green)
+    return failed
+
+
+def _show_migrated(migrated: list[str], fake: bool) -> None:
     if not migrated:
         click.secho("No upgrade items found", fg=Color.yellow)
     else:
@@ -120,6 +420,27 @@ async def upgrade(ctx: Context, in_transaction: bool, fake: bool) -> None:
                 click.secho(f"Success upgrading to {version_file}", fg=Color.green)
 
 
+def _show_statement_progress(event: Event) -> None:
+    if event.stage != HookStage.after or event.error is not None:
+        return
+    data = event.data
+    sql = " ".join(data["sql"].split())
+    if len(sql) > 80:
+        sql = sql[:77] + "..."
+    click.echo(
+        f"{data['version']} [{data['index'] + 1}/{data['total']}] {event.duration:.3f}s  {sql}"
+    )
+
+
+def _show_statement_retry(event: Event) -> None:
+    data = event.data
+    click.secho(
+        f"{data['version']} [{data['index'] + 1}/{data['total']}] {event.error}, "
+        f"retry({data['attempt']}) in {data['delay']:.2f}s",
+        fg=Color.yellow,
+    )
+
+
 @cli.command(help="Downgrade to specified version.")
 @click.option(
     "-v",
@@ -143,14 +464,34 @@ async def upgrade(ctx: Context, in_transaction: bool, fake: bool) -> None:
     is_flag=True,
     help="Mark migrations as run without actually running them.",
 )
-@click.pass_context
-@click.confirmation_option(
-    prompt="Downgrade is dangerous: you might lose your data! Are you sure?",
+@click.option(
+    "--batch",
+    default=False,
+    is_flag=True,
+    help="Downgrade all the versions in one transaction and delete their records at once.",
+)
+@click.option(
+    "--dry-run",
+    default=False,
+    is_flag=True,
+    help="Print the combined downgrade SQL without executing it.",
 )
-async def downgrade(ctx: Context, version: int, delete: bool, fake: bool) -> None:
+@click.option("--yes", default=False, is_flag=True, help="Confirm the action without prompting.")
+@click.pass_context
+async def downgrade(
+    ctx: Context, version: int, delete: bool, fake: bool, batch: bool, dry_run: bool, yes: bool
+) -> None:
     command = ctx.obj["command"]
+    if dry_run:
+        try:
+            sql = await command.downgrade_sql(version)
+        except DowngradeError as e:
+            return click.secho(str(e), fg=Color.yellow)
+        return click.echo(sql, nl=False)
+    if not yes:
+        click.confirm("Downgrade is dangerous: you might lose your data! Are you sure?", abort=True)
     try:
-        files = await command.downgrade(version, delete, fake=fake)
+        files = await command.downgrade(version, delete, fake=fake, batch=batch)
     except DowngradeError as e:
         return click.secho(str(e), fg=Color.yellow)
     for file in files:
@@ -160,6 +501,67 @@ async def downgrade(ctx: Context, version: int, delete: bool, fake: bool) -> Non
             click.secho(f"Success downgrading to {file}", fg=Color.green)
 
 
+@cli.command(help="Compile the migrations into one SQL script without executing them.")
+@click.option(
+    "--from",
+    "from_version",
+    type=int,
+    help="Number of the first version to compile, the first unapplied one by default.",
+)
+@click.option(
+    "--to",
+    "to_version",
+    type=int,
+    help="Number of the last version to compile, the latest one by default.",
+)
+@click.option(
+    "-o",
+    "--output",
+    default="-",
+    type=click.File("w", encoding="utf-8"),
+    show_default=True,
+    help="File to write the SQL to, `-` for stdout.",
+)
+@click.pass_context
+async def sql(
+    ctx: Context, from_version: int | None, to_version: int | None, output: IO[str]
+) -> None:
+    command = ctx.obj["command"]
+    count = 0
+    async for chunk in command.upgrade_sql(from_version, to_version):
+        output.write(chunk)
+        count += 1
+    if not count:
+        click.secho("No migrations to compile.", fg=Color.yellow, err=True)
+
+
+@cli.command(help="Show the slowest migrations and statements recorded by `upgrade --stats`.")
+@click.option(
+    "-l",
+    "--limit",
+    default=10,
+    type=int,
+    show_default=True,
+    help="Max number of migrations and statements to show.",
+)
+@click.pass_context
+async def stats(ctx: Context, limit: int) -> None:
+    command = ctx.obj["command"]
+    migrations, statements = await command.stats(limit)
+    if not migrations:
+        return click.secho("No stats recorded yet.", fg=Color.yellow)
+    click.secho("Slowest migrations:", fg=Color.green)
+    for item in migrations:
+        click.echo(
+            f"{item['total_duration']:>10.3f}s  {item['version']} ({item['statements']} statements)"
+        )
+    click.secho("Slowest statements:", fg=Color.green)
+    for obj in statements:
+        rows = "" if obj.rows is None else f", {obj.rows} rows"
+        click.echo(f"{obj.duration:>10.3f}s  {obj.version}#{obj.statement_index}{rows}")
+        click.echo(f"{'':>13}{' '.join(obj.statement.split())}")
+
+
 @cli.command(help="Show currently available heads (unapplied migrations).")
 @click.pass_context
 async def heads(ctx: Context) -> None:
@@ -171,6 +573,32 @@ async def heads(ctx: Context) -> None:
         click.secho(version, fg=Color.green)
 
 
+@cli.command(help="Show the last version of each database in the version registry.")
+@click.option(
+    "--behind",
+    default=False,
+    is_flag=True,
+    help="Only show the databases that are not at the latest migration.",
+)
+@click.pass_context
+async def registry(ctx: Context, behind: bool) -> None:
+    command = ctx.obj["command"]
+    try:
+        versions = await command.get_registry_versions()
+    except NotSupportError:
+        raise UsageError(
+            "Set `registry` in the [tool.aerich] section of the config first."
+        ) from None
+    history = await command.history()
+    latest = history[-1] if history else None
+    for target, version in versions.items():
+        if version == latest:
+            if not behind:
+                click.secho(f"{target}: {version}", fg=Color.green)
+        else:
+            click.secho(f"{target}: {version} (latest: {latest})", fg=Color.yellow)
+
+
 @cli.command(help="List all migrations.")
 @click.pass_context
 async def history(ctx: Context) -> None:
@@ -182,17 +610,21 @@ async def history(ctx: Context) -> None:
         click.secho(version, fg=Color.green)
 
 
-def _write_config(config_path, doc, table) -> None:
+def _write_toml(path: Path, doc: dict) -> None:
     try:
         import tomli_w as tomlkit
     except ImportError:
         import tomlkit  # type: ignore
 
+    path.write_text(tomlkit.dumps(doc))
+
+
+def _write_config(config_path, doc, table) -> None:
     try:
         doc["tool"]["aerich"] = table
     except KeyError:
         doc["tool"] = {"aerich": table}
-    config_path.write_text(tomlkit.dumps(doc))
+    _write_toml(config_path, doc)
 
 
 @cli.command(help="Initialize aerich config and create migrations folder.")
@@ -270,6 +702,68 @@ async def init_db(ctx: Context, safe: bool) -> None:
         )
 
 
+@cli.command(
+    help="Adopt an existing database: record the models as its first version without "
+    "executing DDL, after checking that the database matches them."
+)
+@click.option(
+    "--force",
+    default=False,
+    is_flag=True,
+    help="Record the version even if the database does not match the models.",
+)
+@click.pass_context
+async def adopt(ctx: Context, force: bool) -> None:
+    command = ctx.obj["command"]
+    dirname = Path(command.location, command.app)
+    try:
+        result = await command.adopt(force)
+    except FileExistsError:
+        return click.secho(
+            f"App {command.app} is already initialized. Delete {dirname} and try again.",
+            fg=Color.yellow,
+        )
+    except NotSupportError as e:
+        click.secho(str(e), fg=Color.red)
+        raise click.exceptions.Exit(1) from None
+    for mismatch in result.mismatches:
+        click.secho(str(mismatch), fg=Color.yellow)
+    if result.version is None:
+        click.secho(
+            f"Found {len(result.mismatches)} mismatches between the models and the database, "
+            "fix them or adopt with --force",
+            fg=Color.red,
+        )
+        raise click.exceptions.Exit(1)
+    click.secho(f"Success adopting the database as version {result.version}", fg=Color.green)
+
+
+@cli.command(help="Compare the database with the snapshot of the last applied version.")
+@click.option(
+    "--cache",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File to cache the checksums of the tables, so that only the changed tables are "
+    "compared next time, default is `.drift_cache.json` in the migrations location.",
+)
+@click.option("--no-cache", default=False, is_flag=True, help="Compare all the tables.")
+@click.pass_context
+async def drift(ctx: Context, cache: Path | None, no_cache: bool) -> None:
+    command = ctx.obj["command"]
+    if not no_cache and cache is None:
+        cache = Path(command.location, ".drift_cache.json")
+    result = await command.drift(None if no_cache else cache)
+    if result.version is None:
+        return click.secho("No migrations have been applied.", fg=Color.yellow)
+    for mismatch in result.mismatches:
+        click.secho(str(mismatch), fg=Color.yellow)
+    if result.mismatches:
+        click.secho(
+            f"Found {len(result.mismatches)} differences from {result.version}", fg=Color.red
+        )
+        raise click.exceptions.Exit(1)
+    click.secho(f"No drift from {result.version}", fg=Color.green)
+
+
 @cli.command(help="Prints the current database tables to stdout as Tortoise-ORM models.")
 @click.option(
     "-t",
@@ -278,14 +772,110 @@ async def init_db(ctx: Context, safe: bool) -> None:
     multiple=True,
     required=False,
 )
+@click.option(
+    "--concurrency",
+    type=int,
+    help="Max number of tables to inspect at the same time, default to the size of the pool.",
+)
+@click.option(
+    "-o",
+    "--output-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Write the models into modules of this directory instead of stdout.",
+)
+@click.option(
+    "--group-by",
+    type=click.Choice(["table", "prefix"]),
+    default="table",
+    show_default=True,
+    help="Write one module per table, or per prefix of table names (the part before `_`).",
+)
 @click.pass_context
-async def inspectdb(ctx: Context, table: list[str]) -> None:
+async def inspectdb(
+    ctx: Context,
+    table: list[str],
+    concurrency: int | None,
+    output_dir: Path | None,
+    group_by: str,
+) -> None:
+    from aerich.inspectdb import Inspect
+
     command = ctx.obj["command"]
-    ret = await command.inspectdb(table)
-    click.secho(ret)
+    models = command.iter_inspectdb(table, concurrency)
+    if output_dir is None:
+        # Print each model as soon as it is inspected, the imports that a model needs are
+        # printed before it if they are not printed yet
+        click.echo(Inspect.header, nl=False)
+        printed: set[str] = set()
+        async for model in models:
+            if imports := [line for line in model.imports if line not in printed]:
+                printed.update(imports)
+                click.echo("".join(f"{line}\n" for line in imports), nl=False)
+            click.echo("\n\n" + model.source)
+        return
+    modules = await write_modules(models, output_dir, group_by)
+    click.secho(f"Success writing {len(modules)} modules to {output_dir}", fg=Color.green)
+
+
+async def write_modules(
+    models: AsyncIterator[InspectedModel], output_dir: Path, group_by: str = "table"
+) -> list[str]:
+    """
+    Write each model into its module once it is inspected, and a `__init__.py` that imports
+    all the modules, so that the directory can be used as the models of an app
+    :param models: models yielded by `Command.iter_inspectdb`
+    :param output_dir: directory to write the modules to
+    :param group_by: "table" or "prefix", see `get_module_name`
+    :return: names of the written modules
+    """
+    from aerich.inspectdb import Inspect
+
+    def get_header(imports: set[str]) -> str:
+        return Inspect.header + "".join(f"{line}\n" for line in sorted(imports))
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # {module: import statements in its header}
+    modules: dict[str, set[str]] = {}
+    async for model in models:
+        module = get_module_name(model.table, group_by)
+        path = output_dir / f"{module}.py"
+        if module not in modules:
+            modules[module] = set(model.imports)
+            header = get_header(modules[module])
+            path.write_text(header + "\n\n" + model.source + "\n", encoding="utf-8")
+            continue
+        if not set(model.imports) <= (module_imports := modules[module]):
+            # Only the header is rewritten, the models written before are kept
+            old_header = get_header(module_imports)
+            module_imports.update(model.imports)
+            text = path.read_text(encoding="utf-8")
+            new_header = get_header(module_imports)
+            path.write_text(new_header + text[len(old_header) :], encoding="utf-8")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n\n" + model.source + "\n")
+    # Tortoise discovers the models from the namespace of the package
+    imports = "".join(f"from .{module} import *  # noqa: F403\n" for module in modules)
+    (output_dir / "__init__.py").write_text(imports, encoding="utf-8")
+    return list(modules)
+
+
+def get_module_name(table: str, group_by: str = "table") -> str:
+    """
+    :param table: name of the table
+    :param group_by: "table" or "prefix"
+    :return: name of the module to write the model of the table to
+    """
+    if group_by == "prefix":
+        table = table.split("_", 1)[0] or table
+    name = re.sub(r"\W", "_", table.lower())
+    if not name.isidentifier() or keyword.iskeyword(name):
+        name = f"_{name}"
+    return name
 
 
 def main() -> None:
+    # The event loop policy has to be set before the loop is created
+    init_asyncio_patch()
     cli()
 
 
@@ -0,0 +1,934 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+from contextlib import AbstractAsyncContextManager
+from contextvars import ContextVar
+from functools import partial
+from pathlib import Path
+from types import ModuleType
+from typing import TYPE_CHECKING, NamedTuple
+
+from tortoise import Tortoise, connections, generate_schema_for_client
+from tortoise.exceptions import OperationalError
+from tortoise.functions import Count, Sum
+from tortoise.transactions import in_transaction
+from tortoise.utils import get_schema_sql
+
+from aerich import registry
+from aerich.coder import encoder
+from aerich.enums import HookEvent, Resource
+from aerich.exceptions import DowngradeError, NotSupportError, UpgradeError
+from aerich.executor import RetryPolicy, StatementExecutor, StatementResult
+from aerich.hooks import Hooks
+from aerich.migrate import MIGRATE_TEMPLATE, Migrate
+from aerich.models import MAX_STATEMENT_LENGTH, Aerich, AerichCheckpoint, AerichStats
+from aerich.registry import REGISTRY_APP, add_registry
+from aerich.utils import (
+    create_connection,
+    get_app_connection,
+    get_app_connection_name,
+    get_models_describe,
+    import_py_file,
+    init_asyncio_patch,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable, Mapping
+    from contextvars import Token
+
+    from tortoise import BaseDBAsyncClient, Model
+
+    from aerich.compare import Mismatch
+    from aerich.inspectdb import Inspect, InspectedModel
+
+
+init_asyncio_patch()
+
+
+def _get_statement_hash(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+class UpgradeResult(NamedTuple):
+    app: str
+    migrated: list[str]
+    error: Exception | None = None
+
+
+class TargetResult(NamedTuple):
+    target: str
+    migrated: list[str]
+    error: Exception | None = None
+
+
+class AdoptResult(NamedTuple):
+    version: str | None  # None if it is not recorded because of the mismatches
+    mismatches: list[Mismatch]
+
+
+class DriftResult(NamedTuple):
+    version: str | None  # the last applied version, None if there is not any
+    mismatches: list[Mismatch]
+
+
+# Name of the target that is being upgraded by `upgrade_targets/upgrade_schemas`
+_target_name: ContextVar[str | None] = ContextVar("_target_name", default=None)
+# Versions to record in the registry once the transaction of the schema that is being upgraded
+# by `upgrade_schemas` is committed
+_deferred_versions: ContextVar[list[tuple[list[str], dict]] | None] = ContextVar(
+    "_deferred_versions", default=None
+)
+
+
+class Command(AbstractAsyncContextManager):
+    def __init__(
+        self,
+        tortoise_config: dict,
+        app: str = "models",
+        location: str = "./migrations",
+        hooks: Hooks | None = None,
+        registry: str | None = None,
+        registry_target: str | None = None,
+    ) -> None:
+        """
+        :param tortoise_config: tortoise config
+        :param app: name of the app to migrate
+        :param location: folder of the migrations
+        :param hooks: receive the events of the commands
+        :param registry: url of the database to record the versions of all the targets
+        :param registry_target: name of the database in the registry, default is the
+            connection name of the app, the targets of `upgrade_targets/upgrade_schemas`
+            are recorded by their own names
+        """
+        if registry:
+            tortoise_config = add_registry(tortoise_config, registry)
+        self.tortoise_config = tortoise_config
+        self.app = app
+        self.location = location
+        self.hooks = hooks or Hooks()
+        self.registry = registry
+        self.registry_target = registry_target or get_app_connection_name(tortoise_config, app)
+        self._migrate = Migrate(app, location, self.hooks)
+        if registry:
+            self._migrate.registry_target = self.registry_target
+        # Imported migration files that are shared by the targets of `upgrade_targets`
+        self._migration_modules: dict[str, ModuleType] | None = None
+        self._resource = Resource.filesystem
+
+    async def init(self, resource: Resource = Resource.snapshot) -> None:
+        """
+        Initialize what is needed by the commands to run, it can be called again to
+        initialize more, e.g.: `migrate` loads the snapshot if it is not loaded yet
+        :param resource: what to initialize, nothing for `Resource.filesystem`
+        """
+        if resource == Resource.filesystem or resource == self._resource:
+            return
+        if self._resource == Resource.filesystem:
+            await self._migrate.init(self.tortoise_config, resource == Resource.snapshot)
+            if self.registry:
+                await generate_schema_for_client(connections.get(REGISTRY_APP), safe=True)
+        elif resource == Resource.snapshot:
+            await self._migrate.load_snapshot()
+        else:
+            # The snapshot is loaded already
+            return
+        self._resource = resource
+
+    async def __aenter__(self) -> Command:
+        await self.init()
+        return self
+
+    async def close(self) -> None:
+        await connections.close_all()
+
+    async def __aexit__(self, *args, **kw) -> None:
+        await self.close()
+
+    async def _upgrade(
+        self,
+        conn,
+        version_file,
+        fake: bool = False,
+        executor: StatementExecutor | None = None,
+        stats: bool = False,
+        in_transaction: bool = True,
+        checkpoint: bool = False,
+        resume: bool = True,
+        record: bool = True,
+    ) -> dict | None:
+        """
+        :return: describe of the models that is recorded with the version, None if not recorded
+        """
+        m = self._import_migration(version_file)
+        upgrade = m.upgrade
+        with self.hooks.span(
+            HookEvent.migration, app=self.app, version=version_file, upgrade=True, fake=fake
+        ) as data:
+            if not fake:
+                upgrade_sql = await upgrade(conn)
+                if executor is None:
+                    await conn.execute_script(upgrade_sql)
+                else:
+                    start = 0
+                    on_done = None
+                    if checkpoint:
+                        if resume:
+                            statements = executor.split(upgrade_sql)
+                            start = await self._get_resume_position(version_file, statements)
+                        on_done = partial(self._save_checkpoint, version_file)
+                    data["start"] = start
+                    results = await executor.execute(
+                        conn,
+                        upgrade_sql,
+                        in_transaction,
+                        start,
+                        on_done,
+                        app=self.app,
+                        version=version_file,
+                    )
+                    if stats:
+                        await self._save_stats(version_file, results)
+            content = None
+            if record:
+                content = get_models_describe(self.app)
+                await Aerich.create(version=version_file, app=self.app, content=content)
+            if checkpoint:
+                await AerichCheckpoint.filter(version=version_file, app=self.app).delete()
+        return content
+
+    def _get_registry_target(self) -> str:
+        return _target_name.get() or self.registry_target
+
+    async def _register(self, version_files: list[str], content: dict) -> None:
+        """
+        Record the versions in the registry, it is written by its own connection, so it should
+        be called after the transaction of the versions is committed
+        """
+        if not self.registry:
+            return
+        if (deferred := _deferred_versions.get()) is not None:
+            deferred.append((version_files, content))
+            return
+        target = self._get_registry_target()
+        for version_file in version_files:
+            await registry.save_version(target, self.app, version_file, content)
+
+    def _import_migration(self, version_file: str) -> ModuleType:
+        modules = self._migration_modules
+        if modules is not None and (m := modules.get(version_file)) is not None:
+            return m
+        m = import_py_file(Path(self._migrate.migrate_location, version_file))
+        if modules is not None:
+            modules[version_file] = m
+        return m
+
+    async def _get_resume_position(self, version_file: str, statements: list[str]) -> int:
+        """
+        Get the index of the first statement that is not finished by the last run
+        """
+        last = await AerichCheckpoint.get_or_none(version=version_file, app=self.app)
+        if last is None:
+            return 0
+        position = last.statement_index
+        if (
+            position >= len(statements)
+            or _get_statement_hash(statements[position]) != last.statement_hash
+        ):
+            raise UpgradeError(
+                f"{version_file} is changed since it failed at statement #{position + 1}, "
+                "can not resume from there"
+            )
+        return position + 1
+
+    async def _save_checkpoint(self, version_file: str, result: StatementResult) -> None:
+        index, sql_hash = result.position, _get_statement_hash(result.sql)
+        if not await AerichCheckpoint.filter(version=version_file, app=self.app).update(
+            statement_index=index, statement_hash=sql_hash
+        ):
+            await AerichCheckpoint.create(
+                version=version_file, app=self.app, statement_index=index, statement_hash=sql_hash
+            )
+
+    async def _save_stats(self, version_file: str, results: list[StatementResult]) -> None:
+        records = [
+            AerichStats(
+                version=version_file,
+                app=self.app,
+                statement_index=r.position,
+                statement_hash=_get_statement_hash(r.sql),
+                statement=r.sql[:MAX_STATEMENT_LENGTH],
+                duration=r.duration,
+                rows=r.rows,
+            )
+            for r in results
+        ]
+        # Only keep the timing of the latest run, e.g.: upgrade again after downgrade
+        await AerichStats.filter(version=version_file, app=self.app).delete()
+        await AerichStats.bulk_create(records)
+
+    @staticmethod
+    async def _create_aerich_table(model: type[Model]) -> None:
+        # Tables like `aerich_stats` are not in the migration files of the projects
+        # that inited before they were introduced, so create them when required.
+        client = model._meta.db
+        schema_generator = client.schema_generator(client)
+        sql = schema_generator._get_table_sql(model, safe=True)["table_creation_string"]
+        await client.execute_script(sql)
+
+    async def _get_applied_versions(self) -> set[str]:
+        """
+        :return: versions of the app in the `aerich` table, empty if the table does not exist
+        """
+        client = Aerich._meta.db
+        if client.schema_generator.DIALECT == "postgres":
+            # A failed query aborts the transaction of postgres, e.g.: the one of each schema
+            # of `upgrade_schemas`, so the table is looked up in the search_path first
+            sql = f"SELECT to_regclass('{Aerich._meta.db_table}') IS NOT NULL AS found"
+            if not (await client.execute_query_dict(sql))[0]["found"]:
+                return set()
+        try:
+            versions = await Aerich.filter(app=self.app).values_list("version", flat=True)
+        except OperationalError:
+            return set()
+        return {str(version) for version in versions}
+
+    async def upgrade(
+        self,
+        run_in_transaction: bool = True,
+        fake: bool = False,
+        stats: bool = False,
+        per_statement: bool = False,
+        statement_timeout: float | None = None,
+        lock_timeout: float | None = None,
+        retry: RetryPolicy | None = None,
+        checkpoint: bool = False,
+        resume: bool = True,
+        atomic_batch: bool = False,
+        relaxed_durability: bool = False,
+    ) -> list[str]:
+        """
+        Apply the migrations that not recorded by the `aerich` table
+        :param run_in_transaction: run each migration file in a transaction
+        :param fake: mark migrations as applied without executing them
+        :param stats: record the timing of each statement in `aerich_stats`, implies per_statement
+        :param per_statement: split the migration files and execute statements one by one
+        :param statement_timeout: seconds that each statement is allowed to run, implies per_statement
+        :param lock_timeout: seconds that each statement is allowed to wait for locks, implies per_statement
+        :param retry: retry the statements that failed to get locks, implies per_statement
+        :param checkpoint: record the last finished statement of each migration in the
+            `aerich_checkpoint` table, only works when run_in_transaction is False
+        :param resume: resume the migration that failed with checkpoint from the statement
+            after the last finished one
+        :param atomic_batch: apply all the pending migrations and insert their records in one
+            transaction, only for the dialects that support transactional DDL
+        :param relaxed_durability: do not wait for the data to be flushed to disk when
+            committing the atomic batch, only for the ephemeral databases
+        :return: the applied version files
+        """
+        if atomic_batch:
+            return await self._upgrade_atomic_batch(
+                fake,
+                stats,
+                statement_timeout,
+                lock_timeout,
+                retry,
+                relaxed_durability,
+                run_in_transaction,
+            )
+        if checkpoint and run_in_transaction:
+            raise NotSupportError("Checkpoint only works for the migrations without transaction")
+        migrated: list[str] = []
+        executor: StatementExecutor | None = None
+        # Record each finished statement, so that a failed migration can go on from there
+        checkpoint = checkpoint and not fake
+        if (
+            checkpoint
+            or per_statement
+            or stats
+            or statement_timeout is not None
+            or lock_timeout is not None
+            or retry is not None
+        ):
+            dialect = get_app_connection(self.tortoise_config, self.app).schema_generator.DIALECT
+            executor = StatementExecutor(
+                dialect, self.hooks, statement_timeout, lock_timeout, retry
+            )
+        with self.hooks.span(HookEvent.upgrade, app=self.app, migrated=migrated):
+            if stats and not fake:
+                await self._create_aerich_table(AerichStats)
+            if checkpoint:
+                await self._create_aerich_table(AerichCheckpoint)
+            applied = await self._get_applied_versions()
+            for version_file in self._migrate.get_all_version_files():
+                if version_file not in applied:
+                    app_conn_name = get_app_connection_name(self.tortoise_config, self.app)
+                    if run_in_transaction:
+                        async with in_transaction(app_conn_name) as conn:
+                            content = await self._upgrade(conn, version_file, fake, executor, stats)
+                    else:
+                        app_conn = get_app_connection(self.tortoise_config, self.app)
+                        content = await self._upgrade(
+                            app_conn, version_file, fake, executor, stats, False, checkpoint, resume
+                        )
+                    if content is not None:
+                        await self._register([version_file], content)
+                    migrated.append(version_file)
+        return migrated
+
+    async def _upgrade_atomic_batch(
+        self,
+        fake: bool,
+        stats: bool,
+        statement_timeout: float | None,
+        lock_timeout: float | None,
+        retry: RetryPolicy | None,
+        relaxed_durability: bool,
+        run_in_transaction: bool,
+    ) -> list[str]:
+        connection = get_app_connection(self.tortoise_config, self.app)
+        dialect = connection.schema_generator.DIALECT
+        if dialect not in ("postgres", "sqlite"):
+            raise NotSupportError(f"Atomic batch is not supported for {dialect}")
+        if not run_in_transaction:
+            raise NotSupportError("Atomic batch always runs in a transaction")
+        # Run statement by statement, executescript of sqlite3 commits the pending transaction
+        executor = StatementExecutor(dialect, self.hooks, statement_timeout, lock_timeout, retry)
+        migrated: list[str] = []
+        with self.hooks.span(HookEvent.upgrade, app=self.app, migrated=migrated, atomic_batch=True):
+            if stats and not fake:
+                await self._create_aerich_table(AerichStats)
+            applied = await self._get_applied_versions()
+            pending = [v for v in self._migrate.get_all_version_files() if v not in applied]
+            if not pending:
+                return migrated
+            content = get_models_describe(self.app)
+            # Synchronous of sqlite can not be changed inside a transaction
+            restore_sqlite = None
+            if relaxed_durability and dialect == "sqlite":
+                _, rows = await connection.execute_query("PRAGMA synchronous")
+                restore_sqlite = f"PRAGMA synchronous = {rows[0][0]}"
+                await connection.execute_script("PRAGMA synchronous = OFF")
+            try:
+                async with in_transaction(connection.connection_name) as conn:
+                    if relaxed_durability and dialect == "postgres":
+                        await conn.execute_script("SET LOCAL synchronous_commit = off")
+                    for version_file in pending:
+                        await self._upgrade(conn, version_file, fake, executor, stats, record=False)
+                    await Aerich.bulk_create(
+                        [Aerich(version=v, app=self.app, content=content) for v in pending]
+                    )
+            finally:
+                if restore_sqlite is not None:
+                    await connection.execute_script(restore_sqlite)
+            await self._register(pending, content)
+            migrated.extend(pending)
+        return migrated
+
+    async def upgrade_all_apps(self, **kwargs) -> list[UpgradeResult]:
+        """
+        Upgrade all the apps that have migrations, sharing the initialized Tortoise.
+        Apps on different connections run concurrently, the ones on the same connection
+        run one by one in the order of the config, and stop at the first failure.
+        :param kwargs: arguments of `upgrade`
+        :return: result of each app, in the order of the config
+        """
+        apps = [app for app in self.tortoise_config["apps"] if Path(self.location, app).exists()]
+        # All the `aerich` records are saved by the connection of `Aerich`, sqlite only
+        # allows one writer, so there is nothing to run concurrently.
+        serial = Aerich._meta.db.schema_generator.DIALECT == "sqlite"
+        connection_name = get_app_connection_name(self.tortoise_config, self.app)
+        groups: dict[str, list[Command]] = {}
+        for app in apps:
+            app_connection_name = get_app_connection_name(self.tortoise_config, app)
+            key = "" if serial else app_connection_name
+            # The registry target names the database of this app, the apps on the other
+            # connections are recorded by their own connection names
+            target = self.registry_target if app_connection_name == connection_name else None
+            command = Command(
+                self.tortoise_config, app, self.location, self.hooks, self.registry, target
+            )
+            groups.setdefault(key, []).append(command)
+
+        async def upgrade_one_by_one(commands: list[Command]) -> list[UpgradeResult]:
+            results: list[UpgradeResult] = []
+            failed: str | None = None
+            for command in commands:
+                if failed is not None:
+                    error = UpgradeError(f"Skipped because upgrading {failed} failed")
+                    results.append(UpgradeResult(command.app, [], error))
+                    continue
+                try:
+                    migrated = await command.upgrade(**kwargs)
+                except Exception as e:
+                    failed = command.app
+                    results.append(UpgradeResult(command.app, [], e))
+                else:
+                    results.append(UpgradeResult(command.app, migrated))
+            return results
+
+        groups_results = await asyncio.gather(*map(upgrade_one_by_one, groups.values()))
+        results = {r.app: r for rs in groups_results for r in rs}
+        return [results[app] for app in apps]
+
+    def _bind_connection(self, client: BaseDBAsyncClient) -> list[Token]:
+        """
+        Use the client as the connection of the app (and of `Aerich`) in the current context,
+        each task runs in a copy of the context, so it does not affect the other tasks.
+        """
+        connection_name = get_app_connection_name(self.tortoise_config, self.app)
+        aliases = {connection_name, Aerich._meta.default_connection or connection_name}
+        return [connections.set(alias, client) for alias in aliases]
+
+    async def _upgrade_concurrently(
+        self, jobs: Mapping[str, Callable[[], Awaitable[list[str]]]], concurrency: int
+    ) -> AsyncIterator[TargetResult]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(name: str, job: Callable[[], Awaitable[list[str]]]) -> TargetResult:
+            async with semaphore:
+                # The task runs in a copy of the context
+                _target_name.set(name)
+                try:
+                    migrated = await job()
+                except Exception as e:
+                    return TargetResult(name, [], e)
+                return TargetResult(name, migrated)
+
+        # Import each migration file once for all the targets
+        self._migration_modules = {}
+        tasks = [asyncio.ensure_future(run(*item)) for item in jobs.items()]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._migration_modules = None
+
+    async def upgrade_targets(
+        self, targets: dict[str, str], concurrency: int = 8, **kwargs
+    ) -> AsyncIterator[TargetResult]:
+        """
+        Upgrade the app of many databases that share the same migrations, e.g.: shards or tenants.
+        The connection of the app (and of `Aerich`) is replaced by the one of each target
+        while upgrading it, a failed target does not stop the others.
+        :param targets: {name: db_url} of the databases
+        :param concurrency: max number of the databases to upgrade at the same time
+        :param kwargs: arguments of `upgrade`
+        :return: result of each target in the order of completion
+        """
+        connection_name = get_app_connection_name(self.tortoise_config, self.app)
+
+        async def upgrade_target(db_url: str) -> list[str]:
+            client = create_connection(db_url, connection_name)
+            tokens = self._bind_connection(client)
+            try:
+                return await self.upgrade(**kwargs)
+            finally:
+                for token in reversed(tokens):
+                    connections.reset(token)
+                await client.close()
+
+        jobs = {name: partial(upgrade_target, db_url) for name, db_url in targets.items()}
+        async for result in self._upgrade_concurrently(jobs, concurrency):
+            yield result
+
+    async def get_schemas(self, pattern: str) -> list[str]:
+        """
+        Get the schemas of the postgres database that match the pattern
+        :param pattern: pattern of `LIKE`, e.g.: tenant_%
+        """
+        conn = get_app_connection(self.tortoise_config, self.app)
+        sql = "SELECT nspname FROM pg_namespace WHERE nspname LIKE $1 ORDER BY nspname"
+        if "psycopg" in str(type(conn)).lower():
+            sql = sql.replace("$1", "%s")
+        rows = await conn.execute_query_dict(sql, [pattern])
+        return [row["nspname"] for row in rows]
+
+    async def upgrade_schemas(
+        self, schemas: list[str], concurrency: int = 8, **kwargs
+    ) -> AsyncIterator[TargetResult]:
+        """
+        Upgrade the app in each schema of a postgres database, e.g.: schema-per-tenant.
+        Each schema has its own `aerich` table and is upgraded in one transaction,
+        which holds a connection of the pool and sets the `search_path` to the schema.
+        :param schemas: names of the schemas
+        :param concurrency: max number of the schemas to upgrade at the same time,
+            should not be greater than the size of the pool
+        :param kwargs: arguments of `upgrade`
+        :return: result of each schema in the order of completion
+        """
+        connection = get_app_connection(self.tortoise_config, self.app)
+        if (dialect := connection.schema_generator.DIALECT) != "postgres":
+            raise NotSupportError(f"Upgrading schemas is not supported for {dialect}")
+        if not kwargs.get("run_in_transaction", True):
+            raise NotSupportError("Schemas are always upgraded in transactions")
+
+        async def upgrade_schema(schema: str) -> list[str]:
+            deferred: list[tuple[list[str], dict]] = []
+            # The task runs in a copy of the context
+            _deferred_versions.set(deferred)
+            async with in_transaction(connection.connection_name) as conn:
+                quoted = '"{}"'.format(schema.replace('"', '""'))
+                # Only takes effect until the end of the transaction
+                await conn.execute_script(f"SET LOCAL search_path TO {quoted}")
+                tokens = self._bind_connection(conn)
+                try:
+                    migrated = await self.upgrade(**kwargs)
+                finally:
+                    for token in reversed(tokens):
+                        connections.reset(token)
+            _deferred_versions.set(None)
+            for version_files, content in deferred:
+                await self._register(version_files, content)
+            return migrated
+
+        jobs = {schema: partial(upgrade_schema, schema) for schema in schemas}
+        async for result in self._upgrade_concurrently(jobs, concurrency):
+            yield result
+
+    async def _get_upgrade_versions(
+        self, from_version: int | None, to_version: int | None
+    ) -> list[str]:
+        version_files = self._migrate.get_all_version_files()
+        if from_version is None:
+            applied = await self._get_applied_versions()
+            version_files = [v for v in version_files if v not in applied]
+        else:
+            version_files = [v for v in version_files if int(v.split("_")[0]) >= from_version]
+        if to_version is not None:
+            version_files = [v for v in version_files if int(v.split("_")[0]) <= to_version]
+        return version_files
+
+    def _get_insert_sql(self, conn: BaseDBAsyncClient, version_file: str, content: dict) -> str:
+        text = encoder(content)
+        if conn.schema_generator.DIALECT == "mysql":
+            # Backslash is an escape character in the string literals of mysql
+            text = text.replace("\\", "\\\\")
+        query = (
+            conn.query_class.into(Aerich._meta.basetable)
+            .columns("version", "app", "content")
+            .insert(version_file, self.app, text)
+        )
+        return query.get_sql() + ";"
+
+    async def upgrade_sql(
+        self, from_version: int | None = None, to_version: int | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Compile the migrations into one SQL script without executing them, e.g.: to review
+        it or to apply it with the native client of the database
+
+        :param from_version: number of the first version, the first pending one if None
+        :param to_version: number of the last version, the latest one if None
+        :return: async iterator of the SQL of each version, followed by the statement to
+            insert its `aerich` record
+        """
+        conn = get_app_connection(self.tortoise_config, self.app)
+        content = get_models_describe(self.app)
+        for version_file in await self._get_upgrade_versions(from_version, to_version):
+            m = self._import_migration(version_file)
+            upgrade_sql = (await m.upgrade(conn)).strip()
+            if upgrade_sql and not upgrade_sql.endswith(";"):
+                upgrade_sql += ";"
+            insert_sql = self._get_insert_sql(conn, version_file, content)
+            yield f"-- {version_file}\n{upgrade_sql}\n{insert_sql}\n\n"
+
+    async def _get_downgrade_versions(self, version: int) -> list[Aerich]:
+        if version == -1:
+            specified_version = await self._migrate.get_last_version()
+        else:
+            specified_version = await Aerich.filter(
+                app=self.app, version__startswith=f"{version}_"
+            ).first()
+        if not specified_version:
+            raise DowngradeError("No specified version found")
+        if version == -1:
+            return [specified_version]
+        return await Aerich.filter(app=self.app, pk__gte=specified_version.pk)
+
+    async def _get_downgrade_sql(self, conn, version_file: str) -> str:
+        m = import_py_file(Path(self._migrate.migrate_location, version_file))
+        downgrade_sql = await m.downgrade(conn)
+        if not downgrade_sql.strip():
+            raise DowngradeError("No downgrade items found")
+        return downgrade_sql
+
+    async def _downgrade(self, conn, version_file: str, fake: bool = False) -> None:
+        with self.hooks.span(
+            HookEvent.migration, app=self.app, version=version_file, upgrade=False, fake=fake
+        ):
+            downgrade_sql = await self._get_downgrade_sql(conn, version_file)
+            if not fake:
+                await conn.execute_script(downgrade_sql)
+
+    async def downgrade(
+        self, version: int, delete: bool, fake: bool = False, batch: bool = False
+    ) -> list[str]:
+        """
+        Downgrade to the specified version
+        :param version: number of the version, the last one if it is -1
+        :param delete: also delete the migration files
+        :param fake: mark migrations as not applied without executing them
+        :param batch: run all the versions in one transaction and delete their records at once
+        :return: the downgraded version files
+        """
+        ret: list[str] = []
+        conn_name = get_app_connection_name(self.tortoise_config, self.app)
+        with self.hooks.span(HookEvent.downgrade, app=self.app, migrated=ret):
+            versions = await self._get_downgrade_versions(version)
+            if batch:
+                async with in_transaction(conn_name) as conn:
+                    for version_obj in versions:
+                        await self._downgrade(conn, version_obj.version, fake)
+                    await Aerich.filter(pk__in=[v.pk for v in versions]).delete()
+                ret.extend(v.version for v in versions)
+                if self.registry:
+                    await registry.delete_versions(self._get_registry_target(), self.app, ret)
+                if delete:
+                    for file in ret:
+                        os.unlink(Path(self._migrate.migrate_location, file))
+                return ret
+            for version_obj in versions:
+                file = version_obj.version
+                async with in_transaction(conn_name) as conn:
+                    await self._downgrade(conn, file, fake)
+                    await version_obj.delete()
+                # Written by its own connection after the transaction is committed
+                if self.registry:
+                    await registry.delete_versions(self._get_registry_target(), self.app, [file])
+                if delete:
+                    os.unlink(Path(self._migrate.migrate_location, file))
+                ret.append(file)
+        return ret
+
+    async def downgrade_sql(self, version: int) -> str:
+        """
+        Get the SQL of downgrading to the specified version without executing it
+        :param version: number of the version, the last one if it is -1
+        :return: downgrade SQL of all the versions, and the SQL to delete their records
+        """
+        conn = get_app_connection(self.tortoise_config, self.app)
+        versions = await self._get_downgrade_versions(version)
+        sqls = []
+        for version_obj in versions:
+            downgrade_sql = await self._get_downgrade_sql(conn, version_obj.version)
+            sqls.append(f"-- {version_obj.version}\n{downgrade_sql.strip()}")
+        delete_query = Aerich.filter(pk__in=[v.pk for v in versions]).delete()
+        sqls.append(f"-- {Aerich._meta.db_table}\n{delete_query.sql(params_inline=True)};")
+        return "\n\n".join(sqls) + "\n"
+
+    async def stats(self, limit: int = 10) -> tuple[list[dict], list[AerichStats]]:
+        """
+        Get the slowest migrations and statements that recorded by `upgrade(stats=True)`
+        :param limit: max number of items to return for each of them
+        :return: migrations with total duration, statements ordered by duration
+        """
+        try:
+            migrations = (
+                await AerichStats.filter(app=self.app)
+                .annotate(total_duration=Sum("duration"), statements=Count("id"))
+                .group_by("version")
+                .order_by("-total_duration")
+                .limit(limit)
+                .values("version", "total_duration", "statements")
+            )
+            statements = await AerichStats.filter(app=self.app).order_by("-duration").limit(limit)
+        except OperationalError:
+            # table not exists
+            return [], []
+        return migrations, statements
+
+    async def get_registry_versions(self) -> dict[str, str]:
+        """
+        Get the last version of the app of each target in the registry
+        :return: {target: version}
+        """
+        if not self.registry:
+            raise NotSupportError("The registry is not configured")
+        return await registry.get_target_versions(self.app)
+
+    async def heads(self) -> list[str]:
+        ret = []
+        versions = self._migrate.get_all_version_files()
+        for version in versions:
+            if not await Aerich.exists(version=version, app=self.app):
+                ret.append(version)
+        return ret
+
+    async def history(self) -> list[str]:
+        versions = self._migrate.get_all_version_files()
+        return [version for version in versions]
+
+    async def inspectdb(
+        self, tables: list[str] | None = None, concurrency: int | None = None
+    ) -> str:
+        return await self._get_inspect(tables, concurrency).inspect()
+
+    async def iter_inspectdb(
+        self, tables: list[str] | None = None, concurrency: int | None = None
+    ) -> AsyncIterator[InspectedModel]:
+        """
+        Yield the model of each table once it is inspected
+        :param tables: names of the tables to inspect, all the tables if None
+        :param concurrency: max number of tables to inspect at the same time
+        """
+        async for model in self._get_inspect(tables, concurrency).iter_models():
+            yield model
+
+    def _get_inspect(self, tables: list[str] | None, concurrency: int | None) -> Inspect:
+        connection = get_app_connection(self.tortoise_config, self.app)
+        dialect = connection.schema_generator.DIALECT
+        # The inspectors depend on tortoise, only import them when they are used
+        if dialect == "mysql":
+            from aerich.inspectdb.mysql import InspectMySQL
+
+            cls: type[Inspect] = InspectMySQL
+        elif dialect == "postgres":
+            from aerich.inspectdb.postgres import InspectPostgres
+
+            cls = InspectPostgres
+        elif dialect == "sqlite":
+            from aerich.inspectdb.sqlite import InspectSQLite
+
+            cls = InspectSQLite
+        else:
+            raise NotImplementedError(f"{dialect} is not supported")
+        return cls(connection, tables, concurrency)
+
+    async def migrate(self, name: str = "update", empty: bool = False) -> str:
+        await self.init(Resource.snapshot)
+        return await self._migrate.migrate(name, empty)
+
+    async def init_db(self, safe: bool) -> None:
+        location = self.location
+        app = self.app
+        dirname = Path(location, app)
+        if not dirname.exists():
+            dirname.mkdir(parents=True)
+        else:
+            # If directory is empty, go ahead, otherwise raise FileExistsError
+            for unexpected_file in dirname.glob("*"):
+                raise FileExistsError(str(unexpected_file))
+
+        await Tortoise.init(config=self.tortoise_config)
+        connection = get_app_connection(self.tortoise_config, app)
+        await generate_schema_for_client(connection, safe)
+
+        schema = get_schema_sql(connection, safe)
+
+        version = await self._migrate.generate_version()
+        models_describe = get_models_describe(app)
+        await Aerich.create(version=version, app=app, content=models_describe)
+        if self.registry:
+            await generate_schema_for_client(connections.get(REGISTRY_APP), safe=True)
+            await registry.save_version(self._get_registry_target(), app, version, models_describe)
+        version_file = Path(dirname, version)
+        content = MIGRATE_TEMPLATE.format(upgrade_sql=schema, downgrade_sql="")
+        with open(version_file, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    async def adopt(self, force: bool = False) -> AdoptResult:
+        """
+        Adopt a database whose tables are created by other tools: compare it with the models,
+        and record the models as the first version without executing the DDL of them
+        :param force: record the version even if the database does not match the models
+        :return: the recorded version and the differences of the database from the models
+        :raises NotSupportError: if the app already has versions in the aerich table
+        """
+        from aerich.compare import compare_database
+
+        dirname = Path(self.location, self.app)
+        if dirname.exists():
+            for unexpected_file in dirname.glob("*"):
+                raise FileExistsError(str(unexpected_file))
+        await self.init(Resource.version_index)
+        if await self._get_applied_versions():
+            # The version would be recorded on top of the history, as a baseline of nothing
+            raise NotSupportError(
+                f"App {self.app} already has versions in the aerich table, only a database "
+                "that aerich has not been used with can be adopted"
+            )
+        connection = get_app_connection(self.tortoise_config, self.app)
+        models_describe = get_models_describe(self.app)
+        mismatches = await compare_database(
+            self._get_inspect(None, None),
+            models_describe,
+            connection.schema_generator.DIALECT,
+            self._get_excluded_tables(),
+        )
+        if mismatches and not force:
+            return AdoptResult(None, mismatches)
+        await self._create_aerich_table(Aerich)
+        version = await self._migrate.generate_version()
+        await Aerich.create(version=version, app=self.app, content=models_describe)
+        if self.registry:
+            await registry.save_version(
+                self._get_registry_target(), self.app, version, models_describe
+            )
+        # Upgrading a new database with the version creates the tables that are adopted
+        schema = get_schema_sql(connection, safe=True)
+        dirname.mkdir(parents=True, exist_ok=True)
+        content = MIGRATE_TEMPLATE.format(upgrade_sql=schema, downgrade_sql="")
+        Path(dirname, version).write_text(content, encoding="utf-8")
+        return AdoptResult(version, mismatches)
+
+    def _get_excluded_tables(self) -> set[str]:
+        """
+        Tables that are not compared with the models of the app: the ones of aerich, that are
+        created by aerich itself, and the ones of the other apps in the same database
+        """
+        from aerich.compare import get_tables
+
+        models = Tortoise.apps[self.app].values()
+        ret = {m._meta.db_table for m in models if m.__module__ == Aerich.__module__}
+        apps = self.tortoise_config["apps"]
+        connection_name = apps[self.app].get("default_connection", "default")
+        for app in apps:
+            if (
+                app != self.app
+                and apps[app].get("default_connection", "default") == connection_name
+            ):
+                ret.update(get_tables(get_models_describe(app)))
+        return ret
+
+    async def drift(self, cache_file: str | Path | None = None) -> DriftResult:
+        """
+        Compare the database with the snapshot of the last applied version, to find the changes
+        that are not made by migrations, e.g.: hotfixes that are applied by hand
+        :param cache_file: json file to cache the checksums of the catalog of the tables and
+            their differences, so that only the tables changed since the last run are compared
+        :return: the last applied version and the differences of the database from it
+        """
+        from aerich.compare import compare_database
+
+        await self.init(Resource.version_index)
+        last_version = await self._migrate.get_last_version()
+        if last_version is None:
+            return DriftResult(None, [])
+        connection = get_app_connection(self.tortoise_config, self.app)
+        # The cache is only valid for the same database
+        connection_name = self.tortoise_config["apps"][self.app].get(
+            "default_connection", "default"
+        )
+        db_config = json.dumps(
+            self.tortoise_config["connections"][connection_name], sort_keys=True, default=str
+        )
+        key = f"{self.app}@{hashlib.sha256(db_config.encode()).hexdigest()[:16]}"
+        caches: dict = {}
+        if cache_file is not None and Path(cache_file).exists():
+            caches = json.loads(Path(cache_file).read_text("utf-8"))
+        cache = caches.setdefault(key, {}) if cache_file is not None else None
+        mismatches = await compare_database(
+            self._get_inspect(None, None),
+            last_version.content,
+            connection.schema_generator.DIALECT,
+            self._get_excluded_tables(),
+            cache,
+        )
+        if cache_file is not None:
+            Path(cache_file).write_text(json.dumps(caches), encoding="utf-8")
+        return DriftResult(last_version.version, mismatches)
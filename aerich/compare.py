@@ -0,0 +1,261 @@
+"""
+Compare the describe of models, of the current models or of a snapshot, with the schema of a
+live database that is introspected by the set-based queries of `aerich.inspectdb`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Collection, Iterator
+from typing import TYPE_CHECKING, NamedTuple
+
+from aerich.coder import JsonEncoder
+
+if TYPE_CHECKING:
+    from aerich.inspectdb import Column, Index, Inspect
+
+# Names of the same column types in the describe of tortoise and in the catalog of databases
+_TYPE_ALIASES: dict[str, dict[str, str]] = {
+    "postgres": {
+        "INT": "INT4",
+        "INTEGER": "INT4",
+        "SERIAL": "INT4",
+        "SMALLINT": "INT2",
+        "SMALLSERIAL": "INT2",
+        "BIGINT": "INT8",
+        "BIGSERIAL": "INT8",
+        "BOOLEAN": "BOOL",
+        "REAL": "FLOAT4",
+        "DOUBLE PRECISION": "FLOAT8",
+        "DECIMAL": "NUMERIC",
+        "CHAR": "BPCHAR",
+        "CHARACTER": "BPCHAR",
+        "CHARACTER VARYING": "VARCHAR",
+        "TIMESTAMP WITH TIME ZONE": "TIMESTAMPTZ",
+    },
+    "mysql": {"INTEGER": "INT", "BOOL": "TINYINT", "BOOLEAN": "TINYINT"},
+    "sqlite": {"INTEGER": "INT"},
+}
+# Types that the length of the column is compared
+_SIZED_TYPES = ("VARCHAR", "CHAR", "BPCHAR")
+
+
+class Mismatch(NamedTuple):
+    table: str
+    column: str | None  # None if it is about the table or its composite indexes
+    message: str
+
+    def __str__(self) -> str:
+        where = f"{self.table}.{self.column}" if self.column else self.table
+        return f"{where}: {self.message}"
+
+
+def normalize_type(db_type: str, dialect: str) -> tuple[str, str | None]:
+    """
+    :param db_type: type of the column, e.g.: VARCHAR(20), int4
+    :param dialect: dialect of the database
+    :return: name of the type that is the same for tortoise and the catalog, and the size
+    """
+    name, _, size = db_type.partition("(")
+    name = name.strip().upper()
+    return _TYPE_ALIASES.get(dialect, {}).get(name, name), size.rstrip(")").strip() or None
+
+
+def get_tables(models_describe: dict, exclude: Collection[str] = ()) -> dict[str, dict | None]:
+    """
+    :param models_describe: {model name: describe}, of `get_models_describe` or a snapshot
+    :param exclude: tables to skip, e.g.: the ones of aerich
+    :return: {table: describe of the model}, the describe is None for the through tables of
+        many-to-many fields, as their columns are generated by tortoise
+    """
+    ret: dict[str, dict | None] = {}
+    for describe in models_describe.values():
+        if describe.get("managed") is False or describe.get("abstract"):
+            continue
+        if (table := describe["table"]) not in exclude:
+            ret[table] = describe
+        for field in describe.get("m2m_fields") or []:
+            if not field.get("_generated") and (through := field["through"]) not in exclude:
+                ret.setdefault(through, None)
+    return ret
+
+
+def _get_field_columns(describe: dict) -> dict[str, str]:
+    """
+    :return: {name of field: column}, relations are mapped to the columns of their ids
+    """
+    fields = [describe["pk_field"], *describe["data_fields"]]
+    ret = {f["name"]: f["db_column"] for f in fields}
+    for field in [*describe["fk_fields"], *describe["o2o_fields"]]:
+        ret[field["name"]] = ret.get(field["raw_field"], field["raw_field"])
+    return ret
+
+
+def _get_composite_indexes(describe: dict) -> Iterator[tuple[tuple[str, ...], bool]]:
+    """
+    :return: columns and uniqueness of `unique_together` and `indexes` of Meta
+    """
+    field_columns = _get_field_columns(describe)
+    for unique_names in describe.get("unique_together") or []:
+        yield tuple(field_columns.get(n, n) for n in unique_names), True
+    for index in describe.get("indexes") or []:
+        # Items of `indexes` are tuples of field names or instances of `Index`
+        names: Collection[str] | None = (
+            index if isinstance(index, (list, tuple)) else getattr(index, "fields", None)
+        )
+        # The indexes on expressions can not be compared with the catalog
+        if names:
+            yield tuple(field_columns.get(n, n) for n in names), False
+
+
+def compare_table(
+    table: str, describe: dict, columns: list[Column], indexes: list[Index], dialect: str
+) -> list[Mismatch]:
+    """
+    :param table: name of the table
+    :param describe: describe of the model of the table
+    :param columns: columns of the table in the database
+    :param indexes: indexes of the table in the database, except the primary key
+    :param dialect: dialect of the database
+    :return: the differences of the table in the database from the model
+    """
+    ret: list[Mismatch] = []
+    fields = {f["db_column"]: f for f in [describe["pk_field"], *describe["data_fields"]]}
+    actual = {c.name: c for c in columns}
+    for name, field in fields.items():
+        if (column := actual.get(name)) is None:
+            ret.append(Mismatch(table, name, "column is missing from the database"))
+            continue
+        ret.extend(
+            Mismatch(table, name, message) for message in _compare_column(field, column, dialect)
+        )
+    ret.extend(
+        Mismatch(table, name, "column is not in the models")
+        for name in actual
+        if name not in fields
+    )
+    expected = list(_get_composite_indexes(describe))
+    # Indexes of Meta may have only one column
+    actual_indexes = {(frozenset(i.columns), i.unique) for i in indexes}
+    for index_columns, unique in expected:
+        if (frozenset(index_columns), unique) not in actual_indexes:
+            kind = "unique index" if unique else "index"
+            ret.append(
+                Mismatch(
+                    table, None, f"{kind} on {_join(index_columns)} is missing from the database"
+                )
+            )
+    described = {(frozenset(c), u) for c, u in expected}
+    for index in indexes:
+        if len(index.columns) > 1 and (frozenset(index.columns), index.unique) not in described:
+            ret.append(
+                Mismatch(
+                    table,
+                    None,
+                    f"index {index.name} on {_join(index.columns)} is not in the models",
+                )
+            )
+    return ret
+
+
+def _compare_column(field: dict, column: Column, dialect: str) -> Iterator[str]:
+    db_types = field.get("db_field_types") or {}
+    # The autoincrement primary keys of sqlite can only be INTEGER
+    autoincrement = dialect == "sqlite" and column.pk and field.get("generated")
+    if (db_type := db_types.get(dialect) or db_types.get("")) and not autoincrement:
+        expected, size = normalize_type(db_type, dialect)
+        name, _ = normalize_type(column.data_type, dialect)
+        length = None if column.length is None else str(column.length)
+        if name != expected:
+            yield f"type is {db_type} in the models, {column.data_type} in the database"
+        elif expected in _SIZED_TYPES and size and length and size != length:
+            yield f"length is {size} in the models, {length} in the database"
+    if column.pk:
+        return
+    if field["nullable"] != column.null:
+        if field["nullable"]:
+            yield "nullable in the models, NOT NULL in the database"
+        else:
+            yield "NOT NULL in the models, nullable in the database"
+    if field["unique"] != column.unique:
+        if field["unique"]:
+            yield "unique in the models, not unique in the database"
+        else:
+            yield "not unique in the models, unique in the database"
+    elif field["indexed"] and not field["unique"] and not column.index:
+        yield "indexed in the models, not indexed in the database"
+
+
+def _join(columns: Collection[str]) -> str:
+    return "(" + ", ".join(columns) + ")"
+
+
+def get_describe_hash(describe: dict | None) -> str:
+    if describe is None:
+        return ""
+    text = json.dumps(describe, cls=JsonEncoder, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+async def compare_database(
+    inspect: Inspect,
+    models_describe: dict,
+    dialect: str,
+    exclude: Collection[str] = (),
+    cache: dict | None = None,
+) -> list[Mismatch]:
+    """
+    Compare the models with the database, the catalog of all the tables of the models is read
+    with a few set-based queries
+    :param inspect: inspector of the database
+    :param models_describe: {model name: describe}
+    :param dialect: dialect of the database
+    :param exclude: tables to skip, they are not reported even if they are only in the database
+    :param cache: {table: {"key": checksums, "mismatches": [[column, message]]}} of the last
+        comparison, only the tables whose catalog or describe changed since then are read and
+        compared if it is given, and it is updated in place
+    :return: the differences of the database from the models, the tables that are only in the
+        database are reported at the end
+    """
+    tables = get_tables(models_describe, exclude)
+    # The tables of unmanaged models are not compared, but they are not unknown either
+    known = {*tables, *exclude, *(d.get("table") for d in models_describe.values())}
+    extra = sorted(t for t in await inspect.get_all_tables() if t not in known)
+    results: dict[str, list[Mismatch]] = {}
+    keys: dict[str, list[str]] = {}
+    changed = list(tables)
+    if cache is not None:
+        checksums = await inspect.get_all_checksums(changed)
+        keys = {
+            table: [checksum, get_describe_hash(tables[table])]
+            for table, checksum in checksums.items()
+        }
+        for table in list(cache):
+            if keys.get(table) != cache[table]["key"]:
+                del cache[table]
+        for table, entry in cache.items():
+            results[table] = [Mismatch(table, column, msg) for column, msg in entry["mismatches"]]
+        # The missing tables have no checksums, they are compared again and found missing
+        changed = [table for table in tables if table not in cache]
+    all_indexes = await inspect.get_all_indexes(changed) if changed else {}
+    all_columns = await inspect.get_all_columns(changed, all_indexes) if changed else {}
+    for table in changed:
+        describe = tables[table]
+        if not (columns := all_columns.get(table)):
+            results[table] = [Mismatch(table, None, "table is missing from the database")]
+            continue
+        results[table] = (
+            []
+            if describe is None
+            else compare_table(table, describe, columns, all_indexes.get(table, []), dialect)
+        )
+        if cache is not None and table in keys:
+            cache[table] = {
+                "key": keys[table],
+                "mismatches": [[m.column, m.message] for m in results[table]],
+            }
+    return [
+        *(mismatch for table in tables for mismatch in results[table]),
+        *(Mismatch(table, None, "table is not in the models") for table in extra),
+    ]
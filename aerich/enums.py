@@ -5,3 +5,26 @@ class Color(str, Enum):
     green = "green"
     red = "red"
     yellow = "yellow"
+
+
+class HookEvent(str, Enum):
+    upgrade = "upgrade"
+    downgrade = "downgrade"
+    migration = "migration"
+    statement = "statement"
+    statement_retry = "statement_retry"
+    snapshot_load = "snapshot_load"
+    diff_models = "diff_models"
+
+
+class HookStage(str, Enum):
+    before = "before"
+    after = "after"
+
+
+class Resource(str, Enum):
+    """What a command needs to be initialized, each one includes the ones before it"""
+
+    filesystem = "filesystem"  # only the migration files, the database is not connected
+    version_index = "version_index"  # connections, to query and record the applied versions
+    snapshot = "snapshot"  # models of the last version and server version, to make migrations
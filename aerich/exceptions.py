@@ -8,3 +8,15 @@ class DowngradeError(Exception):
     """
     raise when downgrade error
     """
+
+
+class UpgradeError(Exception):
+    """
+    raise when upgrade error
+    """
+
+
+class StatementTimeoutError(Exception):
+    """
+    raise when a statement is not finished in the specified time
+    """
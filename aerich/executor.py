@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, NamedTuple
+
+from tortoise import transactions
+
+from aerich.enums import HookEvent, HookStage
+from aerich.exceptions import StatementTimeoutError
+from aerich.hooks import Event, Hooks
+from aerich.utils import split_sql
+
+if TYPE_CHECKING:
+    from tortoise import BaseDBAsyncClient
+
+SAVEPOINT = "aerich_statement"
+# Errors that mean the statement gave up waiting for a lock, it is safe to run it again
+_LOCK_ERRORS = re.compile(
+    r"lock timeout|lock_not_available|lock wait timeout exceeded|database is locked|"
+    r"deadlock",
+    re.I,
+)
+# Statements of postgres that can not run inside a transaction block
+_NON_TRANSACTIONAL = re.compile(
+    r"\bCONCURRENTLY\b|^\s*(VACUUM|CLUSTER|REINDEX\s+(SYSTEM|DATABASE)|ALTER\s+SYSTEM|"
+    r"(CREATE|DROP)\s+(DATABASE|TABLESPACE))\b",
+    re.I,
+)
+
+
+class StatementResult(NamedTuple):
+    position: int  # index of the statement in the script
+    sql: str
+    duration: float  # seconds
+    rows: int
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Retry the statements that failed to get locks with jittered exponential backoff
+
+    :param retries: max times to retry one statement
+    :param base_delay: seconds to wait before the first retry, doubled for each next one
+    :param max_delay: upper limit of the seconds to wait before one retry
+    :param budget: seconds that an executor can spend on waiting to retry, no limit if None
+    """
+
+    retries: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    budget: float | None = None
+
+    def get_delay(self, attempt: int) -> float:
+        # "Full jitter", spread the retries of concurrent migrators
+        limit = min(self.max_delay, self.base_delay * 2**attempt)
+        return random.uniform(0, limit)  # nosec: B311
+
+
+class StatementExecutor:
+    """
+    Execute a SQL script statement by statement on the same connection,
+    so that each statement can be timed, limited and reported.
+    """
+
+    def __init__(
+        self,
+        dialect: str,
+        hooks: Hooks | None = None,
+        timeout: float | None = None,
+        lock_timeout: float | None = None,
+        retry: RetryPolicy | None = None,
+    ) -> None:
+        """
+        :param dialect: dialect of the connection, used to split the script
+        :param hooks: receive a `HookEvent.statement` event for each statement
+        :param timeout: seconds that each statement is allowed to run
+        :param lock_timeout: seconds that each statement is allowed to wait for locks
+        :param retry: how to retry the statements that failed to get locks
+        """
+        self.dialect = dialect
+        self.hooks = hooks or Hooks()
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.retry = retry
+        self._retry_spent = 0.0
+
+    def split(self, sql: str) -> list[str]:
+        return split_sql(sql, self.dialect)
+
+    def _settings_sql(self) -> tuple[list[str], list[str]]:
+        """
+        Statements to limit the time of waiting for locks(and of executing for postgres),
+        and the ones to restore the settings.
+        """
+        apply: list[str] = []
+        reset: list[str] = []
+        if self.dialect == "postgres":
+            # SET LOCAL only takes effect until the end of the current transaction
+            if self.lock_timeout is not None:
+                apply.append(f"SET LOCAL lock_timeout = '{int(self.lock_timeout * 1000)}ms'")
+            if self.timeout is not None:
+                apply.append(f"SET LOCAL statement_timeout = '{int(self.timeout * 1000)}ms'")
+        elif self.dialect == "mysql":
+            if self.lock_timeout is not None:
+                seconds = max(1, math.ceil(self.lock_timeout))
+                apply.append(f"SET SESSION lock_wait_timeout = {seconds}")
+                reset.append("SET SESSION lock_wait_timeout = DEFAULT")
+        elif self.dialect == "sqlite":
+            if self.lock_timeout is not None:
+                apply.append(f"PRAGMA busy_timeout = {int(self.lock_timeout * 1000)}")
+                # The default of python's sqlite3 module
+                reset.append("PRAGMA busy_timeout = 5000")
+        return apply, reset
+
+    def _server_side_timeout(self) -> bool:
+        return self.dialect == "postgres" and self.timeout is not None
+
+    def _pinned(self) -> bool:
+        # The statement of MySQL that exceeds the timeout is killed by the id of its connection,
+        # so it has to run on a known connection of the pool
+        return self.dialect == "mysql" and self.timeout is not None
+
+    async def execute(
+        self,
+        conn: BaseDBAsyncClient,
+        sql: str,
+        in_transaction: bool = False,
+        start: int = 0,
+        on_done: Callable[[StatementResult], Awaitable[Any]] | None = None,
+        **data,
+    ) -> list[StatementResult]:
+        """
+        Execute statements of the script one by one
+        :param conn: connection or transaction to run the statements
+        :param sql: script that may contain several statements
+        :param in_transaction: whether the conn is a transaction
+        :param start: index of the first statement to execute, the ones before it are skipped
+        :param on_done: awaited with the result after each statement is finished
+        :param data: extra data of the hook events, e.g.: app, version
+        :return: result of each executed statement
+        """
+        statements = self.split(sql)
+        total = len(statements)
+        apply, reset = self._settings_sql() if in_transaction else ([], [])
+        for setting in apply:
+            await self._execute_setting(conn, setting)
+        results = []
+        try:
+            for index, statement in enumerate(statements[start:], start):
+                result = await self.execute_statement(
+                    conn, statement, index, in_transaction, total=total, **data
+                )
+                results.append(result)
+                if on_done is not None:
+                    await on_done(result)
+        finally:
+            for setting in reset:
+                await self._execute_setting(conn, setting)
+        return results
+
+    async def execute_statement(
+        self,
+        conn: BaseDBAsyncClient,
+        statement: str,
+        index: int = 0,
+        in_transaction: bool = False,
+        **data,
+    ) -> StatementResult:
+        attempt = 0
+        while True:
+            try:
+                with self.hooks.span(
+                    HookEvent.statement, sql=statement, index=index, **data
+                ) as info:
+                    start = time.perf_counter()
+                    rows = await self._execute_once(conn, statement, in_transaction)
+                    duration = time.perf_counter() - start
+                    info["rows"] = rows
+                return StatementResult(index, statement, duration, rows)
+            except asyncio.TimeoutError as e:
+                raise self._timeout_error(index, statement, data) from e
+            except Exception as e:
+                if (delay := self._get_retry_delay(e, attempt, in_transaction)) is None:
+                    if self._server_side_timeout() and "statement timeout" in str(e):
+                        raise self._timeout_error(index, statement, data) from e
+                    raise
+                attempt += 1
+                self.hooks.emit(
+                    Event(
+                        HookEvent.statement_retry,
+                        HookStage.before,
+                        dict(data, sql=statement, index=index, attempt=attempt, delay=delay),
+                        time.time(),
+                        error=e,
+                    )
+                )
+                await asyncio.sleep(delay)
+
+    def _get_retry_delay(
+        self, error: Exception, attempt: int, in_transaction: bool = False
+    ) -> float | None:
+        if self.retry is None or attempt >= self.retry.retries:
+            return None
+        if not _LOCK_ERRORS.search(str(error)):
+            return None
+        # A deadlock of MySQL rolls back the whole transaction, not only the statement
+        if in_transaction and self.dialect == "mysql" and "deadlock" in str(error).lower():
+            return None
+        delay = self.retry.get_delay(attempt)
+        if self.retry.budget is not None and self._retry_spent + delay > self.retry.budget:
+            return None
+        self._retry_spent += delay
+        return delay
+
+    def _timeout_error(self, index: int, statement: str, data: dict) -> StatementTimeoutError:
+        where = f" of {version}" if (version := data.get("version")) else ""
+        return StatementTimeoutError(
+            f"Statement #{index}{where} is not finished in {self.timeout} seconds: {statement}"
+        )
+
+    async def _execute_once(
+        self, conn: BaseDBAsyncClient, statement: str, in_transaction: bool
+    ) -> int:
+        if in_transaction:
+            # DDL of MySQL commits the transaction implicitly and releases all the savepoints,
+            # a lock wait timeout only rolls back the failed statement there, so it is retried
+            # without a savepoint
+            if self.retry is None or self.dialect == "mysql":
+                return await self._query(conn, statement, self._server_side_timeout())
+            # Rollback to the savepoint so that the transaction can go on after a failure
+            await self._execute_setting(conn, f"SAVEPOINT {SAVEPOINT}")
+            try:
+                rows = await self._query(conn, statement, self._server_side_timeout())
+            except Exception:
+                await self._execute_setting(conn, f"ROLLBACK TO SAVEPOINT {SAVEPOINT}")
+                raise
+            await self._execute_setting(conn, f"RELEASE SAVEPOINT {SAVEPOINT}")
+            return rows
+        apply, reset = self._settings_sql()
+        if (not apply and not self._pinned()) or (
+            self.dialect == "postgres" and _NON_TRANSACTIONAL.search(statement)
+        ):
+            return await self._query(conn, statement)
+        # The settings are bound to the session, use a transaction to run them and the
+        # statement on the same connection of the pool.
+        async with transactions.in_transaction(conn.connection_name) as tx:
+            for setting in apply:
+                await self._execute_setting(tx, setting)
+            try:
+                return await self._query(tx, statement, self._server_side_timeout())
+            finally:
+                for setting in reset:
+                    await self._execute_setting(tx, setting)
+
+    async def _execute_setting(self, conn: BaseDBAsyncClient, sql: str) -> None:
+        if self.dialect == "sqlite":
+            # executescript() of sqlite3 commits the pending transaction first
+            await conn.execute_query(sql)
+        else:
+            await conn.execute_script(sql)
+
+    async def _query(
+        self, conn: BaseDBAsyncClient, statement: str, server_side_timeout: bool = False
+    ) -> int:
+        if self.timeout is None or server_side_timeout:
+            rows, _ = await conn.execute_query(statement)
+            return rows
+        # MySQL and SQLite can't limit the time of DDL, cancelling the await would leave the
+        # statement running and the connection out of sync, so it is stopped on the server
+        # and waited for instead
+        stop = await self._get_stop(conn)
+        task = asyncio.ensure_future(conn.execute_query(statement))
+        try:
+            rows, _ = await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            if stop is None:
+                task.cancel()
+                raise
+            await stop()
+            try:
+                rows, _ = await task
+            except Exception as e:
+                raise asyncio.TimeoutError from e
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        return rows
+
+    async def _get_stop(self, conn: BaseDBAsyncClient) -> Callable[[], Awaitable[Any]] | None:
+        """
+        :return: function to stop the statement that is running on the connection, None if the
+            dialect has no way to do it, then only the await is cancelled
+        """
+        if self.dialect == "mysql":
+            rows = await conn.execute_query_dict("SELECT CONNECTION_ID() AS id")
+            kill = f"KILL QUERY {int(rows[0]['id'])}"
+            # The statement runs in a transaction, whose wrapper runs one query at a time, so
+            # the kill is sent from another connection of the pool of the client it is made of
+            client = conn
+            while (parent := getattr(client, "_parent", None)) is not None:
+                client = parent
+            return lambda: client.execute_script(kill)
+        if self.dialect == "sqlite":
+            async with conn.acquire_connection() as connection:
+                # The statement runs in the thread of aiosqlite, interrupt() is thread safe
+                return connection.interrupt
+        return None
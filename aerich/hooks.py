@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from aerich.enums import HookEvent, HookStage
+
+logger = logging.getLogger("aerich")
+
+
+@dataclass
+class Event:
+    """
+    Payload that passed to the listeners
+
+    :param name: what is happening, e.g.: HookEvent.upgrade
+    :param stage: HookStage.before or HookStage.after
+    :param data: details of the event, e.g.: app, version, sql
+    :param started_at: unix timestamp of the beginning of the event
+    :param duration: seconds that the event took, only set for the after stage
+    :param error: exception raised during the event, only set for the after stage
+    """
+
+    name: HookEvent
+    stage: HookStage
+    data: dict[str, Any] = field(default_factory=dict)
+    started_at: float = 0.0
+    duration: float | None = None
+    error: BaseException | None = None
+
+
+Listener = Callable[[Event], Any]
+
+
+class Hooks:
+    """
+    Registry of the listeners that observe what aerich is doing.
+
+    Example::
+
+        >>> def on_event(event: Event) -> None:
+        ...     if event.stage == HookStage.after:
+        ...         print(event.name.value, event.data.get("version"), event.duration)
+        >>> hooks = Hooks()
+        >>> hooks.add(on_event)  # listen all events
+        >>> hooks.add(on_event, HookEvent.statement)  # or only the statements
+        >>> async with Command(tortoise_config, hooks=hooks) as command:
+        ...     await command.upgrade()
+    """
+
+    def __init__(self) -> None:
+        self._listeners: list[tuple[HookEvent | None, Listener]] = []
+
+    def add(self, listener: Listener, event: HookEvent | None = None) -> None:
+        self._listeners.append((event, listener))
+
+    def remove(self, listener: Listener, event: HookEvent | None = None) -> None:
+        self._listeners.remove((event, listener))
+
+    def emit(self, event: Event) -> None:
+        """
+        Call the listeners of the event. If the event failed, the errors of the listeners are
+        logged instead of raised, so that they do not replace the error of the event.
+        """
+        for name, listener in self._listeners:
+            if name is None or name == event.name:
+                if event.error is None:
+                    listener(event)
+                    continue
+                try:
+                    listener(event)
+                except Exception:
+                    logger.exception("Listener %r of %s failed", listener, event.name.value)
+
+    @contextmanager
+    def span(self, name: HookEvent, **data) -> Iterator[dict[str, Any]]:
+        """
+        Emit the before event on enter and the after event with timing on exit,
+        the yielded dict is the data of the event, caller can add results into it.
+        """
+        if not self._listeners:
+            yield data
+            return
+        started_at = time.time()
+        self.emit(Event(name, HookStage.before, data, started_at))
+        start = time.perf_counter()
+        error: BaseException | None = None
+        try:
+            yield data
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.emit(Event(name, HookStage.after, data, started_at, duration, error))
@@ -1,10 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import contextlib
-from typing import Any, Callable, Dict, TypedDict
+import hashlib
+import heapq
+import sys
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, NamedTuple, TypedDict
 
-from pydantic import BaseModel
-from tortoise import BaseDBAsyncClient
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from tortoise import BaseDBAsyncClient
+
+# Records are created for each column of the catalog, slots make them smaller and faster.
+# TODO: use `@dataclass(slots=True)` directly when dropping support for Python3.9
+_DATACLASS_OPTIONS: dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
 
 
 class ColumnInfoDict(TypedDict):
@@ -21,20 +33,34 @@ class ColumnInfoDict(TypedDict):
 FieldMapDict = Dict[str, Callable[..., str]]
 
 
-class Column(BaseModel):
+@dataclass(**_DATACLASS_OPTIONS)
+class Column:
     name: str
     data_type: str
     null: bool
     default: Any
-    comment: str | None = None
     pk: bool
     unique: bool
     index: bool
+    comment: str | None = None
     length: int | None = None
     extra: str | None = None
     decimal_places: int | None = None
     max_digits: int | None = None
 
+    def __post_init__(self) -> None:
+        # The drivers return the flags as int and the sizes as int/str/Decimal
+        self.null = bool(self.null)
+        self.pk = bool(self.pk)
+        self.unique = bool(self.unique)
+        self.index = bool(self.index)
+        if self.length is not None:
+            self.length = int(self.length)
+        if self.decimal_places is not None:
+            self.decimal_places = int(self.decimal_places)
+        if self.max_digits is not None:
+            self.max_digits = int(self.max_digits)
+
     def translate(self) -> ColumnInfoDict:
         comment = default = length = index = null = pk = ""
         if self.pk:
@@ -90,37 +116,353 @@ class Column(BaseModel):
         }
 
 
+@dataclass(**_DATACLASS_OPTIONS)
+class Index:
+    name: str
+    columns: list[str]
+    unique: bool
+    # Access method and predicate of partial index, only for postgres
+    method: str | None = None
+    predicate: str | None = None
+
+    def __post_init__(self) -> None:
+        self.unique = bool(self.unique)
+
+
+@dataclass(**_DATACLASS_OPTIONS)
+class ForeignKey:
+    name: str
+    column: str
+    related_table: str
+    # None if it references the primary key of the related table implicitly, only for sqlite
+    related_column: str | None = None
+    # Referential action of the database, e.g.: CASCADE, SET NULL
+    on_delete: str = "CASCADE"
+    # Whether related_column is the primary key of the related table, `to_field` otherwise
+    related_pk: bool = True
+
+
+class InspectedModel(NamedTuple):
+    table: str
+    source: str  # code of the model class
+    imports: tuple[str, ...] = ()  # import statements that the code needs, e.g.: index classes
+
+
 class Inspect:
     _table_template = "class {table}(Model):\n"
-
-    def __init__(self, conn: BaseDBAsyncClient, tables: list[str] | None = None) -> None:
+    header = "from tortoise import Model, fields\n"
+    # {access method: (module, class)} of the index classes of tortoise for the dialect
+    index_classes: dict[str, tuple[str, str]] = {}
+    # (module, class) of the partial btree indexes
+    partial_index_class: tuple[str, str] = ("tortoise.indexes", "PartialIndex")
+
+    def __init__(
+        self,
+        conn: BaseDBAsyncClient,
+        tables: list[str] | None = None,
+        concurrency: int | None = None,
+    ) -> None:
+        """
+        :param conn: connection of the database to inspect
+        :param tables: names of the tables to inspect, all the tables if None
+        :param concurrency: max number of tables to inspect at the same time when they are
+            inspected one by one, default to the max size of the connection pool
+        """
         self.conn = conn
         with contextlib.suppress(AttributeError):
             self.database = conn.database  # type:ignore[attr-defined]
         self.tables = tables
+        if concurrency is None:
+            # sqlite has only one connection
+            concurrency = getattr(conn, "pool_maxsize", 1)
+        self.concurrency = max(1, concurrency)
 
     @property
     def field_map(self) -> FieldMapDict:
         raise NotImplementedError
 
     async def inspect(self) -> str:
+        models = [model async for model in self.iter_models()]
+        imports = sorted({line for model in models for line in model.imports})
+        header = self.header + "".join(f"{line}\n" for line in imports)
+        return header + "\n\n" + "\n\n\n".join(model.source for model in models)
+
+    async def iter_models(self, chunk_size: int = 500) -> AsyncIterator[InspectedModel]:
+        """
+        Inspect the tables chunk by chunk, and yield the model of each table once its chunk
+        is inspected, so that the memory does not grow with the schema
+        :param chunk_size: max number of tables of each catalog query
+        """
         if not self.tables:
             self.tables = await self.get_all_tables()
-        result = "from tortoise import Model, fields\n\n\n"
-        tables = []
-        for table in self.tables:
-            columns = await self.get_columns(table)
-            fields = []
-            model = self._table_template.format(table=table.title().replace("_", ""))
-            for column in columns:
+        # The foreign keys of all the tables are needed to sort them, read them first
+        all_foreign_keys = await self.get_all_foreign_keys(self.tables)
+        tables = self.sort_tables(self.tables, all_foreign_keys)
+        for start in range(0, len(tables), chunk_size):
+            chunk = tables[start : start + chunk_size]
+            all_indexes = await self.get_all_indexes(chunk)
+            all_columns = await self.get_all_columns(chunk, all_indexes)
+            descriptions = await self.get_all_table_descriptions(chunk)
+            for table in chunk:
+                yield self.get_model(
+                    table,
+                    all_columns.get(table, []),
+                    all_indexes.get(table, []),
+                    all_foreign_keys.get(table, []),
+                    descriptions.get(table),
+                )
+
+    @staticmethod
+    def get_model_name(table: str) -> str:
+        return table.title().replace("_", "")
+
+    def get_model(
+        self,
+        table: str,
+        columns: list[Column],
+        indexes: list[Index],
+        foreign_keys: list[ForeignKey],
+        description: str | None = None,
+    ) -> InspectedModel:
+        model = self._table_template.format(table=self.get_model_name(table))
+        foreign_key_map = {fk.column: fk for fk in foreign_keys}
+        related_counts = Counter(fk.related_table for fk in foreign_keys)
+        fields = []
+        for column in columns:
+            fk = foreign_key_map.get(column.name)
+            if fk is not None and not column.pk:
+                # Several relations to the same model need distinct related names
+                ambiguous = related_counts[fk.related_table] > 1
+                field = self.relational_field(table, column, fk, ambiguous)
+            else:
                 field = self.field_map[column.data_type](**column.translate())
-                fields.append("    " + field)
-            tables.append(model + "\n".join(fields))
-        return result + "\n\n\n".join(tables)
+            fields.append("    " + field)
+        meta, imports = self.get_meta_string(table, indexes, description)
+        return InspectedModel(table, model + "\n".join(fields) + meta, imports)
+
+    @staticmethod
+    def sort_tables(tables: list[str], all_foreign_keys: dict[str, list[ForeignKey]]) -> list[str]:
+        """
+        Sort the tables topologically, so that the referenced ones are defined first
+        :param tables: names of the tables
+        :param all_foreign_keys: {table: foreign keys}
+        :return: tables sorted, keep the original order as much as possible, the ones in cycles
+            of references are taken in the original order
+        """
+        tables = list(dict.fromkeys(tables))
+        positions = {table: i for i, table in enumerate(tables)}
+        dependents: dict[str, list[str]] = defaultdict(list)
+        pending: dict[str, int] = {}
+        for table in tables:
+            referenced = {
+                fk.related_table
+                for fk in all_foreign_keys.get(table, [])
+                if fk.related_table in positions and fk.related_table != table
+            }
+            for related_table in referenced:
+                dependents[related_table].append(table)
+            pending[table] = len(referenced)
+        ready = [positions[table] for table in tables if not pending[table]]
+        heapq.heapify(ready)
+        ret: list[str] = []
+        done: set[str] = set()
+        while len(ret) < len(tables):
+            if ready:
+                table = tables[heapq.heappop(ready)]
+                if table in done:
+                    continue
+            else:
+                table = next(t for t in tables if t not in done)
+            done.add(table)
+            ret.append(table)
+            for dependent in dependents[table]:
+                pending[dependent] -= 1
+                if not pending[dependent] and dependent not in done:
+                    heapq.heappush(ready, positions[dependent])
+        return ret
+
+    @classmethod
+    def get_meta_string(
+        cls, table: str, indexes: list[Index], description: str | None = None
+    ) -> tuple[str, tuple[str, ...]]:
+        """
+        Meta of the model, the plain indexes of one column are options of the fields
+        :param table: name of the table
+        :param indexes: indexes of the table, except the primary key
+        :param description: comment of the table
+        :return: code of Meta, and the import statements of the index classes it uses
+        """
+        lines = []
+        if table != cls.get_model_name(table).lower():
+            lines.append(f"table = {table!r}")
+        if description:
+            lines.append(f"table_description = {description!r}")
+        unique_together: list[str] = []
+        composite: list[str] = []
+        skipped: list[str] = []
+        imports: set[str] = set()
+        for index in indexes:
+            columns = tuple(index.columns)
+            if cls._is_plain(index):
+                if len(columns) > 1:
+                    (unique_together if index.unique else composite).append(repr(columns))
+                continue
+            if index.method in cls.index_classes:
+                module, class_name = cls.index_classes[index.method]
+            elif index.method in (None, "btree"):
+                module, class_name = cls.partial_index_class
+            else:
+                skipped.append(f"{index.name}: {index.method} index is not supported")
+                continue
+            arguments = f"fields={columns!r}, name={index.name!r}"
+            if index.unique:
+                skipped.append(f"{index.name}: unique {class_name} is not supported")
+                continue
+            if index.predicate:
+                if (condition := cls.parse_predicate(index.predicate)) is None:
+                    skipped.append(f"{index.name}: can not describe predicate {index.predicate}")
+                    continue
+                arguments += f", condition={condition!r}"
+            composite.append(f"{class_name}({arguments})")
+            imports.add(f"from {module} import {class_name}")
+        if unique_together:
+            lines.append(f"unique_together = {cls._tuple_string(unique_together)}")
+        if composite:
+            lines.append(f"indexes = {cls._tuple_string(composite)}")
+        lines.extend(f"# Skipped index {reason}" for reason in skipped)
+        if not lines:
+            return "", ()
+        meta = "\n\n    class Meta:" + "".join(f"\n        {line}" for line in lines)
+        return meta, tuple(sorted(imports))
+
+    @staticmethod
+    def _tuple_string(items: list[str]) -> str:
+        return "(" + ", ".join(items) + ("," if len(items) == 1 else "") + ")"
+
+    @staticmethod
+    def parse_predicate(predicate: str) -> dict[str, Any] | None:
+        """
+        Convert the predicate of partial index to the condition of tortoise's PartialIndex
+        :return: {column: value}, None if it can not be described by the equalities
+        """
+        return None
 
     async def get_columns(self, table: str) -> list[Column]:
         raise NotImplementedError
 
+    async def get_all_columns(
+        self, tables: list[str], all_indexes: dict[str, list[Index]] | None = None
+    ) -> dict[str, list[Column]]:
+        """
+        Get the columns of the tables, the inspectors that can query the catalog of all the
+        tables at once override it, so that it does not cost one round trip per table
+        :param tables: names of the tables
+        :param all_indexes: result of `get_all_indexes` for the tables if the caller has read
+            it, so that the `unique`/`index` of the columns do not cost another index query
+        :return: {table: columns in the order of definition}
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def get_columns(table: str) -> list[Column]:
+            async with semaphore:
+                return await self.get_columns(table)
+
+        # Each query takes a connection from the pool, gather keeps the order of the tables
+        columns = await asyncio.gather(*(get_columns(table) for table in tables))
+        return dict(zip(tables, columns))
+
+    @staticmethod
+    def _is_plain(index: Index) -> bool:
+        # Plain indexes are described by the options of fields and the tuples of Meta
+        return index.method in (None, "btree") and not index.predicate
+
+    @classmethod
+    def _get_columns_index(cls, all_indexes: dict[str, list[Index]]) -> dict[tuple[str, str], str]:
+        """
+        :return: {(table, column): "unique" or "index"}, of the plain indexes that have one
+            column, the columns of composite indexes are described by Meta instead
+        """
+        ret: dict[tuple[str, str], str] = {}
+        for table, indexes in all_indexes.items():
+            for index in indexes:
+                if len(index.columns) == 1 and cls._is_plain(index):
+                    key = (table, index.columns[0])
+                    if ret.get(key) != "unique":
+                        ret[key] = "unique" if index.unique else "index"
+        return ret
+
+    async def get_all_indexes(self, tables: list[str]) -> dict[str, list[Index]]:
+        """
+        Get the indexes and unique constraints of the tables, except the primary keys
+        :param tables: names of the tables
+        :return: {table: indexes}, empty for the inspectors that do not support it
+        """
+        return {table: [] for table in tables}
+
+    async def get_all_table_descriptions(self, tables: list[str]) -> dict[str, str]:
+        """
+        Get the comments of the tables
+        :param tables: names of the tables
+        :return: {table: comment}, the tables without comments are skipped
+        """
+        return {}
+
+    async def get_all_checksums(self, tables: list[str]) -> dict[str, str]:
+        """
+        Get the checksums of the catalog of the tables, which change when the columns or the
+        indexes of the tables change. The inspectors override it to aggregate the catalog in the
+        database, so that it is much cheaper than reading the catalog.
+        :param tables: names of the tables
+        :return: {table: checksum}, the tables that do not exist are skipped
+        """
+        all_indexes = await self.get_all_indexes(tables)
+        all_columns = await self.get_all_columns(tables, all_indexes)
+        return {
+            table: self._hash(repr((columns, all_indexes.get(table, []))))
+            for table, columns in all_columns.items()
+            if columns
+        }
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    async def get_all_foreign_keys(self, tables: list[str]) -> dict[str, list[ForeignKey]]:
+        """
+        Get the foreign keys of one column of the tables, the composite ones are skipped as
+        tortoise can not describe them
+        :param tables: names of the tables
+        :return: {table: foreign keys}, empty for the inspectors that do not support it
+        """
+        return {table: [] for table in tables}
+
+    @staticmethod
+    def _group_foreign_keys(
+        tables: list[str], rows: list[tuple[str, str, str, str, str | None, str, bool]]
+    ) -> dict[str, list[ForeignKey]]:
+        """
+        :param rows: (table, name, column, related table, related column, on delete, whether
+            the related column is the primary key) of each column of the constraints, ordered
+            by the position of the column
+        """
+        ret: dict[str, list[ForeignKey]] = {table: [] for table in tables}
+        constraints: dict[tuple[str, str], list[ForeignKey]] = {}
+        for table, name, column, related_table, related_column, on_delete, related_pk in rows:
+            fk = ForeignKey(
+                name=name,
+                column=column,
+                related_table=related_table,
+                related_column=related_column,
+                on_delete=on_delete.upper(),
+                # sqlite and mysql return 0/1
+                related_pk=bool(related_pk),
+            )
+            constraints.setdefault((table, name), []).append(fk)
+        for (table, _), fks in constraints.items():
+            if len(fks) == 1:
+                ret[table].append(fks[0])
+        return ret
+
     async def get_all_tables(self) -> list[str]:
         raise NotImplementedError
 
@@ -132,6 +474,35 @@ class Inspect:
         field_params = arguments.format(**kwargs).strip().rstrip(",")
         return f"{name} = fields.{field_class}({field_params})"
 
+    @classmethod
+    def relational_field(
+        cls, table: str, column: Column, foreign_key: ForeignKey, ambiguous: bool = False
+    ) -> str:
+        """
+        ForeignKeyField, or OneToOneField if the column is unique
+        :param table: name of the table of the column
+        :param column: column of the foreign key
+        :param foreign_key: the constraint
+        :param ambiguous: whether the table has other foreign keys to the same table
+        """
+        name = column.name
+        if name.endswith("_id") and len(name) > 3:
+            name = name[:-3]
+        field_class = "OneToOneField" if column.unique else "ForeignKeyField"
+        # The default related_name of tortoise is "{table}s", it conflicts if there are
+        # several relations between the two models
+        related_name = f"{table}_{name}s" if ambiguous else f"{table}s"
+        model = cls.get_model_name(foreign_key.related_table)
+        arguments = f'"models.{model}", related_name="{related_name}", '
+        if column.name != f"{name}_id":
+            arguments += f'source_field="{column.name}", '
+        if foreign_key.related_column and not foreign_key.related_pk:
+            arguments += f'to_field="{foreign_key.related_column}", '
+        if foreign_key.on_delete != "CASCADE":
+            arguments += f"on_delete=fields.{foreign_key.on_delete.replace(' ', '_')}, "
+        kwargs = dict(column.translate(), name=name)
+        return cls.get_field_string(field_class, arguments + "{null}{comment}", **kwargs)
+
     @classmethod
     def decimal_field(cls, **kwargs) -> str:
         return cls.get_field_string("DecimalField", **kwargs)
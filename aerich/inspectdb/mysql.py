@@ -1,9 +1,16 @@
 from __future__ import annotations
 
-from aerich.inspectdb import Column, FieldMapDict, Inspect
+from aerich.inspectdb import Column, FieldMapDict, ForeignKey, Index, Inspect
+
+_INDEXES_MODULE = "tortoise.contrib.mysql.indexes"
 
 
 class InspectMySQL(Inspect):
+    index_classes = {
+        "fulltext": (_INDEXES_MODULE, "FullTextIndex"),
+        "spatial": (_INDEXES_MODULE, "SpatialIndex"),
+    }
+
     @property
     def field_map(self) -> FieldMapDict:
         return {
@@ -31,37 +38,157 @@ class InspectMySQL(Inspect):
         return list(map(lambda x: x["TABLE_NAME"], ret))
 
     async def get_columns(self, table: str) -> list[Column]:
-        columns = []
-        sql = """select c.*, s.NON_UNIQUE, s.INDEX_NAME
-from information_schema.COLUMNS c
-         left join information_schema.STATISTICS s on c.TABLE_NAME = s.TABLE_NAME
-    and c.TABLE_SCHEMA = s.TABLE_SCHEMA
-    and c.COLUMN_NAME = s.COLUMN_NAME
-where c.TABLE_SCHEMA = %s
-  and c.TABLE_NAME = %s"""
-        ret = await self.conn.execute_query_dict(sql, [self.database, table])
-        for row in ret:
-            unique = index = False
-            if (non_unique := row["NON_UNIQUE"]) is not None:
-                unique = not non_unique
-            elif row["COLUMN_KEY"] == "UNI":
-                unique = True
-            if (index_name := row["INDEX_NAME"]) is not None:
-                index = index_name != "PRIMARY"
-            columns.append(
+        return (await self.get_all_columns([table])).get(table, [])
+
+    async def get_all_columns(
+        self, tables: list[str], all_indexes: dict[str, list[Index]] | None = None
+    ) -> dict[str, list[Column]]:
+        if not tables:
+            return {}
+        placeholders = ", ".join(["%s"] * len(tables))
+        sql = f"""select TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_DEFAULT, COLUMN_KEY,
+       COLUMN_COMMENT, EXTRA, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE
+from information_schema.COLUMNS
+where TABLE_SCHEMA = %s
+  and TABLE_NAME in ({placeholders})
+order by TABLE_NAME, ORDINAL_POSITION"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(sql, [self.database, *tables])
+        if all_indexes is None:
+            all_indexes = await self.get_all_indexes(tables)
+        columns_index = self._get_columns_index(all_indexes)
+        ret: dict[str, list[Column]] = {table: [] for table in tables}
+        for row in rows:
+            table, name = row["TABLE_NAME"], row["COLUMN_NAME"]
+            ret[table].append(
                 Column(
-                    name=row["COLUMN_NAME"],
+                    name=name,
                     data_type=row["DATA_TYPE"],
                     null=row["IS_NULLABLE"] == "YES",
                     default=row["COLUMN_DEFAULT"],
                     pk=row["COLUMN_KEY"] == "PRI",
                     comment=row["COLUMN_COMMENT"],
-                    unique=unique,
+                    unique=columns_index.get((table, name)) == "unique",
                     extra=row["EXTRA"],
-                    index=index,
+                    index=columns_index.get((table, name)) == "index",
                     length=row["CHARACTER_MAXIMUM_LENGTH"],
                     max_digits=row["NUMERIC_PRECISION"],
                     decimal_places=row["NUMERIC_SCALE"],
                 )
             )
-        return columns
+        return ret
+
+    async def get_all_indexes(self, tables: list[str]) -> dict[str, list[Index]]:
+        if not tables:
+            return {}
+        placeholders = ", ".join(["%s"] * len(tables))
+        sql = f"""select TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME, INDEX_TYPE
+from information_schema.STATISTICS
+where TABLE_SCHEMA = %s
+  and TABLE_NAME in ({placeholders})
+  and INDEX_NAME != 'PRIMARY'
+order by TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(sql, [self.database, *tables])
+        indexes: dict[tuple[str, str], Index] = {}
+        functional = set()
+        for row in rows:
+            key = (row["TABLE_NAME"], row["INDEX_NAME"])
+            # The key parts on expressions have no column, and can not be described by fields
+            if row["COLUMN_NAME"] is None:
+                functional.add(key)
+            elif key not in indexes:
+                indexes[key] = Index(
+                    name=row["INDEX_NAME"],
+                    columns=[row["COLUMN_NAME"]],
+                    unique=not row["NON_UNIQUE"],
+                    method=row["INDEX_TYPE"].lower(),
+                )
+            else:
+                indexes[key].columns.append(row["COLUMN_NAME"])
+        ret: dict[str, list[Index]] = {table: [] for table in tables}
+        for (table, name), index in indexes.items():
+            if (table, name) not in functional:
+                ret[table].append(index)
+        return ret
+
+    async def get_all_table_descriptions(self, tables: list[str]) -> dict[str, str]:
+        if not tables:
+            return {}
+        placeholders = ", ".join(["%s"] * len(tables))
+        sql = f"""select TABLE_NAME, TABLE_COMMENT
+from information_schema.TABLES
+where TABLE_SCHEMA = %s
+  and TABLE_NAME in ({placeholders})
+  and TABLE_COMMENT != ''"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(sql, [self.database, *tables])
+        return {row["TABLE_NAME"]: row["TABLE_COMMENT"] for row in rows}
+
+    async def get_all_checksums(self, tables: list[str]) -> dict[str, str]:
+        if not tables:
+            return {}
+        placeholders = ", ".join(["%s"] * len(tables))
+        # Only the aggregated CRC of the columns and of the indexes of each table is transferred,
+        # GROUP_CONCAT is not used as it is truncated by group_concat_max_len
+        sql = f"""select TABLE_NAME, 'columns' as kind,
+       bit_xor(crc32(concat_ws('|', ORDINAL_POSITION, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE,
+                               ifnull(COLUMN_DEFAULT, 'NULL'), COLUMN_KEY, EXTRA,
+                               COLUMN_COMMENT))) as checksum
+from information_schema.COLUMNS
+where TABLE_SCHEMA = %s
+  and TABLE_NAME in ({placeholders})
+group by TABLE_NAME
+union all
+select TABLE_NAME, 'indexes' as kind,
+       bit_xor(crc32(concat_ws('|', INDEX_NAME, SEQ_IN_INDEX, COLUMN_NAME, NON_UNIQUE))) as checksum
+from information_schema.STATISTICS
+where TABLE_SCHEMA = %s
+  and TABLE_NAME in ({placeholders})
+group by TABLE_NAME"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(
+            sql, [self.database, *tables, self.database, *tables]
+        )
+        checksums: dict[str, dict[str, str]] = {}
+        for row in rows:
+            checksums.setdefault(row["TABLE_NAME"], {})[row["kind"]] = str(row["checksum"])
+        return {
+            table: f"{parts.get('columns')}:{parts.get('indexes')}"
+            for table, parts in checksums.items()
+            if "columns" in parts
+        }
+
+    async def get_all_foreign_keys(self, tables: list[str]) -> dict[str, list[ForeignKey]]:
+        if not tables:
+            return {}
+        placeholders = ", ".join(["%s"] * len(tables))
+        sql = f"""select k.TABLE_NAME, k.CONSTRAINT_NAME, k.COLUMN_NAME, k.REFERENCED_TABLE_NAME,
+       k.REFERENCED_COLUMN_NAME, r.DELETE_RULE,
+       exists(select 1
+              from information_schema.KEY_COLUMN_USAGE p
+              where p.TABLE_SCHEMA = k.REFERENCED_TABLE_SCHEMA
+                and p.TABLE_NAME = k.REFERENCED_TABLE_NAME
+                and p.CONSTRAINT_NAME = 'PRIMARY'
+                and p.COLUMN_NAME = k.REFERENCED_COLUMN_NAME) as RELATED_PK
+from information_schema.KEY_COLUMN_USAGE k
+         join information_schema.REFERENTIAL_CONSTRAINTS r
+              on r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA
+                  and r.TABLE_NAME = k.TABLE_NAME
+                  and r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+where k.TABLE_SCHEMA = %s
+  and k.TABLE_NAME in ({placeholders})
+  and k.REFERENCED_TABLE_NAME is not null
+order by k.TABLE_NAME, k.CONSTRAINT_NAME, k.ORDINAL_POSITION"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(sql, [self.database, *tables])
+        return self._group_foreign_keys(
+            tables,
+            [
+                (
+                    row["TABLE_NAME"],
+                    row["CONSTRAINT_NAME"],
+                    row["COLUMN_NAME"],
+                    row["REFERENCED_TABLE_NAME"],
+                    row["REFERENCED_COLUMN_NAME"],
+                    row["DELETE_RULE"],
+                    row["RELATED_PK"],
+                )
+                for row in rows
+            ],
+        )
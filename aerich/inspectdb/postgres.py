@@ -1,17 +1,43 @@
 from __future__ import annotations
 
 import re
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
-from aerich.inspectdb import Column, FieldMapDict, Inspect
+from aerich.inspectdb import Column, FieldMapDict, ForeignKey, Index, Inspect
 
 if TYPE_CHECKING:
     from tortoise.backends.base_postgres.client import BasePostgresClient
 
+# Kinds of pg_class that information_schema.tables lists: tables, partitioned tables, views
+# and foreign tables
+_RELKINDS = "('r', 'p', 'v', 'f')"
+# One equality of the predicate of a partial index, e.g.: (status = 'active'::text)
+_EQUALITY = re.compile(
+    r"^\(*\"?(?P<column>\w+)\"?\)?(?:::[\w ]+)?\s*=\s*"
+    r"(?P<value>'(?:[^']|'')*'|true|false|-?\d+(?:\.\d*)?(?:e[-+]?\d+)?)(?:::[\w ]+)?\)*$",
+    re.I,
+)
+_INDEXES_MODULE = "tortoise.contrib.postgres.indexes"
+
 
 class InspectPostgres(Inspect):
-    def __init__(self, conn: BasePostgresClient, tables: list[str] | None = None) -> None:
-        super().__init__(conn, tables)
+    index_classes = {
+        "bloom": (_INDEXES_MODULE, "BloomIndex"),
+        "brin": (_INDEXES_MODULE, "BrinIndex"),
+        "gin": (_INDEXES_MODULE, "GinIndex"),
+        "gist": (_INDEXES_MODULE, "GistIndex"),
+        "hash": (_INDEXES_MODULE, "HashIndex"),
+        "spgist": (_INDEXES_MODULE, "SpGistIndex"),
+    }
+    partial_index_class = (_INDEXES_MODULE, "PartialIndex")
+
+    def __init__(
+        self,
+        conn: BasePostgresClient,
+        tables: list[str] | None = None,
+        concurrency: int | None = None,
+    ) -> None:
+        super().__init__(conn, tables, concurrency)
         self.schema = conn.server_settings.get("schema") or "public"
 
     @property
@@ -38,46 +64,232 @@ class InspectPostgres(Inspect):
             "timestamp": self.datetime_field,
         }
 
+    def _fix_placeholders(self, sql: str) -> str:
+        if "psycopg" in str(type(self.conn)).lower():
+            sql = re.sub(r"\$[12]", "%s", sql)
+        return sql
+
     async def get_all_tables(self) -> list[str]:
-        sql = "select TABLE_NAME from information_schema.TABLES where table_catalog=$1 and table_schema=$2"
-        ret = await self.conn.execute_query_dict(sql, [self.database, self.schema])
+        sql = f"""select c.relname as table_name
+from pg_class c
+         join pg_namespace n on n.oid = c.relnamespace
+where n.nspname = $1
+  and c.relkind in {_RELKINDS}
+order by c.relname"""  # nosec:B608
+        ret = await self.conn.execute_query_dict(self._fix_placeholders(sql), [self.schema])
         return list(map(lambda x: x["table_name"], ret))
 
     async def get_columns(self, table: str) -> list[Column]:
-        columns = []
-        sql = f"""select c.column_name,
-       col_description('public.{table}'::regclass, ordinal_position) as column_comment,
-       t.constraint_type as column_key,
-       udt_name as data_type,
-       is_nullable,
-       column_default,
-       character_maximum_length,
-       numeric_precision,
-       numeric_scale
-from information_schema.constraint_column_usage const
-         join information_schema.table_constraints t
-              using (table_catalog, table_schema, table_name, constraint_catalog, constraint_schema, constraint_name)
-         right join information_schema.columns c using (column_name, table_catalog, table_schema, table_name)
-where c.table_catalog = $1
-  and c.table_name = $2
-  and c.table_schema = $3"""  # nosec:B608
-        if "psycopg" in str(type(self.conn)).lower():
-            sql = re.sub(r"\$[123]", "%s", sql)
-        ret = await self.conn.execute_query_dict(sql, [self.database, table, self.schema])
-        for row in ret:
-            columns.append(
+        return (await self.get_all_columns([table])).get(table, [])
+
+    async def get_all_columns(
+        self, tables: list[str], all_indexes: dict[str, list[Index]] | None = None
+    ) -> dict[str, list[Column]]:
+        # Length of varchar and precision of numeric are encoded in atttypmod
+        sql = f"""select c.relname as table_name,
+       a.attname as column_name,
+       exists(select 1
+              from pg_index x
+              where x.indrelid = c.oid
+                and x.indisprimary
+                and a.attnum = any (x.indkey)) as is_pk,
+       col_description(c.oid, a.attnum) as column_comment,
+       t.typname as data_type,
+       a.attnotnull as not_null,
+       pg_get_expr(d.adbin, d.adrelid) as column_default,
+       case when t.typname in ('varchar', 'bpchar') and a.atttypmod > 0
+           then a.atttypmod - 4 end as character_maximum_length,
+       case when t.typname = 'numeric' and a.atttypmod > 0
+           then ((a.atttypmod - 4) >> 16) & 65535 end as numeric_precision,
+       case when t.typname = 'numeric' and a.atttypmod > 0
+           then (a.atttypmod - 4) & 65535 end as numeric_scale
+from pg_class c
+         join pg_namespace n on n.oid = c.relnamespace
+         join pg_attribute a on a.attrelid = c.oid
+         join pg_type t on t.oid = a.atttypid
+         left join pg_attrdef d on d.adrelid = c.oid and d.adnum = a.attnum
+where n.nspname = $1
+  and c.relname = any($2)
+  and c.relkind in {_RELKINDS}
+  and a.attnum > 0
+  and not a.attisdropped
+order by c.relname, a.attnum"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(
+            self._fix_placeholders(sql), [self.schema, tables]
+        )
+        if all_indexes is None:
+            all_indexes = await self.get_all_indexes(tables)
+        columns_index = self._get_columns_index(all_indexes)
+        ret: dict[str, list[Column]] = {table: [] for table in tables}
+        for row in rows:
+            key = (row["table_name"], row["column_name"])
+            ret[row["table_name"]].append(
                 Column(
                     name=row["column_name"],
                     data_type=row["data_type"],
-                    null=row["is_nullable"] == "YES",
+                    null=not row["not_null"],
                     default=row["column_default"],
                     length=row["character_maximum_length"],
                     max_digits=row["numeric_precision"],
                     decimal_places=row["numeric_scale"],
                     comment=row["column_comment"],
-                    pk=row["column_key"] == "PRIMARY KEY",
-                    unique=False,  # can't get this simply
-                    index=False,  # can't get this simply
+                    pk=row["is_pk"],
+                    unique=columns_index.get(key) == "unique",
+                    index=columns_index.get(key) == "index",
+                )
+            )
+        return ret
+
+    @staticmethod
+    def parse_predicate(predicate: str) -> dict[str, Any] | None:
+        # Only the conjunctions of equalities can be described by the condition of tortoise
+        keywords = re.sub(r"'(?:[^']|'')*'", "''", predicate)
+        if re.search(r"\bOR\b|\bIS\b|\bNOT\b", keywords, re.I):
+            return None
+        condition: dict[str, Any] = {}
+        for part in re.split(r"\s+AND\s+", predicate.strip(), flags=re.I):
+            if not (match := _EQUALITY.match(part.strip())):
+                return None
+            condition[match["column"]] = _parse_value(match["value"])
+        return condition
+
+    async def get_all_table_descriptions(self, tables: list[str]) -> dict[str, str]:
+        sql = f"""select c.relname as table_name, obj_description(c.oid, 'pg_class') as comment
+from pg_class c
+         join pg_namespace n on n.oid = c.relnamespace
+where n.nspname = $1
+  and c.relname = any($2)
+  and c.relkind in {_RELKINDS}
+  and obj_description(c.oid, 'pg_class') is not null"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(
+            self._fix_placeholders(sql), [self.schema, tables]
+        )
+        return {row["table_name"]: row["comment"] for row in rows}
+
+    async def get_all_checksums(self, tables: list[str]) -> dict[str, str]:
+        # Only one hash of each table is transferred instead of its catalog
+        sql = f"""select c.relname as table_name,
+       md5(concat_ws(
+               '|',
+               (select string_agg(concat_ws(' ', a.attname, format_type(a.atttypid, a.atttypmod),
+                                            a.attnotnull, pg_get_expr(d.adbin, d.adrelid),
+                                            col_description(c.oid, a.attnum)),
+                                  ',' order by a.attnum)
+                from pg_attribute a
+                         left join pg_attrdef d on d.adrelid = a.attrelid and d.adnum = a.attnum
+                where a.attrelid = c.oid
+                  and a.attnum > 0
+                  and not a.attisdropped),
+               (select string_agg(pg_get_indexdef(x.indexrelid), ','
+                                  order by pg_get_indexdef(x.indexrelid))
+                from pg_index x
+                where x.indrelid = c.oid),
+               obj_description(c.oid, 'pg_class'))) as checksum
+from pg_class c
+         join pg_namespace n on n.oid = c.relnamespace
+where n.nspname = $1
+  and c.relname = any($2)
+  and c.relkind in {_RELKINDS}"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(
+            self._fix_placeholders(sql), [self.schema, tables]
+        )
+        return {row["table_name"]: row["checksum"] for row in rows}
+
+    async def get_all_foreign_keys(self, tables: list[str]) -> dict[str, list[ForeignKey]]:
+        # conkey and confkey are the columns of the two sides in the same order
+        sql = """select c.relname as table_name,
+       con.conname as name,
+       a.attname as column_name,
+       rc.relname as related_table,
+       ra.attname as related_column,
+       case con.confdeltype
+           when 'c' then 'CASCADE'
+           when 'n' then 'SET NULL'
+           when 'd' then 'SET DEFAULT'
+           when 'r' then 'RESTRICT'
+           else 'NO ACTION'
+           end as on_delete,
+       exists(select 1
+              from pg_index x
+              where x.indrelid = con.confrelid
+                and x.indisprimary
+                and k.ref_attnum = any (x.indkey)) as related_pk
+from pg_constraint con
+         join pg_class c on c.oid = con.conrelid
+         join pg_namespace n on n.oid = c.relnamespace
+         join pg_class rc on rc.oid = con.confrelid
+         cross join unnest(con.conkey, con.confkey) with ordinality as k(attnum, ref_attnum, ord)
+         join pg_attribute a on a.attrelid = con.conrelid and a.attnum = k.attnum
+         join pg_attribute ra on ra.attrelid = con.confrelid and ra.attnum = k.ref_attnum
+where con.contype = 'f'
+  and n.nspname = $1
+  and c.relname = any($2)
+order by c.relname, con.conname, k.ord"""
+        rows = await self.conn.execute_query_dict(
+            self._fix_placeholders(sql), [self.schema, tables]
+        )
+        return self._group_foreign_keys(
+            tables,
+            [
+                (
+                    row["table_name"],
+                    row["name"],
+                    row["column_name"],
+                    row["related_table"],
+                    row["related_column"],
+                    row["on_delete"],
+                    row["related_pk"],
+                )
+                for row in rows
+            ],
+        )
+
+    async def get_all_indexes(self, tables: list[str]) -> dict[str, list[Index]]:
+        # The indexes on expressions are skipped since they can not be described by fields
+        sql = """select c.relname as table_name,
+       i.relname as index_name,
+       x.indisunique as is_unique,
+       am.amname as method,
+       pg_get_expr(x.indpred, x.indrelid) as predicate,
+       array(select a.attname
+             from unnest(x.indkey::int2[]) with ordinality as k(attnum, ord)
+                      join pg_attribute a on a.attrelid = x.indrelid and a.attnum = k.attnum
+             -- the columns of INCLUDE are after the key columns
+             where k.ord <= x.indnkeyatts
+             order by k.ord) as columns
+from pg_index x
+         join pg_class c on c.oid = x.indrelid
+         join pg_class i on i.oid = x.indexrelid
+         join pg_namespace n on n.oid = c.relnamespace
+         join pg_am am on am.oid = i.relam
+where n.nspname = $1
+  and c.relname = any($2)
+  and not x.indisprimary
+  and x.indexprs is null
+order by c.relname, i.relname"""
+        rows = await self.conn.execute_query_dict(
+            self._fix_placeholders(sql), [self.schema, tables]
+        )
+        all_indexes: dict[str, list[Index]] = {table: [] for table in tables}
+        for row in rows:
+            all_indexes[row["table_name"]].append(
+                Index(
+                    name=row["index_name"],
+                    columns=list(row["columns"]),
+                    unique=row["is_unique"],
+                    method=row["method"],
+                    predicate=row["predicate"],
                 )
             )
-        return columns
+        return all_indexes
+
+
+def _parse_value(text: str) -> Any:
+    if text.startswith("'"):
+        return text[1:-1].replace("''", "'")
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
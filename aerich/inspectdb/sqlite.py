@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from aerich.inspectdb import Column, FieldMapDict, Inspect
+from aerich.inspectdb import Column, FieldMapDict, ForeignKey, Index, Inspect
 
 
 class InspectSQLite(Inspect):
@@ -22,16 +22,31 @@ class InspectSQLite(Inspect):
         }
 
     async def get_columns(self, table: str) -> list[Column]:
-        columns = []
-        sql = f"PRAGMA table_info({table})"
-        ret = await self.conn.execute_query_dict(sql)
-        columns_index = await self._get_columns_index(table)
-        for row in ret:
+        return (await self.get_all_columns([table])).get(table, [])
+
+    async def get_all_columns(
+        self, tables: list[str], all_indexes: dict[str, list[Index]] | None = None
+    ) -> dict[str, list[Column]]:
+        placeholders = ", ".join(["?"] * len(tables))
+        # pragma_table_info is the table-valued function of `PRAGMA table_info`
+        sql = f"""select m.name as table_name, p.name, p.type, p."notnull", p.dflt_value, p.pk
+from sqlite_master m
+         join pragma_table_info(m.name) p
+where m.type = 'table'
+  and m.name in ({placeholders})
+order by m.name, p.cid"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(sql, tables)
+        ret: dict[str, list[Column]] = {table: [] for table in tables}
+        if all_indexes is None:
+            all_indexes = await self.get_all_indexes(tables)
+        columns_index = self._get_columns_index(all_indexes)
+        for row in rows:
+            table = row["table_name"]
             try:
                 length = row["type"].split("(")[1].split(")")[0]
             except IndexError:
                 length = None
-            columns.append(
+            ret[table].append(
                 Column(
                     name=row["name"],
                     data_type=row["type"].split("(")[0],
@@ -39,22 +54,83 @@ class InspectSQLite(Inspect):
                     default=row["dflt_value"],
                     length=length,
                     pk=row["pk"] == 1,
-                    unique=columns_index.get(row["name"]) == "unique",
-                    index=columns_index.get(row["name"]) == "index",
+                    unique=columns_index.get((table, row["name"])) == "unique",
+                    index=columns_index.get((table, row["name"])) == "index",
                 )
             )
-        return columns
-
-    async def _get_columns_index(self, table: str) -> dict[str, str]:
-        sql = f"PRAGMA index_list ({table})"
-        indexes = await self.conn.execute_query_dict(sql)
-        ret = {}
-        for index in indexes:
-            sql = f"PRAGMA index_info({index['name']})"
-            index_info = (await self.conn.execute_query_dict(sql))[0]
-            ret[index_info["name"]] = "unique" if index["unique"] else "index"
         return ret
 
+    async def get_all_indexes(self, tables: list[str]) -> dict[str, list[Index]]:
+        placeholders = ", ".join(["?"] * len(tables))
+        # The indexes of primary keys (origin is "pk") are skipped, and the partial ones as
+        # they can not be described by the options of tortoise for sqlite. The seq of the
+        # latest created index is 0, so order by it descending to keep the order of creation.
+        sql = f"""select m.name as table_name, il.name as index_name, il."unique", ii.name as column_name
+from sqlite_master m
+         join pragma_index_list(m.name) il
+         join pragma_index_info(il.name) ii
+where m.type = 'table'
+  and m.name in ({placeholders})
+  and il.origin != 'pk'
+  and il.partial = 0
+order by m.name, il.seq desc, ii.seqno"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(sql, tables)
+        ret: dict[str, list[Index]] = {table: [] for table in tables}
+        indexes: dict[tuple[str, str], Index] = {}
+        for row in rows:
+            table, name = row["table_name"], row["index_name"]
+            if (index := indexes.get((table, name))) is None:
+                index = indexes[(table, name)] = Index(name=name, columns=[], unique=row["unique"])
+                ret[table].append(index)
+            index.columns.append(row["column_name"])
+        return ret
+
+    async def get_all_checksums(self, tables: list[str]) -> dict[str, str]:
+        placeholders = ", ".join(["?"] * len(tables))
+        # The DDL of the tables and their indexes is kept in sqlite_master, ALTER TABLE
+        # updates it, the automatic indexes of constraints have no DDL but their names
+        sql = f"""select tbl_name, type, name, sql
+from sqlite_master
+where type in ('table', 'index')
+  and tbl_name in ({placeholders})
+order by tbl_name, type desc, name"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(sql, tables)
+        definitions: dict[str, list[str]] = {}
+        for row in rows:
+            definitions.setdefault(row["tbl_name"], []).append(row["sql"] or row["name"])
+        return {table: self._hash("\n".join(ddl)) for table, ddl in definitions.items()}
+
+    async def get_all_foreign_keys(self, tables: list[str]) -> dict[str, list[ForeignKey]]:
+        placeholders = ", ".join(["?"] * len(tables))
+        # The constraints have no names in sqlite, use the id of them in the table instead
+        # "to" is null if the primary key of the related table is referenced implicitly
+        sql = f"""select m.name as table_name, f.id, f."from", f."table", f."to", f.on_delete,
+       f."to" is null or exists(select 1
+                                from pragma_table_info(f."table") p
+                                where p.name = f."to"
+                                  and p.pk > 0) as related_pk
+from sqlite_master m
+         join pragma_foreign_key_list(m.name) f
+where m.type = 'table'
+  and m.name in ({placeholders})
+order by m.name, f.id, f.seq"""  # nosec:B608
+        rows = await self.conn.execute_query_dict(sql, tables)
+        return self._group_foreign_keys(
+            tables,
+            [
+                (
+                    row["table_name"],
+                    str(row["id"]),
+                    row["from"],
+                    row["table"],
+                    row["to"],
+                    row["on_delete"],
+                    row["related_pk"],
+                )
+                for row in rows
+            ],
+        )
+
     async def get_all_tables(self) -> list[str]:
         sql = "select tbl_name from sqlite_master where type='table' and name!='sqlite_sequence'"
         ret = await self.conn.execute_query_dict(sql)
@@ -14,17 +14,24 @@ from tortoise import BaseDBAsyncClient, Model, Tortoise
 from tortoise.exceptions import OperationalError
 from tortoise.indexes import Index
 
+from aerich import registry
 from aerich.coder import load_index
 from aerich.ddl import BaseDDL
-from aerich.enums import Color
-from aerich.models import MAX_VERSION_LENGTH, Aerich
+from aerich.enums import Color, HookEvent
+from aerich.hooks import Hooks
+from aerich.models import MAX_VERSION_LENGTH, Aerich, AerichCheckpoint, AerichStats
 from aerich.utils import (
     get_app_connection,
     get_dict_diff_by_key,
     get_models_describe,
+    init_tortoise_0_24_1_patch,
     is_default_function,
 )
 
+# Applied here rather than in aerich.command, so that the code that only imports the migrate
+# module (and so the schema generator of tortoise) gets it too
+init_tortoise_0_24_1_patch()
+
 MIGRATE_TEMPLATE = """from tortoise import BaseDBAsyncClient
 
 
@@ -40,29 +47,45 @@ async def downgrade(db: BaseDBAsyncClient) -> str:
 
 
 class Migrate:
-    upgrade_operators: list[str] = []
-    downgrade_operators: list[str] = []
-    _upgrade_fk_m2m_index_operators: list[str] = []
-    _downgrade_fk_m2m_index_operators: list[str] = []
-    _upgrade_m2m: list[str] = []
-    _downgrade_m2m: list[str] = []
-    _aerich = Aerich.__name__
-    _rename_fields: dict[str, dict[str, str]] = {}  # {'model': {'old_field': 'new_field'}}
+    """
+    Diff the models of an app and generate its migration files, each app (or each
+    `Command`) owns its instance so that several apps can be handled concurrently.
+    """
+
+    _aerich_models = (Aerich.__name__, AerichStats.__name__, AerichCheckpoint.__name__)
 
     ddl: BaseDDL
     ddl_class: type[BaseDDL]
-    _last_version_content: dict | None = None
-    app: str
-    migrate_location: Path
     dialect: str
-    _db_version: str | None = None
+
+    def __init__(
+        self, app: str = "models", location: str | Path = "./migrations", hooks: Hooks | None = None
+    ) -> None:
+        """
+        :param app: name of the Tortoise app
+        :param location: folder of the migrations, the ones of the app are in its sub folder
+        :param hooks: receive the `snapshot_load` and `diff_models` events
+        """
+        self.app = app
+        self.migrate_location = Path(location, app)
+        self.hooks = hooks or Hooks()
+        self.upgrade_operators: list[str] = []
+        self.downgrade_operators: list[str] = []
+        self._upgrade_fk_m2m_index_operators: list[str] = []
+        self._downgrade_fk_m2m_index_operators: list[str] = []
+        self._upgrade_m2m: list[str] = []
+        self._downgrade_m2m: list[str] = []
+        self._rename_fields: dict[str, dict[str, str]] = {}  # {'model': {'old_field': 'new_field'}}
+        self._last_version_content: dict | None = None
+        self._db_version: str | None = None
+        # Load the last snapshot of this target from the registry if it is set
+        self.registry_target: str | None = None
 
     @staticmethod
     def get_field_by_name(name: str, fields: list[dict]) -> dict:
         return next(filter(lambda x: x.get("name") == name, fields))
 
-    @classmethod
-    def get_all_version_files(cls) -> list[str]:
+    def get_all_version_files(self) -> list[str]:
         def get_file_version(file_name: str) -> str:
             return file_name.split("_")[0]
 
@@ -73,59 +96,74 @@ class Migrate:
                 return False
             return get_file_version(file_name).isdigit()
 
-        files = filter(is_version_file, os.listdir(cls.migrate_location))
+        files = filter(is_version_file, os.listdir(self.migrate_location))
         return sorted(files, key=lambda x: int(get_file_version(x)))
 
-    @classmethod
-    def _get_model(cls, model: str) -> type[Model]:
-        return Tortoise.apps[cls.app].get(model)  # type: ignore
+    def _get_model(self, model: str) -> type[Model]:
+        return Tortoise.apps[self.app].get(model)  # type: ignore
 
-    @classmethod
-    async def get_last_version(cls) -> Aerich | None:
+    async def get_last_version(self) -> Aerich | None:
         try:
-            return await Aerich.filter(app=cls.app).first()
+            return await Aerich.filter(app=self.app).first()
         except OperationalError:
             return None
 
-    @classmethod
-    async def _get_db_version(cls, connection: BaseDBAsyncClient) -> None:
-        if cls.dialect == "mysql":
+    async def _load_last_version_content(self) -> None:
+        with self.hooks.span(HookEvent.snapshot_load, app=self.app) as data:
+            if self.registry_target is not None:
+                try:
+                    registered = await registry.get_last_version(self.registry_target, self.app)
+                except OperationalError:
+                    # The tables of registry are not created yet
+                    registered = None
+                if registered:
+                    self._last_version_content = registered.snapshot.content
+                    data["version"] = registered.version
+                    data["registry"] = True
+                    return
+            last_version = await self.get_last_version()
+            if last_version:
+                self._last_version_content = cast(dict, last_version.content)
+                data["version"] = last_version.version
+
+    async def _get_db_version(self, connection: BaseDBAsyncClient) -> None:
+        if self.dialect == "mysql":
             sql = "select version() as version"
             ret = await connection.execute_query(sql)
-            cls._db_version = ret[1][0].get("version")
+            self._db_version = ret[1][0].get("version")
 
-    @classmethod
-    async def load_ddl_class(cls) -> type[BaseDDL]:
-        ddl_dialect_module = importlib.import_module(f"aerich.ddl.{cls.dialect}")
-        return getattr(ddl_dialect_module, f"{cls.dialect.capitalize()}DDL")
+    async def load_ddl_class(self) -> type[BaseDDL]:
+        ddl_dialect_module = importlib.import_module(f"aerich.ddl.{self.dialect}")
+        return getattr(ddl_dialect_module, f"{self.dialect.capitalize()}DDL")
 
-    @classmethod
-    async def init(cls, config: dict, app: str, location: str) -> None:
+    async def init(self, config: dict, snapshot: bool = True) -> None:
+        """
+        :param config: tortoise config
+        :param snapshot: whether to load the snapshot that `migrate` compares the models with,
+            it can be loaded later by `load_snapshot`
+        """
         await Tortoise.init(config=config)
-        last_version = await cls.get_last_version()
-        cls.app = app
-        cls.migrate_location = Path(location, app)
-        if last_version:
-            cls._last_version_content = cast(dict, last_version.content)
-
-        connection = get_app_connection(config, app)
-        cls.dialect = connection.schema_generator.DIALECT
-        cls.ddl_class = await cls.load_ddl_class()
-        cls.ddl = cls.ddl_class(connection)
-        await cls._get_db_version(connection)
-
-    @classmethod
-    async def _get_last_version_num(cls) -> int | None:
-        last_version = await cls.get_last_version()
+        connection = get_app_connection(config, self.app)
+        self.dialect = connection.schema_generator.DIALECT
+        self.ddl_class = await self.load_ddl_class()
+        self.ddl = self.ddl_class(connection)
+        if snapshot:
+            await self.load_snapshot()
+
+    async def load_snapshot(self) -> None:
+        await self._load_last_version_content()
+        await self._get_db_version(self.ddl.client)
+
+    async def _get_last_version_num(self) -> int | None:
+        last_version = await self.get_last_version()
         if not last_version:
             return None
         version = last_version.version
         return int(version.split("_", 1)[0])
 
-    @classmethod
-    async def generate_version(cls, name: str | None = None) -> str:
+    async def generate_version(self, name: str | None = None) -> str:
         now = datetime.now().strftime("%Y%m%d%H%M%S").replace("/", "")
-        last_version_num = await cls._get_last_version_num()
+        last_version_num = await self._get_last_version_num()
         if last_version_num is None:
             return f"0_{now}_init.py"
         version = f"{last_version_num + 1}_{now}_{name}.py"
@@ -133,20 +171,18 @@ class Migrate:
             raise ValueError(f"Version name exceeds maximum length ({MAX_VERSION_LENGTH})")
         return version
 
-    @classmethod
-    async def _generate_diff_py(cls, name) -> str:
-        version = await cls.generate_version(name)
+    async def _generate_diff_py(self, name) -> str:
+        version = await self.generate_version(name)
         # delete if same version exists
-        for version_file in cls.get_all_version_files():
+        for version_file in self.get_all_version_files():
             if version_file.startswith(version.split("_")[0]):
-                os.unlink(Path(cls.migrate_location, version_file))
+                os.unlink(Path(self.migrate_location, version_file))
 
-        content = cls._get_diff_file_content()
-        Path(cls.migrate_location, version).write_text(content, encoding="utf-8")
+        content = self._get_diff_file_content()
+        Path(self.migrate_location, version).write_text(content, encoding="utf-8")
         return version
 
-    @classmethod
-    def _exclude_extra_field_types(cls, diffs) -> list[tuple]:
+    def _exclude_extra_field_types(self, diffs) -> list[tuple]:
         # Exclude changes of db_field_types that is not about the current dialect, e.g.:
         # {"db_field_types": {
         #   "oracle": "VARCHAR(255)" --> "oracle": "NVARCHAR2(255)"
@@ -157,34 +193,44 @@ class Migrate:
             if not (
                 len(c) == 3
                 and c[1] == "db_field_types"
-                and not ({i[0] for i in c[2]} & {cls.dialect, ""})
+                and not ({i[0] for i in c[2]} & {self.dialect, ""})
             )
         ]
 
-    @classmethod
-    async def migrate(cls, name: str, empty: bool) -> str:
+    async def migrate(self, name: str, empty: bool) -> str:
         """
         diff old models and new models to generate diff content
         :param name: str name for migration
         :param empty: bool if True generates empty migration
         :return:
         """
+        self._reset_operators()
         if empty:
-            return await cls._generate_diff_py(name)
-        new_version_content = get_models_describe(cls.app)
-        last_version = cast(dict, cls._last_version_content)
-        cls.diff_models(last_version, new_version_content)
-        cls.diff_models(new_version_content, last_version, False)
+            return await self._generate_diff_py(name)
+        new_version_content = get_models_describe(self.app)
+        last_version = cast(dict, self._last_version_content)
+        with self.hooks.span(HookEvent.diff_models, app=self.app, upgrade=True):
+            self.diff_models(last_version, new_version_content)
+        with self.hooks.span(HookEvent.diff_models, app=self.app, upgrade=False):
+            self.diff_models(new_version_content, last_version, False)
 
-        cls._merge_operators()
+        self._merge_operators()
 
-        if not cls.upgrade_operators:
+        if not self.upgrade_operators:
             return ""
 
-        return await cls._generate_diff_py(name)
+        return await self._generate_diff_py(name)
 
-    @classmethod
-    def _get_diff_file_content(cls) -> str:
+    def _reset_operators(self) -> None:
+        self.upgrade_operators = []
+        self.downgrade_operators = []
+        self._upgrade_fk_m2m_index_operators = []
+        self._downgrade_fk_m2m_index_operators = []
+        self._upgrade_m2m = []
+        self._downgrade_m2m = []
+        self._rename_fields = {}
+
+    def _get_diff_file_content(self) -> str:
         """
         builds content for diff file from template
         """
@@ -195,12 +241,13 @@ class Migrate:
             return ";\n        ".join(lines) + ";"
 
         return MIGRATE_TEMPLATE.format(
-            upgrade_sql=join_lines(cls.upgrade_operators),
-            downgrade_sql=join_lines(cls.downgrade_operators),
+            upgrade_sql=join_lines(self.upgrade_operators),
+            downgrade_sql=join_lines(self.downgrade_operators),
         )
 
-    @classmethod
-    def _add_operator(cls, operator: str, upgrade: bool = True, fk_m2m_index: bool = False) -> None:
+    def _add_operator(
+        self, operator: str, upgrade: bool = True, fk_m2m_index: bool = False
+    ) -> None:
         """
         add operator,differentiate fk because fk is order limit
         :param operator:
@@ -211,17 +258,16 @@ class Migrate:
         operator = operator.rstrip(";")
         if upgrade:
             if fk_m2m_index:
-                cls._upgrade_fk_m2m_index_operators.append(operator)
+                self._upgrade_fk_m2m_index_operators.append(operator)
             else:
-                cls.upgrade_operators.append(operator)
+                self.upgrade_operators.append(operator)
         else:
             if fk_m2m_index:
-                cls._downgrade_fk_m2m_index_operators.append(operator)
+                self._downgrade_fk_m2m_index_operators.append(operator)
             else:
-                cls.downgrade_operators.append(operator)
+                self.downgrade_operators.append(operator)
 
-    @classmethod
-    def _handle_indexes(cls, model: type[Model], indexes: list[tuple[str] | Index]) -> list:
+    def _handle_indexes(self, model: type[Model], indexes: list[tuple[str] | Index]) -> list:
         if tortoise.__version__ > "0.22.2":
             # The min version of tortoise is '0.11.0', so we can compare it by a `>`,
             # tortoise>0.22.2 have __eq__/__hash__ with Index class since 313ee76.
@@ -242,10 +288,9 @@ class Migrate:
                     setattr(index_cls, "__eq__", _eq)
         return indexes
 
-    @classmethod
-    def _get_indexes(cls, model, model_describe: dict) -> set[Index | tuple[str, ...]]:
+    def _get_indexes(self, model, model_describe: dict) -> set[Index | tuple[str, ...]]:
         indexes: set[Index | tuple[str, ...]] = set()
-        for x in cls._handle_indexes(model, model_describe.get("indexes", [])):
+        for x in self._handle_indexes(model, model_describe.get("indexes", [])):
             if isinstance(x, Index):
                 indexes.add(x)
             elif isinstance(x, dict):
@@ -259,9 +304,8 @@ class Migrate:
         # TODO: Check whether field includes required fk columns
         pass
 
-    @classmethod
     def _handle_m2m_fields(
-        cls, old_model_describe: dict, new_model_describe: dict, model, new_models, upgrade=True
+        self, old_model_describe: dict, new_model_describe: dict, model, new_models, upgrade=True
     ) -> None:
         old_m2m_fields = cast("list[dict]", old_model_describe.get("m2m_fields", []))
         new_m2m_fields = cast("list[dict]", new_model_describe.get("m2m_fields", []))
@@ -285,35 +329,34 @@ class Migrate:
                 add = False
                 if upgrade:
                     if field := new_tables.get(table):
-                        cls._validate_custom_m2m_through(field)
-                    elif table not in cls._upgrade_m2m:
-                        cls._upgrade_m2m.append(table)
+                        self._validate_custom_m2m_through(field)
+                    elif table not in self._upgrade_m2m:
+                        self._upgrade_m2m.append(table)
                         add = True
                 else:
-                    if table not in cls._downgrade_m2m:
-                        cls._downgrade_m2m.append(table)
+                    if table not in self._downgrade_m2m:
+                        self._downgrade_m2m.append(table)
                         add = True
                 if add:
                     ref_desc = cast(dict, new_models.get(new_value.get("model_name")))
-                    cls._add_operator(
-                        cls.create_m2m(model, new_value, ref_desc),
+                    self._add_operator(
+                        self.create_m2m(model, new_value, ref_desc),
                         upgrade,
                         fk_m2m_index=True,
                     )
             elif action == "remove":
                 add = False
-                if upgrade and table not in cls._upgrade_m2m:
-                    cls._upgrade_m2m.append(table)
+                if upgrade and table not in self._upgrade_m2m:
+                    self._upgrade_m2m.append(table)
                     add = True
-                elif not upgrade and table not in cls._downgrade_m2m:
-                    cls._downgrade_m2m.append(table)
+                elif not upgrade and table not in self._downgrade_m2m:
+                    self._downgrade_m2m.append(table)
                     add = True
                 if add:
-                    cls._add_operator(cls.drop_m2m(table), upgrade, True)
+                    self._add_operator(self.drop_m2m(table), upgrade, True)
 
-    @classmethod
     def _handle_relational(
-        cls,
+        self,
         key: str,
         old_model_describe: dict,
         new_model_describe: dict,
@@ -330,24 +373,23 @@ class Migrate:
 
         # add
         for new_fk_field_name in set(new_fk_fields_name).difference(set(old_fk_fields_name)):
-            fk_field = cls.get_field_by_name(new_fk_field_name, new_fk_fields)
+            fk_field = self.get_field_by_name(new_fk_field_name, new_fk_fields)
             if fk_field.get("db_constraint"):
                 ref_describe = cast(dict, new_models[fk_field["python_type"]])
-                sql = cls._add_fk(model, fk_field, ref_describe)
-                cls._add_operator(sql, upgrade, fk_m2m_index=True)
+                sql = self._add_fk(model, fk_field, ref_describe)
+                self._add_operator(sql, upgrade, fk_m2m_index=True)
         # drop
         for old_fk_field_name in set(old_fk_fields_name).difference(set(new_fk_fields_name)):
-            old_fk_field = cls.get_field_by_name(
+            old_fk_field = self.get_field_by_name(
                 old_fk_field_name, cast("list[dict]", old_fk_fields)
             )
             if old_fk_field.get("db_constraint"):
                 ref_describe = cast(dict, old_models[old_fk_field["python_type"]])
-                sql = cls._drop_fk(model, old_fk_field, ref_describe)
-                cls._add_operator(sql, upgrade, fk_m2m_index=True)
+                sql = self._drop_fk(model, old_fk_field, ref_describe)
+                self._add_operator(sql, upgrade, fk_m2m_index=True)
 
-    @classmethod
     def _handle_fk_fields(
-        cls,
+        self,
         old_model_describe: dict,
         new_model_describe: dict,
         model: type[Model],
@@ -356,13 +398,12 @@ class Migrate:
         upgrade=True,
     ) -> None:
         key = "fk_fields"
-        cls._handle_relational(
+        self._handle_relational(
             key, old_model_describe, new_model_describe, model, old_models, new_models, upgrade
         )
 
-    @classmethod
     def _handle_o2o_fields(
-        cls,
+        self,
         old_model_describe: dict,
         new_model_describe: dict,
         model: type[Model],
@@ -371,13 +412,12 @@ class Migrate:
         upgrade=True,
     ) -> None:
         key = "o2o_fields"
-        cls._handle_relational(
+        self._handle_relational(
             key, old_model_describe, new_model_describe, model, old_models, new_models, upgrade
         )
 
-    @classmethod
     def diff_models(
-        cls, old_models: dict[str, dict], new_models: dict[str, dict], upgrade=True
+        self, old_models: dict[str, dict], new_models: dict[str, dict], upgrade=True
     ) -> None:
         """
         diff models and add operators
@@ -386,19 +426,20 @@ class Migrate:
         :param upgrade:
         :return:
         """
-        _aerich = f"{cls.app}.{cls._aerich}"
-        old_models.pop(_aerich, None)
-        new_models.pop(_aerich, None)
+        for name in self._aerich_models:
+            _aerich = f"{self.app}.{name}"
+            old_models.pop(_aerich, None)
+            new_models.pop(_aerich, None)
         models_with_rename_field: set[str] = set()  # models that trigger the click.prompt
 
         for new_model_str, new_model_describe in new_models.items():
             if upgrade and new_model_describe.get("managed") is False:
                 continue
-            model = cls._get_model(new_model_describe["name"].split(".")[1])
+            model = self._get_model(new_model_describe["name"].split(".")[1])
             if new_model_str not in old_models:
                 if upgrade:
-                    cls._add_operator(cls.add_model(model), upgrade)
-                    cls._handle_m2m_fields({}, new_model_describe, model, new_models, upgrade)
+                    self._add_operator(self.add_model(model), upgrade)
+                    self._handle_m2m_fields({}, new_model_describe, model, new_models, upgrade)
                 else:
                     # we can't find origin model when downgrade, so skip
                     pass
@@ -410,7 +451,7 @@ class Migrate:
                 new_table = cast(str, new_model_describe.get("table"))
                 old_table = cast(str, old_model_describe.get("table"))
                 if new_table != old_table:
-                    cls._add_operator(cls.rename_table(model, old_table, new_table), upgrade)
+                    self._add_operator(self.rename_table(model, old_table, new_table), upgrade)
                 old_unique_together = set(
                     map(
                         lambda x: tuple(x),
@@ -423,33 +464,33 @@ class Migrate:
                         cast("list[Iterable[str]]", new_model_describe.get("unique_together")),
                     )
                 )
-                old_indexes = cls._get_indexes(model, old_model_describe)
-                new_indexes = cls._get_indexes(model, new_model_describe)
+                old_indexes = self._get_indexes(model, old_model_describe)
+                new_indexes = self._get_indexes(model, new_model_describe)
                 # pk field
-                cls._handle_pk_field_alter(model, old_model_describe, new_model_describe, upgrade)
+                self._handle_pk_field_alter(model, old_model_describe, new_model_describe, upgrade)
                 # fk fields
                 args = (old_model_describe, new_model_describe, model, old_models, new_models)
-                cls._handle_fk_fields(*args, upgrade=upgrade)
+                self._handle_fk_fields(*args, upgrade=upgrade)
                 # o2o fields
-                cls._handle_o2o_fields(*args, upgrade=upgrade)
+                self._handle_o2o_fields(*args, upgrade=upgrade)
                 old_o2o_columns = [i["raw_field"] for i in old_model_describe.get("o2o_fields", [])]
                 new_o2o_columns = [i["raw_field"] for i in new_model_describe.get("o2o_fields", [])]
                 # m2m fields
-                cls._handle_m2m_fields(
+                self._handle_m2m_fields(
                     old_model_describe, new_model_describe, model, new_models, upgrade
                 )
                 # add unique_together
                 for index in new_unique_together.difference(old_unique_together):
-                    cls._add_operator(cls._add_index(model, index, True), upgrade, True)
+                    self._add_operator(self._add_index(model, index, True), upgrade, True)
                 # remove unique_together
                 for index in old_unique_together.difference(new_unique_together):
-                    cls._add_operator(cls._drop_index(model, index, True), upgrade, True)
+                    self._add_operator(self._drop_index(model, index, True), upgrade, True)
                 # add indexes
                 for idx in new_indexes.difference(old_indexes):
-                    cls._add_operator(cls._add_index(model, idx), upgrade, fk_m2m_index=True)
+                    self._add_operator(self._add_index(model, idx), upgrade, fk_m2m_index=True)
                 # remove indexes
                 for idx in old_indexes.difference(new_indexes):
-                    cls._add_operator(cls._drop_index(model, idx), upgrade, fk_m2m_index=True)
+                    self._add_operator(self._drop_index(model, idx), upgrade, fk_m2m_index=True)
                 old_data_fields = list(
                     filter(
                         lambda x: x.get("db_field_types") is not None,
@@ -470,7 +511,7 @@ class Migrate:
                 for new_data_field_name in set(new_data_fields_name).difference(
                     set(old_data_fields_name)
                 ):
-                    new_data_field = cls.get_field_by_name(new_data_field_name, new_data_fields)
+                    new_data_field = self.get_field_by_name(new_data_field_name, new_data_fields)
                     is_rename = False
                     field_type = new_data_field.get("field_type")
                     db_column = new_data_field.get("db_column")
@@ -484,7 +525,7 @@ class Migrate:
                             len(new_name.symmetric_difference(set(f.get("name", "")))),
                         ),
                     ):
-                        changes = cls._exclude_extra_field_types(
+                        changes = self._exclude_extra_field_types(
                             diff(old_data_field, new_data_field)
                         )
                         old_data_field_name = cast(str, old_data_field.get("name"))
@@ -499,7 +540,7 @@ class Migrate:
                             ):
                                 if upgrade:
                                     if (
-                                        rename_fields := cls._rename_fields.get(new_model_str)
+                                        rename_fields := self._rename_fields.get(new_model_str)
                                     ) and (
                                         old_data_field_name in rename_fields
                                         or new_data_field_name in rename_fields.values()
@@ -520,11 +561,11 @@ class Migrate:
                                     )
                                     if is_rename:
                                         if rename_fields is None:
-                                            rename_fields = cls._rename_fields[new_model_str] = {}
+                                            rename_fields = self._rename_fields[new_model_str] = {}
                                         rename_fields[old_data_field_name] = new_data_field_name
                                 else:
                                     is_rename = False
-                                    if rename_to := cls._rename_fields.get(new_model_str, {}).get(
+                                    if rename_to := self._rename_fields.get(new_model_str, {}).get(
                                         new_data_field_name
                                     ):
                                         is_rename = True
@@ -533,36 +574,36 @@ class Migrate:
                                 if is_rename:
                                     # only MySQL8+ has rename syntax
                                     if (
-                                        cls.dialect == "mysql"
-                                        and cls._db_version
-                                        and cls._db_version.startswith("5.")
+                                        self.dialect == "mysql"
+                                        and self._db_version
+                                        and self._db_version.startswith("5.")
                                     ):
-                                        cls._add_operator(
-                                            cls._change_field(
+                                        self._add_operator(
+                                            self._change_field(
                                                 model, old_data_field, new_data_field
                                             ),
                                             upgrade,
                                         )
                                     else:
-                                        cls._add_operator(
-                                            cls._rename_field(model, *changes[1][2]),
+                                        self._add_operator(
+                                            self._rename_field(model, *changes[1][2]),
                                             upgrade,
                                         )
                     if not is_rename:
-                        cls._add_operator(cls._add_field(model, new_data_field), upgrade)
+                        self._add_operator(self._add_field(model, new_data_field), upgrade)
                         if (
                             new_data_field["indexed"]
                             and new_data_field["db_column"] not in new_o2o_columns
                         ):
-                            cls._add_operator(
-                                cls._add_index(
+                            self._add_operator(
+                                self._add_index(
                                     model, (new_data_field["db_column"],), new_data_field["unique"]
                                 ),
                                 upgrade,
                                 True,
                             )
                 # remove fields
-                rename_fields = cls._rename_fields.get(new_model_str)
+                rename_fields = self._rename_fields.get(new_model_str)
                 for old_data_field_name in set(old_data_fields_name).difference(
                     set(new_data_fields_name)
                 ):
@@ -572,10 +613,10 @@ class Migrate:
                         or (not upgrade and old_data_field_name in rename_fields.values())
                     ):
                         continue
-                    old_data_field = cls.get_field_by_name(old_data_field_name, old_data_fields)
+                    old_data_field = self.get_field_by_name(old_data_field_name, old_data_fields)
                     db_column = cast(str, old_data_field["db_column"])
-                    cls._add_operator(
-                        cls._remove_field(model, db_column),
+                    self._add_operator(
+                        self._remove_field(model, db_column),
                         upgrade,
                     )
                     if (
@@ -583,26 +624,25 @@ class Migrate:
                         and old_data_field["db_column"] not in old_o2o_columns
                     ):
                         is_unique_field = old_data_field.get("unique")
-                        cls._add_operator(
-                            cls._drop_index(model, {db_column}, is_unique_field),
+                        self._add_operator(
+                            self._drop_index(model, {db_column}, is_unique_field),
                             upgrade,
                             True,
                         )
 
                 # change fields
                 for field_name in set(new_data_fields_name).intersection(set(old_data_fields_name)):
-                    cls._handle_field_changes(
+                    self._handle_field_changes(
                         model, field_name, old_data_fields, new_data_fields, upgrade
                     )
 
         for old_model in old_models.keys() - new_models.keys():
             if not upgrade and old_models[old_model].get("managed") is False:
                 continue
-            cls._add_operator(cls.drop_model(old_models[old_model]["table"]), upgrade)
+            self._add_operator(self.drop_model(old_models[old_model]["table"]), upgrade)
 
-    @classmethod
     def _handle_pk_field_alter(
-        cls,
+        self,
         model: type[Model],
         old_model_describe: dict[str, dict],
         new_model_describe: dict[str, dict],
@@ -610,16 +650,16 @@ class Migrate:
     ) -> None:
         old_pk_field = old_model_describe.get("pk_field", {})
         new_pk_field = new_model_describe.get("pk_field", {})
-        changes = cls._exclude_extra_field_types(diff(old_pk_field, new_pk_field))
+        changes = self._exclude_extra_field_types(diff(old_pk_field, new_pk_field))
         sqls: list[str] = []
         for action, option, change in changes:
             if action != "change":
                 continue
             if option == "db_column":
                 # rename pk
-                sql = cls._rename_field(model, *change)
+                sql = self._rename_field(model, *change)
             elif option == "constraints.max_length":
-                sql = cls._modify_field(model, new_pk_field)
+                sql = self._modify_field(model, new_pk_field)
             elif option == "field_type":
                 # Only support change field type between int fields, e.g.: IntField -> BigIntField
                 if not all(field_type.endswith("IntField") for field_type in change):
@@ -632,27 +672,26 @@ class Migrate:
                         )
                         click.secho(msg, fg=Color.yellow)
                     return
-                sql = cls._modify_field(model, new_pk_field)
+                sql = self._modify_field(model, new_pk_field)
             else:
                 # Skip option like 'constraints.ge', 'constraints.le', 'db_field_types.'
                 continue
             sqls.append(sql)
         for sql in sorted(sqls, key=lambda x: "RENAME" not in x):
             # TODO: alter references field in m2m table
-            cls._add_operator(sql, upgrade)
+            self._add_operator(sql, upgrade)
 
-    @classmethod
     def _handle_field_changes(
-        cls,
+        self,
         model: type[Model],
         field_name: str,
         old_data_fields: list[dict],
         new_data_fields: list[dict],
         upgrade: bool,
     ) -> None:
-        old_data_field = cls.get_field_by_name(field_name, old_data_fields)
-        new_data_field = cls.get_field_by_name(field_name, new_data_fields)
-        changes = cls._exclude_extra_field_types(diff(old_data_field, new_data_field))
+        old_data_field = self.get_field_by_name(field_name, old_data_fields)
+        new_data_field = self.get_field_by_name(field_name, new_data_fields)
+        changes = self._exclude_extra_field_types(diff(old_data_field, new_data_field))
         options = {c[1] for c in changes}
         modified = False
         for change in changes:
@@ -661,63 +700,59 @@ class Migrate:
                 # change index
                 if old_new[0] is False and old_new[1] is True:
                     unique = new_data_field.get("unique")
-                    cls._add_operator(cls._add_index(model, (field_name,), unique), upgrade, True)
+                    self._add_operator(self._add_index(model, (field_name,), unique), upgrade, True)
                 else:
                     unique = old_data_field.get("unique")
-                    cls._add_operator(cls._drop_index(model, (field_name,), unique), upgrade, True)
+                    self._add_operator(
+                        self._drop_index(model, (field_name,), unique), upgrade, True
+                    )
             elif option == "db_field_types.":
                 if new_data_field.get("field_type") == "DecimalField":
                     # modify column
-                    cls._add_operator(cls._modify_field(model, new_data_field), upgrade)
+                    self._add_operator(self._modify_field(model, new_data_field), upgrade)
             elif option == "default":
                 if not (is_default_function(old_new[0]) or is_default_function(old_new[1])):
                     # change column default
-                    cls._add_operator(cls._alter_default(model, new_data_field), upgrade)
+                    self._add_operator(self._alter_default(model, new_data_field), upgrade)
             elif option == "unique":
                 if "indexed" in options:
                     # indexed include it
                     continue
                 # Change unique for indexed field, e.g.: `db_index=True, unique=False` --> `db_index=True, unique=True`
                 drop_unique = old_new[0] is True and old_new[1] is False
-                for sql in cls.ddl.alter_indexed_column_unique(model, field_name, drop_unique):
-                    cls._add_operator(sql, upgrade, True)
+                for sql in self.ddl.alter_indexed_column_unique(model, field_name, drop_unique):
+                    self._add_operator(sql, upgrade, True)
             elif option == "nullable":
                 # change nullable
-                cls._add_operator(cls._alter_null(model, new_data_field), upgrade)
+                self._add_operator(self._alter_null(model, new_data_field), upgrade)
             elif option == "description":
                 # change comment
-                cls._add_operator(cls._set_comment(model, new_data_field), upgrade)
+                self._add_operator(self._set_comment(model, new_data_field), upgrade)
             else:
                 if modified:
                     continue
                 # modify column
-                cls._add_operator(cls._modify_field(model, new_data_field), upgrade)
+                self._add_operator(self._modify_field(model, new_data_field), upgrade)
                 modified = True
 
-    @classmethod
-    def rename_table(cls, model: type[Model], old_table_name: str, new_table_name: str) -> str:
-        return cls.ddl.rename_table(model, old_table_name, new_table_name)
+    def rename_table(self, model: type[Model], old_table_name: str, new_table_name: str) -> str:
+        return self.ddl.rename_table(model, old_table_name, new_table_name)
 
-    @classmethod
-    def add_model(cls, model: type[Model]) -> str:
-        return cls.ddl.create_table(model)
+    def add_model(self, model: type[Model]) -> str:
+        return self.ddl.create_table(model)
 
-    @classmethod
-    def drop_model(cls, table_name: str) -> str:
-        return cls.ddl.drop_table(table_name)
+    def drop_model(self, table_name: str) -> str:
+        return self.ddl.drop_table(table_name)
 
-    @classmethod
     def create_m2m(
-        cls, model: type[Model], field_describe: dict, reference_table_describe: dict
+        self, model: type[Model], field_describe: dict, reference_table_describe: dict
     ) -> str:
-        return cls.ddl.create_m2m(model, field_describe, reference_table_describe)
+        return self.ddl.create_m2m(model, field_describe, reference_table_describe)
 
-    @classmethod
-    def drop_m2m(cls, table_name: str) -> str:
-        return cls.ddl.drop_m2m(table_name)
+    def drop_m2m(self, table_name: str) -> str:
+        return self.ddl.drop_m2m(table_name)
 
-    @classmethod
-    def _resolve_fk_fields_name(cls, model: type[Model], fields_name: Iterable[str]) -> list[str]:
+    def _resolve_fk_fields_name(self, model: type[Model], fields_name: Iterable[str]) -> list[str]:
         ret = []
         for field_name in fields_name:
             try:
@@ -733,12 +768,11 @@ class Migrate:
             ret.append(field_name)
         return ret
 
-    @classmethod
     def _drop_index(
-        cls, model: type[Model], fields_name: Iterable[str] | Index, unique=False
+        self, model: type[Model], fields_name: Iterable[str] | Index, unique=False
     ) -> str:
         if isinstance(fields_name, Index):
-            if cls.dialect == "mysql":
+            if self.dialect == "mysql":
                 # schema_generator of MySQL return a empty index sql
                 if hasattr(fields_name, "field_names"):
                     # tortoise>=0.24
@@ -747,19 +781,18 @@ class Migrate:
                     # TODO: remove else when drop support for tortoise<0.24
                     if not (fields := fields_name.fields):
                         fields = [getattr(i, "get_sql")() for i in fields_name.expressions]
-                return cls.ddl.drop_index(model, fields, unique, name=fields_name.name)
-            return cls.ddl.drop_index_by_name(
-                model, fields_name.index_name(cls.ddl.schema_generator, model)
+                return self.ddl.drop_index(model, fields, unique, name=fields_name.name)
+            return self.ddl.drop_index_by_name(
+                model, fields_name.index_name(self.ddl.schema_generator, model)
             )
-        field_names = cls._resolve_fk_fields_name(model, fields_name)
-        return cls.ddl.drop_index(model, field_names, unique)
+        field_names = self._resolve_fk_fields_name(model, fields_name)
+        return self.ddl.drop_index(model, field_names, unique)
 
-    @classmethod
     def _add_index(
-        cls, model: type[Model], fields_name: Iterable[str] | Index, unique=False
+        self, model: type[Model], fields_name: Iterable[str] | Index, unique=False
     ) -> str:
         if isinstance(fields_name, Index):
-            if cls.dialect == "mysql":
+            if self.dialect == "mysql":
                 # schema_generator of MySQL return a empty index sql
                 if hasattr(fields_name, "field_names"):
                     # tortoise>=0.24
@@ -768,72 +801,62 @@ class Migrate:
                     # TODO: remove else when drop support for tortoise<0.24
                     if not (fields := fields_name.fields):
                         fields = [getattr(i, "get_sql")() for i in fields_name.expressions]
-                return cls.ddl.add_index(
+                return self.ddl.add_index(
                     model,
                     fields,
                     name=fields_name.name,
                     index_type=fields_name.INDEX_TYPE,
                     extra=fields_name.extra,
                 )
-            sql = fields_name.get_sql(cls.ddl.schema_generator, model, safe=True)
+            sql = fields_name.get_sql(self.ddl.schema_generator, model, safe=True)
             if tortoise.__version__ < "0.24":
                 sql = sql.replace("  ", " ")
-                if cls.dialect == "postgres" and (exists := "IF NOT EXISTS ") not in sql:
+                if self.dialect == "postgres" and (exists := "IF NOT EXISTS ") not in sql:
                     idx = " INDEX "
                     sql = sql.replace(idx, idx + exists)
             return sql
-        field_names = cls._resolve_fk_fields_name(model, fields_name)
-        return cls.ddl.add_index(model, field_names, unique)
+        field_names = self._resolve_fk_fields_name(model, fields_name)
+        return self.ddl.add_index(model, field_names, unique)
 
-    @classmethod
-    def _add_field(cls, model: type[Model], field_describe: dict, is_pk: bool = False) -> str:
-        return cls.ddl.add_column(model, field_describe, is_pk)
+    def _add_field(self, model: type[Model], field_describe: dict, is_pk: bool = False) -> str:
+        return self.ddl.add_column(model, field_describe, is_pk)
 
-    @classmethod
-    def _alter_default(cls, model: type[Model], field_describe: dict) -> str:
-        return cls.ddl.alter_column_default(model, field_describe)
+    def _alter_default(self, model: type[Model], field_describe: dict) -> str:
+        return self.ddl.alter_column_default(model, field_describe)
 
-    @classmethod
-    def _alter_null(cls, model: type[Model], field_describe: dict) -> str:
-        return cls.ddl.alter_column_null(model, field_describe)
+    def _alter_null(self, model: type[Model], field_describe: dict) -> str:
+        return self.ddl.alter_column_null(model, field_describe)
 
-    @classmethod
-    def _set_comment(cls, model: type[Model], field_describe: dict) -> str:
-        return cls.ddl.set_comment(model, field_describe)
+    def _set_comment(self, model: type[Model], field_describe: dict) -> str:
+        return self.ddl.set_comment(model, field_describe)
 
-    @classmethod
-    def _modify_field(cls, model: type[Model], field_describe: dict) -> str:
-        return cls.ddl.modify_column(model, field_describe)
+    def _modify_field(self, model: type[Model], field_describe: dict) -> str:
+        return self.ddl.modify_column(model, field_describe)
 
-    @classmethod
     def _drop_fk(
-        cls, model: type[Model], field_describe: dict, reference_table_describe: dict
+        self, model: type[Model], field_describe: dict, reference_table_describe: dict
     ) -> str:
-        return cls.ddl.drop_fk(model, field_describe, reference_table_describe)
+        return self.ddl.drop_fk(model, field_describe, reference_table_describe)
 
-    @classmethod
-    def _remove_field(cls, model: type[Model], column_name: str) -> str:
-        return cls.ddl.drop_column(model, column_name)
+    def _remove_field(self, model: type[Model], column_name: str) -> str:
+        return self.ddl.drop_column(model, column_name)
 
-    @classmethod
-    def _rename_field(cls, model: type[Model], old_field_name: str, new_field_name: str) -> str:
-        return cls.ddl.rename_column(model, old_field_name, new_field_name)
+    def _rename_field(self, model: type[Model], old_field_name: str, new_field_name: str) -> str:
+        return self.ddl.rename_column(model, old_field_name, new_field_name)
 
-    @classmethod
     def _change_field(
-        cls, model: type[Model], old_field_describe: dict, new_field_describe: dict
+        self, model: type[Model], old_field_describe: dict, new_field_describe: dict
     ) -> str:
         db_field_types = cast(dict, new_field_describe.get("db_field_types"))
-        return cls.ddl.change_column(
+        return self.ddl.change_column(
             model,
             cast(str, old_field_describe.get("db_column")),
             cast(str, new_field_describe.get("db_column")),
-            cast(str, db_field_types.get(cls.dialect) or db_field_types.get("")),
+            cast(str, db_field_types.get(self.dialect) or db_field_types.get("")),
         )
 
-    @classmethod
     def _add_fk(
-        cls, model: type[Model], field_describe: dict, reference_table_describe: dict
+        self, model: type[Model], field_describe: dict, reference_table_describe: dict
     ) -> str:
         """
         add fk
@@ -842,22 +865,21 @@ class Migrate:
         :param reference_table_describe:
         :return:
         """
-        return cls.ddl.add_fk(model, field_describe, reference_table_describe)
+        return self.ddl.add_fk(model, field_describe, reference_table_describe)
 
-    @classmethod
-    def _merge_operators(cls) -> None:
+    def _merge_operators(self) -> None:
         """
         fk/m2m/index must be last when add,first when drop
         :return:
         """
-        for _upgrade_fk_m2m_operator in cls._upgrade_fk_m2m_index_operators:
+        for _upgrade_fk_m2m_operator in self._upgrade_fk_m2m_index_operators:
             if "ADD" in _upgrade_fk_m2m_operator or "CREATE" in _upgrade_fk_m2m_operator:
-                cls.upgrade_operators.append(_upgrade_fk_m2m_operator)
+                self.upgrade_operators.append(_upgrade_fk_m2m_operator)
             else:
-                cls.upgrade_operators.insert(0, _upgrade_fk_m2m_operator)
+                self.upgrade_operators.insert(0, _upgrade_fk_m2m_operator)
 
-        for _downgrade_fk_m2m_operator in cls._downgrade_fk_m2m_index_operators:
+        for _downgrade_fk_m2m_operator in self._downgrade_fk_m2m_index_operators:
             if "ADD" in _downgrade_fk_m2m_operator or "CREATE" in _downgrade_fk_m2m_operator:
-                cls.downgrade_operators.append(_downgrade_fk_m2m_operator)
+                self.downgrade_operators.append(_downgrade_fk_m2m_operator)
             else:
-                cls.downgrade_operators.insert(0, _downgrade_fk_m2m_operator)
+                self.downgrade_operators.insert(0, _downgrade_fk_m2m_operator)
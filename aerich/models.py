@@ -4,6 +4,7 @@ from aerich.coder import decoder, encoder
 
 MAX_VERSION_LENGTH = 255
 MAX_APP_LENGTH = 100
+MAX_STATEMENT_LENGTH = 255
 
 
 class Aerich(Model):
@@ -13,3 +14,32 @@ class Aerich(Model):
 
     class Meta:
         ordering = ["-id"]
+
+
+class AerichStats(Model):
+    """Timing of every statement that executed by `aerich upgrade --stats`"""
+
+    version = fields.CharField(max_length=MAX_VERSION_LENGTH)
+    app = fields.CharField(max_length=MAX_APP_LENGTH)
+    statement_index = fields.IntField()
+    statement_hash = fields.CharField(max_length=64)
+    statement = fields.CharField(max_length=MAX_STATEMENT_LENGTH)
+    duration = fields.FloatField(description="Seconds")
+    rows = fields.IntField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "aerich_stats"
+        ordering = ["-id"]
+
+
+class AerichCheckpoint(Model):
+    """The last finished statement of the migration that is upgrading without transaction"""
+
+    version = fields.CharField(max_length=MAX_VERSION_LENGTH)
+    app = fields.CharField(max_length=MAX_APP_LENGTH)
+    statement_index = fields.IntField()
+    statement_hash = fields.CharField(max_length=64)
+
+    class Meta:
+        table = "aerich_checkpoint"
@@ -0,0 +1,109 @@
+"""
+Central registry of the versions of many databases (e.g.: shards, tenants), it lives in a
+dedicated connection, so that the versions of all the targets can be queried in one place.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from copy import deepcopy
+
+from tortoise import Model, fields
+from tortoise.exceptions import IntegrityError
+from tortoise.functions import Max
+
+from aerich.coder import JsonEncoder, decoder, encoder
+from aerich.models import MAX_APP_LENGTH, MAX_VERSION_LENGTH
+
+# Name of both the Tortoise app and the connection of the registry
+REGISTRY_APP = "aerich_registry"
+MAX_TARGET_LENGTH = 255
+
+
+class AerichSnapshot(Model):
+    """Models describe of versions, the same content is only saved once"""
+
+    hash = fields.CharField(max_length=64, unique=True)
+    content: dict = fields.JSONField(encoder=encoder, decoder=decoder)
+
+    class Meta:
+        app = REGISTRY_APP
+        table = "aerich_snapshot"
+
+
+class AerichVersion(Model):
+    """Applied version of an app in a target"""
+
+    target = fields.CharField(max_length=MAX_TARGET_LENGTH)
+    app = fields.CharField(max_length=MAX_APP_LENGTH)
+    version = fields.CharField(max_length=MAX_VERSION_LENGTH)
+    snapshot: fields.ForeignKeyRelation[AerichSnapshot] = fields.ForeignKeyField(
+        f"{REGISTRY_APP}.AerichSnapshot", related_name="versions"
+    )
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        app = REGISTRY_APP
+        table = "aerich_version"
+        unique_together = (("target", "app", "version"),)
+        indexes = (("app", "target"),)
+        ordering = ["-id"]
+
+
+def add_registry(config: dict, db_url: str) -> dict:
+    """
+    add the registry app and connection to a copy of the tortoise config
+    :param config: tortoise config
+    :param db_url: url of the registry database
+    :return: the new config
+    """
+    config = deepcopy(config)
+    config.setdefault("connections", {})[REGISTRY_APP] = db_url
+    config["apps"][REGISTRY_APP] = {
+        "models": ["aerich.registry"],
+        "default_connection": REGISTRY_APP,
+    }
+    return config
+
+
+async def _get_snapshot(content: dict) -> AerichSnapshot:
+    text = json.dumps(content, cls=JsonEncoder, sort_keys=True)
+    content_hash = hashlib.sha256(text.encode()).hexdigest()
+    if snapshot := await AerichSnapshot.get_or_none(hash=content_hash):
+        return snapshot
+    try:
+        return await AerichSnapshot.create(hash=content_hash, content=content)
+    except IntegrityError:
+        # Created by another target at the same time
+        return await AerichSnapshot.get(hash=content_hash)
+
+
+async def save_version(target: str, app: str, version: str, content: dict) -> None:
+    snapshot = await _get_snapshot(content)
+    await AerichVersion.filter(target=target, app=app, version=version).delete()
+    await AerichVersion.create(target=target, app=app, version=version, snapshot=snapshot)
+
+
+async def delete_versions(target: str, app: str, versions: list[str]) -> None:
+    await AerichVersion.filter(target=target, app=app, version__in=versions).delete()
+
+
+async def get_last_version(target: str, app: str) -> AerichVersion | None:
+    return await AerichVersion.filter(target=target, app=app).select_related("snapshot").first()
+
+
+async def get_target_versions(app: str) -> dict[str, str]:
+    """
+    get the last version of each target
+    :param app: name of the app
+    :return: {target: version}
+    """
+    last_ids = (
+        await AerichVersion.filter(app=app)
+        .annotate(last_id=Max("id"))
+        .group_by("target")
+        .values_list("last_id", flat=True)
+    )
+    versions = await AerichVersion.filter(id__in=last_ids).order_by("target")
+    return {v.target: v.version for v in versions}
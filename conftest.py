@@ -3,7 +3,7 @@ from __future__ import annotations
 import asyncio
 import os
 import sys
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 from pathlib import Path
 
 import pytest
@@ -13,6 +13,7 @@ from tortoise.backends.mysql.schema_generator import MySQLSchemaGenerator
 from tortoise.backends.sqlite.schema_generator import SqliteSchemaGenerator
 from tortoise.contrib.test import MEMORY_SQLITE
 
+from aerich.ddl import BaseDDL
 from aerich.ddl.mysql import MysqlDDL
 from aerich.ddl.postgres import PostgresDDL
 from aerich.ddl.sqlite import SqliteDDL
@@ -33,16 +34,6 @@ tortoise_orm = {
 }
 
 
-@pytest.fixture(scope="function", autouse=True)
-def reset_migrate() -> None:
-    Migrate.upgrade_operators = []
-    Migrate.downgrade_operators = []
-    Migrate._upgrade_fk_m2m_index_operators = []
-    Migrate._downgrade_fk_m2m_index_operators = []
-    Migrate._upgrade_m2m = []
-    Migrate._downgrade_m2m = []
-
-
 @pytest.fixture(scope="session")
 def event_loop() -> Generator:
     policy = asyncio.get_event_loop_policy()
@@ -59,15 +50,39 @@ def event_loop() -> Generator:
 @pytest.fixture(scope="session", autouse=True)
 async def initialize_tests(event_loop, request) -> None:
     await init_db(tortoise_orm)
+    request.addfinalizer(lambda: event_loop.run_until_complete(Tortoise._drop_databases()))
+
+
+@pytest.fixture
+async def fresh_db() -> AsyncGenerator[None]:
+    """
+    Run the test with empty databases, and recreate the tables of the models after it. The
+    in-memory SQLite databases are emptied whenever the connections are closed, but MySQL and
+    PostgreSQL keep the tables and the rows of aerich that each test made
+    """
+    await init_db(tortoise_orm, generate_schemas=False)
+    yield
+    await init_db(tortoise_orm)
+
+
+@pytest.fixture
+def ddl() -> BaseDDL:
     client = Tortoise.get_connection("default")
     if client.schema_generator is MySQLSchemaGenerator:
-        Migrate.ddl = MysqlDDL(client)
-    elif client.schema_generator is SqliteSchemaGenerator:
-        Migrate.ddl = SqliteDDL(client)
-    elif issubclass(client.schema_generator, BasePostgresSchemaGenerator):
-        Migrate.ddl = PostgresDDL(client)
-    Migrate.dialect = Migrate.ddl.DIALECT
-    request.addfinalizer(lambda: event_loop.run_until_complete(Tortoise._drop_databases()))
+        return MysqlDDL(client)
+    if client.schema_generator is SqliteSchemaGenerator:
+        return SqliteDDL(client)
+    if issubclass(client.schema_generator, BasePostgresSchemaGenerator):
+        return PostgresDDL(client)
+    raise NotImplementedError(client.schema_generator)
+
+
+@pytest.fixture
+def migrate(ddl: BaseDDL) -> Migrate:
+    """Migrate of the "models" app that uses the DDL of the default connection"""
+    migrate = Migrate("models")
+    migrate.ddl, migrate.dialect = ddl, ddl.DIALECT
+    return migrate
 
 
 @pytest.fixture
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from asyncclick import UsageError
+
+from aerich.cli import _check_upgrade_options, upgrade
+
+
+async def check_upgrade_args(*args: str) -> None:
+    ctx = await upgrade.make_context("upgrade", list(args))
+    _check_upgrade_options(ctx.params)
+
+
+@pytest.mark.parametrize(
+    "args,message",
+    [
+        (["--targets", "{targets}", "--schema", "s1"], "--targets and --schema"),
+        (["--all-apps", "--schema-pattern", "tenant_%"], "--all-apps and --schema"),
+        (["--fake", "--stats", "--retries", "1"], "can not be used with --stats, --retries"),
+        (["--atomic-batch", "-i", "False"], "always runs in a transaction"),
+        (["--schema", "s1", "-i", "False"], "always upgraded in transactions"),
+        (["--checkpoint"], "--checkpoint only works with --in-transaction False"),
+        (["--atomic-batch", "--no-resume"], "--no-resume only works with --checkpoint"),
+        (["--relaxed-durability"], "only works with --atomic-batch"),
+        (["--retry-budget", "10"], "--retry-budget only works with --retries"),
+    ],
+)
+async def test_check_upgrade_options(tmp_path: Path, args: list[str], message: str) -> None:
+    targets = tmp_path / "targets.toml"
+    targets.touch()
+    with pytest.raises(UsageError, match=message):
+        await check_upgrade_args(*(arg.format(targets=targets) for arg in args))
+
+
+async def test_check_upgrade_options_valid() -> None:
+    await check_upgrade_args()
+    await check_upgrade_args("-i", "False", "--checkpoint", "--no-resume")
+    await check_upgrade_args("--schema", "s1", "--schema-pattern", "tenant_%")
+    await check_upgrade_args("--atomic-batch", "--relaxed-durability", "--stats")
+    await check_upgrade_args("--all-apps", "--retries", "3", "--retry-budget", "10")
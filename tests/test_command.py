@@ -1,6 +1,77 @@
+import asyncio
+import contextlib
+import shutil
+import sqlite3
+from collections.abc import AsyncIterator, Callable
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from tortoise import BaseDBAsyncClient, Tortoise, generate_schema_for_client
+from tortoise.exceptions import OperationalError
+from tortoise.transactions import in_transaction
+
+import aerich.compare
 from aerich import Command
+from aerich.enums import HookEvent, HookStage, Resource
+from aerich.exceptions import NotSupportError, UpgradeError
+from aerich.executor import RetryPolicy
+from aerich.hooks import Event, Hooks
+from aerich.models import Aerich, AerichCheckpoint, AerichStats
+from aerich.registry import AerichSnapshot, AerichVersion
+from aerich.utils import get_models_describe
 from conftest import tortoise_orm
 
+UPGRADE_SQL = """from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return \"\"\"
+        CREATE TABLE stats_foo (id INT NOT NULL PRIMARY KEY, name VARCHAR(20) NOT NULL);
+        -- it's a comment;
+        INSERT INTO stats_foo (id, name) VALUES (1, 'a;b'), (2, 'c');
+        DROP TABLE stats_foo;\"\"\"
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return \"\"\"\"\"\"
+"""
+
+
+SQL_TEMPLATE = """from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return \"\"\"
+        {upgrade}\"\"\"
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return \"\"\"
+        {downgrade}\"\"\"
+"""
+TABLE_SQL = SQL_TEMPLATE.format(
+    upgrade="CREATE TABLE {table} (id INT NOT NULL PRIMARY KEY);",
+    downgrade="DROP TABLE {table};",
+)
+pytestmark = pytest.mark.usefixtures("fresh_db")
+VERSION = "1_20250101000000_update.py"
+WriteMigration = Callable[..., Path]
+
+
+@pytest.fixture
+def write_migration(tmp_path: Path) -> WriteMigration:
+    """Write a migration file into the migrations directory of the app under tmp_path"""
+
+    def write(content: str, version: str = VERSION, app: str = "models") -> Path:
+        migrations_dir = tmp_path / app
+        migrations_dir.mkdir(exist_ok=True)
+        migration_file = migrations_dir / version
+        migration_file.write_text(content)
+        return migration_file
+
+    return write
+
 
 async def test_command(mocker):
     mocker.patch("os.listdir", return_value=[])
@@ -9,3 +80,433 @@ async def test_command(mocker):
         heads = await command.heads()
     assert history == []
     assert heads == []
+
+
+async def test_init_resource(tmp_path: Path, write_migration: WriteMigration) -> None:
+    version = write_migration(UPGRADE_SQL).name
+    events: list[Event] = []
+    hooks = Hooks()
+    hooks.add(events.append, HookEvent.snapshot_load)
+    command = Command(tortoise_orm, location=str(tmp_path), hooks=hooks)
+    # Nothing is initialized for the commands that only read the files
+    await command.init(Resource.filesystem)
+    assert await command.history() == [version]
+    try:
+        await command.init(Resource.version_index)
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+        assert events == []
+        assert await command.heads() == [version]
+        # The snapshot is loaded by the first command that needs it
+        await command.migrate(empty=True)
+        await command.init(Resource.version_index)
+        await command.init(Resource.snapshot)
+        assert [e.stage for e in events] == [HookStage.before, HookStage.after]
+    finally:
+        await command.close()
+
+
+async def test_upgrade_with_stats(tmp_path: Path, write_migration: WriteMigration) -> None:
+    version = write_migration(UPGRADE_SQL).name
+    events: list[Event] = []
+
+    def on_event(event: Event) -> None:
+        if event.stage == HookStage.after:
+            events.append(event)
+
+    hooks = Hooks()
+    hooks.add(on_event)
+    async with Command(tortoise_orm, location=str(tmp_path), hooks=hooks) as command:
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+        assert await command.upgrade(stats=True) == [version]
+        assert [e.name for e in events] == [
+            HookEvent.snapshot_load,
+            *[HookEvent.statement] * 3,
+            HookEvent.migration,
+            HookEvent.upgrade,
+        ]
+        assert events[-1].data["migrated"] == [version]
+        assert events[-2].data["version"] == version
+        assert await Aerich.filter(version=version).exists()
+        records = await AerichStats.filter(version=version).order_by("statement_index")
+        assert [r.statement_index for r in records] == [0, 1, 2]
+        assert records[0].statement.startswith("CREATE TABLE stats_foo")
+        assert records[1].statement.startswith("-- it's a comment;")
+        # The asyncpg client of tortoise only counts the rows of UPDATE and DELETE
+        if Tortoise.get_connection("default").schema_generator.DIALECT != "postgres":
+            assert records[1].rows == 2
+        assert all(r.duration >= 0 for r in records)
+        migrations, statements = await command.stats(limit=2)
+        assert [m["version"] for m in migrations] == [version]
+        assert migrations[0]["statements"] == 3
+        assert len(statements) == 2
+        assert statements[0].duration >= statements[1].duration
+
+
+async def test_upgrade_with_lock_timeout(tmp_path: Path, write_migration: WriteMigration) -> None:
+    version = write_migration(UPGRADE_SQL).name
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+        migrated = await command.upgrade(
+            run_in_transaction=False, lock_timeout=1, retry=RetryPolicy(retries=1)
+        )
+        assert migrated == [version]
+        assert await Aerich.filter(version=version).exists()
+
+
+async def test_upgrade_retry_in_transaction(
+    tmp_path: Path, write_migration: WriteMigration
+) -> None:
+    # DDL of MySQL releases the savepoints implicitly
+    version = write_migration(UPGRADE_SQL).name
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+        migrated = await command.upgrade(
+            run_in_transaction=True, lock_timeout=1, retry=RetryPolicy(retries=1)
+        )
+        assert migrated == [version]
+        assert await Aerich.filter(version=version).exists()
+
+
+RESUME_SQL = """from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return \"\"\"
+        CREATE TABLE resume_foo (id INT NOT NULL PRIMARY KEY);
+        INSERT INTO resume_bar (id) VALUES (1);
+        DROP TABLE resume_foo;\"\"\"
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return \"\"\"\"\"\"
+"""
+
+
+async def test_upgrade_resume(tmp_path: Path, write_migration: WriteMigration) -> None:
+    migration_file = write_migration(RESUME_SQL)
+    version = migration_file.name
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        conn = Tortoise.get_connection("default")
+        await generate_schema_for_client(conn, safe=True)
+        # Nothing is recorded without opting in
+        with pytest.raises(Exception, match="resume_bar"):
+            await command.upgrade(run_in_transaction=False)
+        assert not await AerichCheckpoint.exists()
+        await conn.execute_script("DROP TABLE IF EXISTS resume_foo")
+        with pytest.raises(NotSupportError):
+            await command.upgrade(checkpoint=True)
+        with pytest.raises(Exception, match="resume_bar"):
+            await command.upgrade(run_in_transaction=False, checkpoint=True)
+        checkpoint = await AerichCheckpoint.get(version=version)
+        assert checkpoint.statement_index == 0
+        assert not await Aerich.filter(version=version).exists()
+        # The migration file is changed, can not resume it
+        migration_file.write_text(RESUME_SQL.replace("resume_foo (id", "resume_foo (pk"))
+        with pytest.raises(UpgradeError, match="failed at statement #1"):
+            await command.upgrade(run_in_transaction=False, checkpoint=True)
+        migration_file.write_text(RESUME_SQL)
+        await conn.execute_script("CREATE TABLE resume_bar (id INT NOT NULL PRIMARY KEY)")
+        try:
+            # resume_foo is not created again
+            assert await command.upgrade(run_in_transaction=False, checkpoint=True) == [version]
+            assert await Aerich.filter(version=version).exists()
+            assert not await AerichCheckpoint.exists()
+            assert await conn.execute_query_dict("SELECT id FROM resume_bar") == [{"id": 1}]
+        finally:
+            await conn.execute_script("DROP TABLE resume_bar")
+
+
+async def test_upgrade_all_apps(tmp_path: Path, write_migration: WriteMigration) -> None:
+    version = VERSION
+    for app in tortoise_orm["apps"]:
+        write_migration(UPGRADE_SQL.replace("stats_foo", f"{app}_foo"), app=app)
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+        results = await command.upgrade_all_apps()
+        assert [(r.app, r.migrated, r.error) for r in results] == [
+            ("models", [version], None),
+            ("models_second", [version], None),
+        ]
+        assert await Aerich.filter(version=version, app="models_second").exists()
+        # Apps on the same connection are not upgraded after a failure
+        version2 = "2_20250102000000_update.py"
+        write_migration(UPGRADE_SQL.replace("CREATE TABLE stats_foo", "CREATE TABLE"), version2)
+        write_migration(UPGRADE_SQL.replace("stats_foo", "second_bar"), version2, "models_second")
+        results = await command.upgrade_all_apps()
+        assert results[0].app == "models" and results[0].error is not None
+        if Tortoise.get_connection("default").schema_generator.DIALECT == "sqlite":
+            assert isinstance(results[1].error, UpgradeError)
+        else:
+            assert results[1] == ("models_second", [version2], None)
+
+
+async def test_migrate_apps_concurrently(tmp_path: Path) -> None:
+    apps = list(tortoise_orm["apps"])
+    for app in apps:
+        tmp_path.joinpath(app).mkdir()
+    commands = [Command(tortoise_orm, app, str(tmp_path)) for app in apps]
+    await commands[0].init()
+    try:
+        versions = await asyncio.gather(*(c.migrate("empty", empty=True) for c in commands))
+        for app, version in zip(apps, versions):
+            assert [p.name for p in tmp_path.joinpath(app).iterdir()] == [version]
+        assert commands[0]._migrate.app != commands[1]._migrate.app
+    finally:
+        await commands[0].close()
+
+
+async def test_upgrade_targets(tmp_path: Path, write_migration: WriteMigration) -> None:
+    if Tortoise.get_connection("default").schema_generator.DIALECT != "sqlite":
+        pytest.skip("Targets are SQLite databases")
+    version = write_migration(UPGRADE_SQL).name
+    targets = {
+        name: f"sqlite://{tmp_path / name}.sqlite3" for name in ("shard_1", "shard_2", "shard_3")
+    }
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+        schema_generator = Aerich._meta.db.schema_generator(Aerich._meta.db)
+        aerich_table = schema_generator._get_table_sql(Aerich, safe=True)["table_creation_string"]
+        for name in ("shard_1", "shard_2"):
+            with sqlite3.connect(tmp_path / f"{name}.sqlite3") as conn:
+                conn.executescript(aerich_table)
+        results = [r async for r in command.upgrade_targets(targets, concurrency=2)]
+        assert sorted((r.target, r.migrated, r.error is None) for r in results) == [
+            ("shard_1", [version], True),
+            ("shard_2", [version], True),
+            ("shard_3", [], False),
+        ]
+        # The default connection is not touched
+        assert not await Aerich.filter(version=version).exists()
+    with sqlite3.connect(tmp_path / "shard_1.sqlite3") as conn:
+        rows = conn.execute("SELECT version, app FROM aerich").fetchall()
+    assert rows == [(version, "models")]
+
+
+async def test_upgrade_schemas(tmp_path: Path, write_migration: WriteMigration) -> None:
+    version = write_migration(UPGRADE_SQL).name
+    registry = f"sqlite://{tmp_path / 'registry.sqlite3'}"
+    async with Command(tortoise_orm, location=str(tmp_path), registry=registry) as command:
+        conn = Tortoise.get_connection("default")
+        if conn.schema_generator.DIALECT != "postgres":
+            with pytest.raises(NotSupportError):
+                [r async for r in command.upgrade_schemas(["tenant_1"])]
+            return
+        # The schemas of new tenants have no `aerich` table, it is created by the first version
+        schema_generator = Aerich._meta.db.schema_generator(Aerich._meta.db)
+        aerich_table = schema_generator._get_table_sql(Aerich, safe=True)["table_creation_string"]
+        init_version = write_migration(
+            SQL_TEMPLATE.format(upgrade=aerich_table, downgrade=""), "0_20250101000000_init.py"
+        ).name
+        schemas = ["aerich_tenant_1", "aerich_tenant_2"]
+        for schema in schemas:
+            await conn.execute_script(f"CREATE SCHEMA {schema}")
+        try:
+            assert await command.get_schemas("aerich_tenant_%") == schemas
+            results = [r async for r in command.upgrade_schemas(schemas, concurrency=2)]
+            assert sorted(results) == [
+                (schema, [init_version, version], None) for schema in schemas
+            ]
+            for schema in schemas:
+                _, rows = await conn.execute_query(
+                    f"SELECT version FROM {schema}.aerich ORDER BY id"
+                )
+                assert [row["version"] for row in rows] == [init_version, version]
+            # Recorded in the registry after the transaction of each schema is committed
+            assert await command.get_registry_versions() == {s: version for s in schemas}
+        finally:
+            for schema in schemas:
+                await conn.execute_script(f"DROP SCHEMA {schema} CASCADE")
+
+
+async def test_upgrade_with_registry(tmp_path: Path, write_migration: WriteMigration) -> None:
+    version = write_migration(UPGRADE_SQL).name
+    last_version = write_migration(
+        TABLE_SQL.format(table="registry_foo"), "2_20250101000001_update.py"
+    ).name
+    registry = f"sqlite://{tmp_path / 'registry.sqlite3'}"
+    async with Command(tortoise_orm, location=str(tmp_path), registry=registry) as command:
+        assert "aerich_registry" not in tortoise_orm["apps"]
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+
+        @contextlib.asynccontextmanager
+        async def failed_commit(connection_name: str) -> AsyncIterator[BaseDBAsyncClient]:
+            async with in_transaction(connection_name) as conn:
+                yield conn
+                raise OperationalError("commit failed")
+
+        # The version is only recorded in the registry once it is committed
+        patch = mock.patch("aerich.command.in_transaction", failed_commit)
+        # Per statement, as executescript() of sqlite commits the pending transaction
+        with patch, pytest.raises(OperationalError, match="commit failed"):
+            await command.upgrade(per_statement=True)
+        assert not await AerichVersion.exists()
+        assert await command.upgrade(per_statement=True) == [version, last_version]
+        assert await command.get_registry_versions() == {"default": last_version}
+        assert await AerichSnapshot.all().count() == 1
+        assert await command.downgrade(-1, delete=True) == [last_version]
+        assert await command.get_registry_versions() == {"default": version}
+    events: list[Event] = []
+    hooks = Hooks()
+    hooks.add(events.append, HookEvent.snapshot_load)
+    # The snapshot is loaded from the registry, the default in-memory database is empty now
+    async with Command(tortoise_orm, location=str(tmp_path), hooks=hooks, registry=registry):
+        assert events[-1].data == {"app": "models", "version": version, "registry": True}
+
+
+async def test_upgrade_all_apps_with_registry(
+    tmp_path: Path, write_migration: WriteMigration
+) -> None:
+    for app in tortoise_orm["apps"]:
+        write_migration(UPGRADE_SQL.replace("stats_foo", f"{app}_registry"), app=app)
+    registry = f"sqlite://{tmp_path / 'registry.sqlite3'}"
+    async with Command(
+        tortoise_orm, location=str(tmp_path), registry=registry, registry_target="primary"
+    ) as command:
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+        results = await command.upgrade_all_apps()
+        assert [(r.app, r.error) for r in results] == [("models", None), ("models_second", None)]
+        records = await AerichVersion.all().order_by("app").values_list("target", "app", "version")
+        assert records == [("primary", "models", VERSION), ("second", "models_second", VERSION)]
+
+
+async def test_downgrade_batch(tmp_path: Path, write_migration: WriteMigration) -> None:
+    versions = [f"{i}_2025010100000{i}_update.py" for i in range(3)]
+    for i, version in enumerate(versions):
+        write_migration(TABLE_SQL.format(table=f"batch_{i}"), version)
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+        assert await command.upgrade() == versions
+        sql = await command.downgrade_sql(1)
+        assert sql.index("-- 2_") < sql.index("DROP TABLE batch_2") < sql.index("-- 1_")
+        assert "DROP TABLE batch_0" not in sql
+        assert sql.rstrip().endswith(";") and "DELETE FROM" in sql
+        # Nothing is executed by the dry run
+        assert await Aerich.filter(app="models").count() == 3
+        assert await command.downgrade(1, delete=True, batch=True) == versions[:0:-1]
+        assert [a.version for a in await Aerich.filter(app="models")] == versions[:1]
+        assert [p.name for p in (tmp_path / "models").iterdir()] == versions[:1]
+
+
+async def test_upgrade_atomic_batch(tmp_path: Path, write_migration: WriteMigration) -> None:
+    versions = [f"{i}_2025010100000{i}_update.py" for i in range(3)]
+    for i, version in enumerate(versions):
+        # The last one fails because the table is created by the first one
+        write_migration(TABLE_SQL.format(table=f"atomic_{i % 2}"), version)
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        conn = Tortoise.get_connection("default")
+        if conn.schema_generator.DIALECT not in ("postgres", "sqlite"):
+            with pytest.raises(NotSupportError):
+                await command.upgrade(atomic_batch=True)
+            return
+        await generate_schema_for_client(conn, safe=True)
+        with pytest.raises(NotSupportError):
+            await command.upgrade(run_in_transaction=False, atomic_batch=True)
+        with pytest.raises(Exception, match="atomic_0"):
+            await command.upgrade(atomic_batch=True)
+        # All the versions are rolled back
+        assert not await Aerich.filter(app="models").exists()
+        with pytest.raises(Exception, match="atomic_0"):
+            await conn.execute_query("SELECT * FROM atomic_0")
+        write_migration(TABLE_SQL.format(table="atomic_2"), versions[2])
+        assert await command.upgrade(atomic_batch=True, relaxed_durability=True) == versions
+        assert [a.version for a in await Aerich.filter(app="models").order_by("id")] == versions
+        assert await command.upgrade(atomic_batch=True) == []
+
+
+async def test_upgrade_sql(tmp_path: Path, write_migration: WriteMigration) -> None:
+    versions = [f"{i}_2025010100000{i}_update.py" for i in range(3)]
+    for i, version in enumerate(versions):
+        write_migration(TABLE_SQL.format(table=f"bundle_{i}"), version)
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        conn = Tortoise.get_connection("default")
+        await generate_schema_for_client(conn, safe=True)
+        chunks = [c async for c in command.upgrade_sql(from_version=1, to_version=1)]
+        assert len(chunks) == 1 and chunks[0].startswith(f"-- {versions[1]}\n")
+        await command.upgrade()
+        await Aerich.filter(version__in=versions[1:]).delete()
+        await conn.execute_script("DROP TABLE bundle_1; DROP TABLE bundle_2")
+        # Only the pending versions by default
+        bundle = "".join([c async for c in command.upgrade_sql()])
+        assert bundle.index("CREATE TABLE bundle_1") < bundle.index("CREATE TABLE bundle_2")
+        assert "bundle_0" not in bundle
+        await conn.execute_script(bundle)
+        records = await Aerich.filter(app="models").order_by("id")
+        assert [a.version for a in records] == versions
+        assert records[2].content == records[0].content
+        assert await command.heads() == []
+        assert [c async for c in command.upgrade_sql()] == []
+
+
+async def test_adopt(tmp_path: Path) -> None:
+    if Tortoise.get_connection("default").schema_generator.DIALECT != "sqlite":
+        pytest.skip("The adopted database is a SQLite file")
+    # The tables are created by another tool, and aerich has not been used
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        await generate_schema_for_client(Tortoise.get_connection("default"), safe=True)
+        conn = Tortoise.get_connection("default")
+        await conn.execute_script('DROP TABLE aerich; ALTER TABLE "user" ADD COLUMN age INT')
+        result = await command.adopt()
+        assert result.version is None
+        assert [str(m) for m in result.mismatches] == ["user.age: column is not in the models"]
+        assert not (tmp_path / "models").exists()
+        result = await command.adopt(force=True)
+        assert result.version is not None and result.version.startswith("0_")
+        assert len(result.mismatches) == 1
+        assert await Aerich.filter(app="models").values_list("version", flat=True) == [
+            result.version
+        ]
+        content = (tmp_path / "models" / result.version).read_text()
+        assert 'CREATE TABLE IF NOT EXISTS "user"' in content
+        with pytest.raises(FileExistsError):
+            await command.adopt(force=True)
+        # Without the migration files, adopting again would record a baseline on top of the
+        # history in the aerich table
+        shutil.rmtree(tmp_path / "models")
+        with pytest.raises(NotSupportError, match="already has versions"):
+            await command.adopt(force=True)
+        assert not (tmp_path / "models").exists()
+        assert await Aerich.filter(app="models").count() == 1
+
+
+async def test_drift(tmp_path: Path, mocker) -> None:
+    if Tortoise.get_connection("default").schema_generator.DIALECT != "sqlite":
+        pytest.skip("The tables are altered by SQLite statements")
+    cache_file = tmp_path / "drift.json"
+    async with Command(tortoise_orm, location=str(tmp_path)) as command:
+        conn = Tortoise.get_connection("default")
+        await generate_schema_for_client(conn, safe=True)
+        assert await command.drift() == (None, [])
+        version = "0_20250101000000_init.py"
+        await Aerich.create(version=version, app="models", content=get_models_describe("models"))
+        assert await command.drift(cache_file) == (version, [])
+        # A hotfix that is applied by hand
+        await conn.execute_script('ALTER TABLE "user" ADD COLUMN age INT')
+        compare_table = mocker.spy(aerich.compare, "compare_table")
+        result = await command.drift(cache_file)
+        assert [str(m) for m in result.mismatches] == ["user.age: column is not in the models"]
+        assert [c.args[0] for c in compare_table.call_args_list] == ["user"]
+        # Nothing changed, the result of the last run is reused
+        compare_table.reset_mock()
+        assert (await command.drift(cache_file)).mismatches == result.mismatches
+        assert compare_table.call_count == 0
+        await conn.execute_script("DROP INDEX idx_category_slug_e9bcff")
+        result = await command.drift(cache_file)
+        assert [str(m) for m in result.mismatches] == [
+            "category: index on (slug) is missing from the database",
+            "user.age: column is not in the models",
+        ]
+        assert [c.args[0] for c in compare_table.call_args_list] == ["category"]
+        # Without cache all the tables are compared
+        compare_table.reset_mock()
+        assert (await command.drift()).mismatches == result.mismatches
+        assert compare_table.call_count > 2
+        # A table that is created by hand
+        await conn.execute_script("CREATE TABLE legacy (id INT NOT NULL PRIMARY KEY)")
+        try:
+            for cache in (cache_file, None):
+                assert [str(m) for m in (await command.drift(cache)).mismatches] == [
+                    *map(str, result.mismatches),
+                    "legacy: table is not in the models",
+                ]
+        finally:
+            await conn.execute_script("DROP TABLE legacy")
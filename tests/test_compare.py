@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from aerich.compare import Mismatch, compare_table, get_tables, normalize_type
+from aerich.inspectdb import Column, Index
+from aerich.utils import get_models_describe
+from tests.models import Category
+
+
+def _column(name: str, data_type: str, **kwargs) -> Column:
+    options = {"null": False, "default": None, "pk": False, "unique": False, "index": False}
+    return Column(name=name, data_type=data_type, **dict(options, **kwargs))
+
+
+def test_normalize_type() -> None:
+    assert normalize_type("VARCHAR(20)", "postgres") == ("VARCHAR", "20")
+    assert normalize_type("INT", "postgres") == normalize_type("int4", "postgres")
+    assert normalize_type("DOUBLE PRECISION", "postgres") == ("FLOAT8", None)
+    assert normalize_type("BOOL", "mysql") == normalize_type("tinyint", "mysql")
+
+
+def test_get_tables() -> None:
+    tables = get_tables(get_models_describe("models"), exclude=["aerich"])
+    assert tables["category"] is not None
+    # Through tables of many-to-many fields
+    assert tables["config_category_map"] is None
+    # Unmanaged models and the excluded tables are skipped
+    assert "dontmanageme" not in tables
+    assert "aerich" not in tables
+
+
+def test_compare_table() -> None:
+    columns = [
+        _column("id", "int4", pk=True),
+        _column("slug", "varchar", length=100, index=True),
+        _column("name", "varchar", length=100, null=True),
+        _column("title", "text"),
+        _column("created_at", "timestamptz", null=True),
+        _column("owner_id", "int4", unique=True),
+        _column("extra", "int4"),
+    ]
+    indexes = [
+        Index(name="idx_category_slug", columns=["slug"], unique=False),
+        Index(name="idx_category_name_title", columns=["name", "title"], unique=False),
+    ]
+    mismatches = compare_table("category", Category.describe(), columns, indexes, "postgres")
+    assert mismatches == [
+        Mismatch("category", "name", "length is 200 in the models, 100 in the database"),
+        Mismatch("category", "title", "type is VARCHAR(20) in the models, text in the database"),
+        Mismatch("category", "created_at", "NOT NULL in the models, nullable in the database"),
+        Mismatch("category", "owner_id", "not unique in the models, unique in the database"),
+        Mismatch("category", "extra", "column is not in the models"),
+        Mismatch(
+            "category",
+            None,
+            "index idx_category_name_title on (name, title) is not in the models",
+        ),
+    ]
+    assert str(mismatches[0]) == "category.name: length is 200 in the models, 100 in the database"
+    # The index of Meta is missing
+    mismatches = compare_table("category", Category.describe(), columns, indexes[1:], "postgres")
+    assert Mismatch("category", None, "index on (slug) is missing from the database") in mismatches
@@ -3,13 +3,12 @@ import tortoise
 from aerich.ddl.mysql import MysqlDDL
 from aerich.ddl.postgres import PostgresDDL
 from aerich.ddl.sqlite import SqliteDDL
-from aerich.migrate import Migrate
 from tests.models import Category, Product, User
 
 
-def test_create_table():
-    ret = Migrate.ddl.create_table(Category)
-    if isinstance(Migrate.ddl, MysqlDDL):
+def test_create_table(ddl):
+    ret = ddl.create_table(Category)
+    if isinstance(ddl, MysqlDDL):
         if tortoise.__version__ >= "0.24":
             assert (
                 ret
@@ -39,7 +38,7 @@ def test_create_table():
 CREATE FULLTEXT INDEX `idx_category_slug_e9bcff` ON `category` (`slug`)"""
         )
 
-    elif isinstance(Migrate.ddl, SqliteDDL):
+    elif isinstance(ddl, SqliteDDL):
         exists = "IF NOT EXISTS " if tortoise.__version__ >= "0.24" else ""
         assert (
             ret
@@ -54,7 +53,7 @@ CREATE FULLTEXT INDEX `idx_category_slug_e9bcff` ON `category` (`slug`)"""
 CREATE INDEX {exists}"idx_category_slug_e9bcff" ON "category" ("slug")"""
         )
 
-    elif isinstance(Migrate.ddl, PostgresDDL):
+    elif isinstance(ddl, PostgresDDL):
         assert (
             ret
             == """CREATE TABLE IF NOT EXISTS "category" (
@@ -70,45 +69,43 @@ COMMENT ON COLUMN "category"."owner_id" IS 'User'"""
         )
 
 
-def test_drop_table():
-    ret = Migrate.ddl.drop_table(Category._meta.db_table)
-    if isinstance(Migrate.ddl, MysqlDDL):
+def test_drop_table(ddl):
+    ret = ddl.drop_table(Category._meta.db_table)
+    if isinstance(ddl, MysqlDDL):
         assert ret == "DROP TABLE IF EXISTS `category`"
     else:
         assert ret == 'DROP TABLE IF EXISTS "category"'
 
 
-def test_add_column():
-    ret = Migrate.ddl.add_column(Category, Category._meta.fields_map.get("name").describe(False))
-    if isinstance(Migrate.ddl, MysqlDDL):
+def test_add_column(ddl):
+    ret = ddl.add_column(Category, Category._meta.fields_map.get("name").describe(False))
+    if isinstance(ddl, MysqlDDL):
         assert ret == "ALTER TABLE `category` ADD `name` VARCHAR(200)"
     else:
         assert ret == 'ALTER TABLE "category" ADD "name" VARCHAR(200)'
     # add unique column
-    ret = Migrate.ddl.add_column(User, User._meta.fields_map.get("username").describe(False))
-    if isinstance(Migrate.ddl, MysqlDDL):
+    ret = ddl.add_column(User, User._meta.fields_map.get("username").describe(False))
+    if isinstance(ddl, MysqlDDL):
         assert ret == "ALTER TABLE `user` ADD `username` VARCHAR(20) NOT NULL UNIQUE"
-    elif isinstance(Migrate.ddl, PostgresDDL):
+    elif isinstance(ddl, PostgresDDL):
         assert ret == 'ALTER TABLE "user" ADD "username" VARCHAR(20) NOT NULL UNIQUE'
     else:
         assert ret == 'ALTER TABLE "user" ADD "username" VARCHAR(20) NOT NULL'
 
 
-def test_modify_column():
-    if isinstance(Migrate.ddl, SqliteDDL):
+def test_modify_column(ddl):
+    if isinstance(ddl, SqliteDDL):
         return
 
-    ret0 = Migrate.ddl.modify_column(
-        Category, Category._meta.fields_map.get("name").describe(False)
-    )
-    ret1 = Migrate.ddl.modify_column(User, User._meta.fields_map.get("is_active").describe(False))
-    if isinstance(Migrate.ddl, MysqlDDL):
+    ret0 = ddl.modify_column(Category, Category._meta.fields_map.get("name").describe(False))
+    ret1 = ddl.modify_column(User, User._meta.fields_map.get("is_active").describe(False))
+    if isinstance(ddl, MysqlDDL):
         assert ret0 == "ALTER TABLE `category` MODIFY COLUMN `name` VARCHAR(200)"
         assert (
             ret1
             == "ALTER TABLE `user` MODIFY COLUMN `is_active` BOOL NOT NULL COMMENT 'Is Active' DEFAULT 1"
         )
-    elif isinstance(Migrate.ddl, PostgresDDL):
+    elif isinstance(ddl, PostgresDDL):
         assert (
             ret0
             == 'ALTER TABLE "category" ALTER COLUMN "name" TYPE VARCHAR(200) USING "name"::VARCHAR(200)'
@@ -119,72 +116,70 @@ def test_modify_column():
         )
 
 
-def test_alter_column_default():
-    if isinstance(Migrate.ddl, SqliteDDL):
+def test_alter_column_default(ddl):
+    if isinstance(ddl, SqliteDDL):
         return
-    ret = Migrate.ddl.alter_column_default(User, User._meta.fields_map.get("intro").describe(False))
-    if isinstance(Migrate.ddl, PostgresDDL):
+    ret = ddl.alter_column_default(User, User._meta.fields_map.get("intro").describe(False))
+    if isinstance(ddl, PostgresDDL):
         assert ret == 'ALTER TABLE "user" ALTER COLUMN "intro" SET DEFAULT \'\''
-    elif isinstance(Migrate.ddl, MysqlDDL):
+    elif isinstance(ddl, MysqlDDL):
         assert ret == "ALTER TABLE `user` ALTER COLUMN `intro` SET DEFAULT ''"
 
-    ret = Migrate.ddl.alter_column_default(
+    ret = ddl.alter_column_default(
         Category, Category._meta.fields_map.get("created_at").describe(False)
     )
-    if isinstance(Migrate.ddl, PostgresDDL):
+    if isinstance(ddl, PostgresDDL):
         assert (
             ret == 'ALTER TABLE "category" ALTER COLUMN "created_at" SET DEFAULT CURRENT_TIMESTAMP'
         )
-    elif isinstance(Migrate.ddl, MysqlDDL):
+    elif isinstance(ddl, MysqlDDL):
         assert (
             ret
             == "ALTER TABLE `category` ALTER COLUMN `created_at` SET DEFAULT CURRENT_TIMESTAMP(6)"
         )
 
-    ret = Migrate.ddl.alter_column_default(
+    ret = ddl.alter_column_default(
         Product, Product._meta.fields_map.get("view_num").describe(False)
     )
-    if isinstance(Migrate.ddl, PostgresDDL):
+    if isinstance(ddl, PostgresDDL):
         assert ret == 'ALTER TABLE "product" ALTER COLUMN "view_num" SET DEFAULT 0'
-    elif isinstance(Migrate.ddl, MysqlDDL):
+    elif isinstance(ddl, MysqlDDL):
         assert ret == "ALTER TABLE `product` ALTER COLUMN `view_num` SET DEFAULT 0"
 
 
-def test_alter_column_null():
-    if isinstance(Migrate.ddl, (SqliteDDL, MysqlDDL)):
+def test_alter_column_null(ddl):
+    if isinstance(ddl, (SqliteDDL, MysqlDDL)):
         return
-    ret = Migrate.ddl.alter_column_null(
-        Category, Category._meta.fields_map.get("name").describe(False)
-    )
-    if isinstance(Migrate.ddl, PostgresDDL):
+    ret = ddl.alter_column_null(Category, Category._meta.fields_map.get("name").describe(False))
+    if isinstance(ddl, PostgresDDL):
         assert ret == 'ALTER TABLE "category" ALTER COLUMN "name" DROP NOT NULL'
 
 
-def test_set_comment():
-    if isinstance(Migrate.ddl, (SqliteDDL, MysqlDDL)):
+def test_set_comment(ddl):
+    if isinstance(ddl, (SqliteDDL, MysqlDDL)):
         return
-    ret = Migrate.ddl.set_comment(Category, Category._meta.fields_map.get("name").describe(False))
+    ret = ddl.set_comment(Category, Category._meta.fields_map.get("name").describe(False))
     assert ret == 'COMMENT ON COLUMN "category"."name" IS NULL'
 
-    ret = Migrate.ddl.set_comment(Category, Category._meta.fields_map.get("owner").describe(False))
+    ret = ddl.set_comment(Category, Category._meta.fields_map.get("owner").describe(False))
     assert ret == 'COMMENT ON COLUMN "category"."owner_id" IS \'User\''
 
 
-def test_drop_column():
-    ret = Migrate.ddl.drop_column(Category, "name")
-    if isinstance(Migrate.ddl, MysqlDDL):
+def test_drop_column(ddl):
+    ret = ddl.drop_column(Category, "name")
+    if isinstance(ddl, MysqlDDL):
         assert ret == "ALTER TABLE `category` DROP COLUMN `name`"
-    elif isinstance(Migrate.ddl, PostgresDDL):
+    elif isinstance(ddl, PostgresDDL):
         assert ret == 'ALTER TABLE "category" DROP COLUMN "name"'
 
 
-def test_add_index():
-    index = Migrate.ddl.add_index(Category, ["name"])
-    index_u = Migrate.ddl.add_index(Category, ["name"], True)
-    if isinstance(Migrate.ddl, MysqlDDL):
+def test_add_index(ddl):
+    index = ddl.add_index(Category, ["name"])
+    index_u = ddl.add_index(Category, ["name"], True)
+    if isinstance(ddl, MysqlDDL):
         assert index == "ALTER TABLE `category` ADD INDEX `idx_category_name_8b0cb9` (`name`)"
         assert index_u == "ALTER TABLE `category` ADD UNIQUE INDEX `name` (`name`)"
-    elif isinstance(Migrate.ddl, PostgresDDL):
+    elif isinstance(ddl, PostgresDDL):
         assert (
             index == 'CREATE INDEX IF NOT EXISTS "idx_category_name_8b0cb9" ON "category" ("name")'
         )
@@ -197,10 +192,10 @@ def test_add_index():
         assert index_u == 'CREATE UNIQUE INDEX "uid_category_name_8b0cb9" ON "category" ("name")'
 
 
-def test_drop_index():
-    ret = Migrate.ddl.drop_index(Category, ["name"])
-    ret_u = Migrate.ddl.drop_index(Category, ["name"], True)
-    if isinstance(Migrate.ddl, MysqlDDL):
+def test_drop_index(ddl):
+    ret = ddl.drop_index(Category, ["name"])
+    ret_u = ddl.drop_index(Category, ["name"], True)
+    if isinstance(ddl, MysqlDDL):
         assert ret == "ALTER TABLE `category` DROP INDEX `idx_category_name_8b0cb9`"
         assert ret_u == "ALTER TABLE `category` DROP INDEX `name`"
     else:
@@ -208,11 +203,11 @@ def test_drop_index():
         assert ret_u == 'DROP INDEX IF EXISTS "uid_category_name_8b0cb9"'
 
 
-def test_add_fk():
-    ret = Migrate.ddl.add_fk(
+def test_add_fk(ddl):
+    ret = ddl.add_fk(
         Category, Category._meta.fields_map.get("owner").describe(False), User.describe(False)
     )
-    if isinstance(Migrate.ddl, MysqlDDL):
+    if isinstance(ddl, MysqlDDL):
         assert (
             ret
             == "ALTER TABLE `category` ADD CONSTRAINT `fk_category_user_110d4c63` FOREIGN KEY (`owner_id`) REFERENCES `user` (`id`) ON DELETE CASCADE"
@@ -224,13 +219,13 @@ def test_add_fk():
         )
 
 
-def test_drop_fk():
-    ret = Migrate.ddl.drop_fk(
+def test_drop_fk(ddl):
+    ret = ddl.drop_fk(
         Category, Category._meta.fields_map.get("owner").describe(False), User.describe(False)
     )
-    if isinstance(Migrate.ddl, MysqlDDL):
+    if isinstance(ddl, MysqlDDL):
         assert ret == "ALTER TABLE `category` DROP FOREIGN KEY `fk_category_user_110d4c63`"
-    elif isinstance(Migrate.ddl, PostgresDDL):
+    elif isinstance(ddl, PostgresDDL):
         assert ret == 'ALTER TABLE "category" DROP CONSTRAINT IF EXISTS "fk_category_user_110d4c63"'
     else:
         assert ret == 'ALTER TABLE "category" DROP FOREIGN KEY "fk_category_user_110d4c63"'
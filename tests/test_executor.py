@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections.abc import AsyncIterator
+
+import pytest
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+from aerich.enums import HookEvent, HookStage
+from aerich.exceptions import StatementTimeoutError
+from aerich.executor import RetryPolicy, StatementExecutor
+from aerich.hooks import Event, Hooks
+
+
+class FakeClient:
+    def __init__(self, delay: float = 0, errors: list[Exception] | None = None) -> None:
+        self.delay = delay
+        self.errors = errors or []
+        self.queries: list[str] = []
+        self.scripts: list[str] = []
+        self.interrupted = asyncio.Event()
+
+    async def execute_query(self, query: str, values: list | None = None) -> tuple[int, list]:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.interrupted.wait(), self.delay)
+            raise Exception("interrupted")
+        if self.errors:
+            raise self.errors.pop(0)
+        self.queries.append(query)
+        return len(self.queries), []
+
+    async def execute_query_dict(self, query: str, values: list | None = None) -> list[dict]:
+        return [{"id": 7}]
+
+    async def execute_script(self, query: str) -> None:
+        self.scripts.append(query)
+        if query.startswith("KILL QUERY"):
+            self.interrupted.set()
+
+    @contextlib.asynccontextmanager
+    async def acquire_connection(self) -> AsyncIterator[FakeClient]:
+        yield self
+
+    async def interrupt(self) -> None:
+        self.interrupted.set()
+
+
+async def test_execute() -> None:
+    events: list[Event] = []
+    hooks = Hooks()
+    hooks.add(events.append, HookEvent.statement)
+    executor = StatementExecutor("postgres", hooks)
+    client = FakeClient()
+    sql = "CREATE TABLE a (id INT);\n        SELECT $$;$$;"
+    results = await executor.execute(client, sql, version="1_update.py")  # type:ignore[arg-type]
+    assert client.queries == ["CREATE TABLE a (id INT)", "SELECT $$;$$"]
+    assert [(r.position, r.sql, r.rows) for r in results] == [
+        (0, "CREATE TABLE a (id INT)", 1),
+        (1, "SELECT $$;$$", 2),
+    ]
+    assert all(r.duration >= 0 for r in results)
+    after = [e for e in events if e.stage == HookStage.after]
+    assert [e.data["index"] for e in after] == [0, 1]
+    assert after[-1].data == {
+        "sql": "SELECT $$;$$",
+        "index": 1,
+        "total": 2,
+        "version": "1_update.py",
+        "rows": 2,
+    }
+
+
+async def test_execute_timeout() -> None:
+    executor = StatementExecutor("sqlite", timeout=0.01)
+    client = FakeClient(delay=1)
+    with pytest.raises(StatementTimeoutError, match=r"#1 of 1_update.py"):
+        await executor.execute_statement(
+            client,  # type:ignore[arg-type]
+            "SELECT 1",
+            index=1,
+            version="1_update.py",
+        )
+    assert client.queries == []
+    # The statement is interrupted instead of being left running
+    assert client.interrupted.is_set()
+
+
+async def test_execute_timeout_kill() -> None:
+    executor = StatementExecutor("mysql", timeout=0.01)
+    pool = FakeClient()
+    client = FakeClient(delay=1)
+    client._parent = pool  # type:ignore[attr-defined]
+    client.interrupted = pool.interrupted
+    with pytest.raises(StatementTimeoutError):
+        await executor.execute_statement(client, "SELECT 1", in_transaction=True)  # type:ignore[arg-type]
+    # The transaction runs one query at a time, the kill is sent from the pool it is made of
+    assert pool.scripts == ["KILL QUERY 7"]
+    assert client.scripts == []
+
+
+async def test_execute_timeout_stop() -> None:
+    conn = Tortoise.get_connection("default")
+    dialect = conn.schema_generator.DIALECT
+    if dialect == "mysql":
+        # SLEEP() returns 1 when it is killed, so a long query is used instead
+        tables = ", ".join(f"information_schema.COLUMNS c{i}" for i in range(4))
+        sql = f"SELECT count(*) FROM {tables}"
+    elif dialect == "sqlite":
+        sql = (
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1e9) "
+            "SELECT count(*) FROM n"
+        )
+    else:
+        pytest.skip("statement_timeout of PostgreSQL is enforced by the server")
+    executor = StatementExecutor(dialect, timeout=0.2)
+    start = time.perf_counter()
+    with pytest.raises(StatementTimeoutError):
+        await executor.execute_statement(conn, sql)
+    # The statement is stopped on the server instead of being waited for
+    assert time.perf_counter() - start < 5
+    # And the connection is still usable
+    assert await conn.execute_query_dict("SELECT 1 AS one") == [{"one": 1}]
+    # The same in the transaction of the caller
+    start = time.perf_counter()
+    with pytest.raises(StatementTimeoutError):
+        async with in_transaction("default") as tx:
+            await executor.execute_statement(tx, sql, in_transaction=True)
+    assert time.perf_counter() - start < 5
+    assert await conn.execute_query_dict("SELECT 1 AS one") == [{"one": 1}]
+
+
+async def test_execute_retry() -> None:
+    events: list[Event] = []
+    hooks = Hooks()
+    hooks.add(events.append, HookEvent.statement_retry)
+    retry = RetryPolicy(retries=2, base_delay=0.001)
+    executor = StatementExecutor("mysql", hooks, lock_timeout=1.5, retry=retry)
+    client = FakeClient(errors=[Exception("Lock wait timeout exceeded; try restarting")])
+    results = await executor.execute(
+        client,  # type:ignore[arg-type]
+        "UPDATE a SET b = 1;",
+        in_transaction=True,
+        version="1_update.py",
+    )
+    assert [r.sql for r in results] == ["UPDATE a SET b = 1"]
+    # DDL of MySQL releases the savepoints, the failed statement is retried without them
+    assert client.scripts == [
+        "SET SESSION lock_wait_timeout = 2",
+        "SET SESSION lock_wait_timeout = DEFAULT",
+    ]
+    assert len(events) == 1
+    assert events[0].data["attempt"] == 1
+    assert 0 <= events[0].data["delay"] <= 0.001
+    assert "Lock wait timeout" in str(events[0].error)
+    # A deadlock rolls back the whole transaction of MySQL, it can't be retried in it
+    client = FakeClient(errors=[Exception("Deadlock found when trying to get lock")])
+    with pytest.raises(Exception, match="Deadlock"):
+        await executor.execute(client, "UPDATE a SET b = 1;", in_transaction=True)  # type:ignore[arg-type]
+
+    executor = StatementExecutor("postgres", retry=retry)
+    client = FakeClient(errors=[Exception("canceling statement due to lock timeout")])
+    await executor.execute(client, "UPDATE a SET b = 1;", in_transaction=True)  # type:ignore[arg-type]
+    assert client.scripts == [
+        "SAVEPOINT aerich_statement",
+        "ROLLBACK TO SAVEPOINT aerich_statement",
+        "SAVEPOINT aerich_statement",
+        "RELEASE SAVEPOINT aerich_statement",
+    ]
+
+
+async def test_execute_retry_give_up() -> None:
+    def lock_error() -> Exception:
+        return Exception("database is locked")
+
+    executor = StatementExecutor("sqlite", retry=RetryPolicy(retries=2, base_delay=0.001))
+    client = FakeClient(errors=[lock_error() for _ in range(3)])
+    with pytest.raises(Exception, match="database is locked"):
+        await executor.execute_statement(client, "SELECT 1")  # type:ignore[arg-type]
+    assert client.errors == []
+    # Errors other than lock errors are not retried
+    client = FakeClient(errors=[Exception("no such table: a")])
+    with pytest.raises(Exception, match="no such table"):
+        await executor.execute_statement(client, "SELECT 1")  # type:ignore[arg-type]
+    # Give up when the budget is used up
+    retry = RetryPolicy(retries=5, base_delay=10, budget=0)
+    executor = StatementExecutor("sqlite", retry=retry)
+    client = FakeClient(errors=[lock_error()])
+    with pytest.raises(Exception, match="database is locked"):
+        await executor.execute_statement(client, "SELECT 1")  # type:ignore[arg-type]
+
+
+def test_settings_sql() -> None:
+    executor = StatementExecutor("postgres", timeout=3, lock_timeout=0.5)
+    assert executor._settings_sql() == (
+        ["SET LOCAL lock_timeout = '500ms'", "SET LOCAL statement_timeout = '3000ms'"],
+        [],
+    )
+    assert StatementExecutor("sqlite", lock_timeout=2)._settings_sql() == (
+        ["PRAGMA busy_timeout = 2000"],
+        ["PRAGMA busy_timeout = 5000"],
+    )
+    assert StatementExecutor("mysql", timeout=3)._settings_sql() == ([], [])
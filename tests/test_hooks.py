@@ -0,0 +1,59 @@
+import pytest
+
+from aerich.enums import HookEvent, HookStage
+from aerich.hooks import Event, Hooks
+
+
+def test_span() -> None:
+    events: list[Event] = []
+    statements: list[Event] = []
+    hooks = Hooks()
+    hooks.add(events.append)
+    hooks.add(statements.append, HookEvent.statement)
+    with hooks.span(HookEvent.upgrade, app="models") as data:
+        with hooks.span(HookEvent.statement, sql="SELECT 1") as statement_data:
+            statement_data["rows"] = 1
+        data["migrated"] = ["1_update.py"]
+    assert [(e.name, e.stage) for e in events] == [
+        (HookEvent.upgrade, HookStage.before),
+        (HookEvent.statement, HookStage.before),
+        (HookEvent.statement, HookStage.after),
+        (HookEvent.upgrade, HookStage.after),
+    ]
+    assert [e.stage for e in statements] == [HookStage.before, HookStage.after]
+    after = events[-1]
+    assert after.data == {"app": "models", "migrated": ["1_update.py"]}
+    assert after.duration is not None and after.duration >= 0
+    assert after.started_at == events[0].started_at
+    assert after.error is None
+    assert events[0].duration is None
+    assert statements[-1].data["rows"] == 1
+
+
+def test_span_error(caplog) -> None:
+    events: list[Event] = []
+    hooks = Hooks()
+    hooks.add(events.append)
+    with pytest.raises(ValueError), hooks.span(HookEvent.migration, version="1_update.py"):
+        raise ValueError("failed")
+    assert isinstance(events[-1].error, ValueError)
+    hooks.remove(events.append)
+    with hooks.span(HookEvent.migration):
+        pass
+    assert len(events) == 2
+
+    def on_after(event: Event) -> None:
+        if event.stage == HookStage.after:
+            raise RuntimeError("listener failed")
+
+    hooks = Hooks()
+    hooks.add(on_after)
+    hooks.add(events.append)
+    # The error of the body is not replaced by the one of the listener
+    with pytest.raises(ValueError), hooks.span(HookEvent.migration):
+        raise ValueError("failed")
+    assert "listener failed" in caplog.text
+    assert isinstance(events[-1].error, ValueError)
+    # Without an error of the body, the error of the listener is raised
+    with pytest.raises(RuntimeError), hooks.span(HookEvent.migration):
+        pass
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os
+import subprocess  # nosec
+import sys
+
+import pytest
+
+# Seconds that `import aerich.cli` is allowed to take, e.g.: 0.25. It was about 0.4s when
+# tortoise and pydantic were imported eagerly, and about 0.1s after they are deferred. The wall
+# clock time depends on the load of the machine, so it is only checked when the target is set.
+IMPORT_TIME_TARGET = os.getenv("AERICH_IMPORT_TIME_TARGET")
+HEAVY_MODULES = ("tortoise", "pydantic", "dictdiffer", "aerich.command", "aerich.inspectdb")
+
+
+def get_import_times(module: str) -> dict[str, float]:
+    """
+    Import the module in a new interpreter with `-X importtime`
+    :return: {module: cumulative seconds}
+    """
+    r = subprocess.run(  # nosec
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in r.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative) / 1_000_000
+    return times
+
+
+def test_cli_imports() -> None:
+    times = get_import_times("aerich.cli")
+    heavy = [m for m in times if any(m == h or m.startswith(f"{h}.") for h in HEAVY_MODULES)]
+    assert heavy == []
+
+
+@pytest.mark.skipif(not IMPORT_TIME_TARGET, reason="AERICH_IMPORT_TIME_TARGET is not set")
+def test_cli_import_time() -> None:
+    # Take the best of several runs, the first one may be slowed down by a cold disk cache
+    best = min(get_import_times("aerich.cli")["aerich.cli"] for _ in range(3))
+    assert best < float(IMPORT_TIME_TARGET or 0), f"import aerich.cli: {best:.3f}s"
+
+
+def test_inspectdb_imports() -> None:
+    # The records of inspectdb are plain dataclasses, the inspectors import tortoise only for
+    # the type hints
+    times = get_import_times("aerich.inspectdb")
+    assert [m for m in times if m.split(".")[0] in ("pydantic", "tortoise")] == []
@@ -935,7 +935,7 @@ old_models_describe = {
 }
 
 
-def test_migrate(mocker: MockerFixture):
+def test_migrate(mocker: MockerFixture, migrate: Migrate):
     """
     models.py diff with old_models.py
     - change email pk: id -> email_id
@@ -965,19 +965,18 @@ def test_migrate(mocker: MockerFixture):
     mocker.patch("asyncclick.prompt", side_effect=(True, True, True, True))
 
     models_describe = get_models_describe("models")
-    Migrate.app = "models"
-    if isinstance(Migrate.ddl, SqliteDDL):
+    if isinstance(migrate.ddl, SqliteDDL):
         with pytest.raises(NotSupportError):
-            Migrate.diff_models(old_models_describe, models_describe)
-        Migrate.upgrade_operators.clear()
+            migrate.diff_models(old_models_describe, models_describe)
+        migrate.upgrade_operators.clear()
         with pytest.raises(NotSupportError):
-            Migrate.diff_models(models_describe, old_models_describe, False)
-        Migrate.downgrade_operators.clear()
+            migrate.diff_models(models_describe, old_models_describe, False)
+        migrate.downgrade_operators.clear()
     else:
-        Migrate.diff_models(old_models_describe, models_describe)
-        Migrate.diff_models(models_describe, old_models_describe, False)
-        Migrate._merge_operators()
-    if isinstance(Migrate.ddl, MysqlDDL):
+        migrate.diff_models(old_models_describe, models_describe)
+        migrate.diff_models(models_describe, old_models_describe, False)
+        migrate._merge_operators()
+    if isinstance(migrate.ddl, MysqlDDL):
         expected_upgrade_operators = {
             "ALTER TABLE `category` MODIFY COLUMN `name` VARCHAR(200)",
             "ALTER TABLE `category` MODIFY COLUMN `slug` VARCHAR(100) NOT NULL",
@@ -1022,7 +1021,7 @@ def test_migrate(mocker: MockerFixture):
             "DROP TABLE IF EXISTS `config_category`",
             "ALTER TABLE `config` MODIFY COLUMN `slug` VARCHAR(20) NOT NULL",
         }
-        upgrade_operators = set(Migrate.upgrade_operators)
+        upgrade_operators = set(migrate.upgrade_operators)
         upgrade_more_than_expected = upgrade_operators - expected_upgrade_operators
         assert not upgrade_more_than_expected
         upgrade_less_than_expected = expected_upgrade_operators - upgrade_operators
@@ -1072,13 +1071,13 @@ def test_migrate(mocker: MockerFixture):
             "CREATE TABLE `config_category` (\n    `config_id` VARCHAR(20) NOT NULL REFERENCES `config` (`slug`) ON DELETE CASCADE,\n    `category_id` INT NOT NULL REFERENCES `category` (`id`) ON DELETE CASCADE\n) CHARACTER SET utf8mb4",
             "DROP TABLE IF EXISTS `config_category_map`",
         }
-        downgrade_operators = set(Migrate.downgrade_operators)
+        downgrade_operators = set(migrate.downgrade_operators)
         downgrade_more_than_expected = downgrade_operators - expected_downgrade_operators
         assert not downgrade_more_than_expected
         downgrade_less_than_expected = expected_downgrade_operators - downgrade_operators
         assert not downgrade_less_than_expected
 
-    elif isinstance(Migrate.ddl, PostgresDDL):
+    elif isinstance(migrate.ddl, PostgresDDL):
         expected_upgrade_operators = {
             'DROP INDEX IF EXISTS "uid_category_title_f7fc03"',
             'ALTER TABLE "category" ALTER COLUMN "name" DROP NOT NULL',
@@ -1124,7 +1123,7 @@ def test_migrate(mocker: MockerFixture):
             'CREATE TABLE "config_category_map" (\n    "category_id" INT NOT NULL REFERENCES "category" ("id") ON DELETE CASCADE,\n    "config_id" VARCHAR(20) NOT NULL REFERENCES "config" ("slug") ON DELETE CASCADE\n)',
             'DROP TABLE IF EXISTS "config_category"',
         }
-        upgrade_operators = set(Migrate.upgrade_operators)
+        upgrade_operators = set(migrate.upgrade_operators)
         upgrade_more_than_expected = upgrade_operators - expected_upgrade_operators
         assert not upgrade_more_than_expected
         upgrade_less_than_expected = expected_upgrade_operators - upgrade_operators
@@ -1175,15 +1174,15 @@ def test_migrate(mocker: MockerFixture):
             'CREATE TABLE "config_category" (\n    "config_id" VARCHAR(20) NOT NULL REFERENCES "config" ("slug") ON DELETE CASCADE,\n    "category_id" INT NOT NULL REFERENCES "category" ("id") ON DELETE CASCADE\n)',
             'DROP TABLE IF EXISTS "config_category_map"',
         }
-        downgrade_operators = set(Migrate.downgrade_operators)
+        downgrade_operators = set(migrate.downgrade_operators)
         downgrade_more_than_expected = downgrade_operators - expected_downgrade_operators
         assert not downgrade_more_than_expected
         downgrade_less_than_expected = expected_downgrade_operators - downgrade_operators
         assert not downgrade_less_than_expected
 
-    elif isinstance(Migrate.ddl, SqliteDDL):
-        assert Migrate.upgrade_operators == []
-        assert Migrate.downgrade_operators == []
+    elif isinstance(migrate.ddl, SqliteDDL):
+        assert migrate.upgrade_operators == []
+        assert migrate.downgrade_operators == []
 
 
 def test_sort_all_version_files(mocker):
@@ -1197,9 +1196,9 @@ def test_sort_all_version_files(mocker):
         ],
     )
 
-    Migrate.migrate_location = "."
+    migrate = Migrate(location=".")
 
-    assert Migrate.get_all_version_files() == [
+    assert migrate.get_all_version_files() == [
         "1_datetime_update.py",
         "2_datetime_update.py",
         "10_datetime_update.py",
@@ -1221,9 +1220,9 @@ def test_sort_files_containing_non_migrations(mocker):
         ],
     )
 
-    Migrate.migrate_location = "."
+    migrate = Migrate(location=".")
 
-    assert Migrate.get_all_version_files() == [
+    assert migrate.get_all_version_files() == [
         "1_datetime_update.py",
         "2_datetime_update.py",
         "10_datetime_update.py",
@@ -1233,11 +1232,11 @@ def test_sort_files_containing_non_migrations(mocker):
 
 async def test_empty_migration(mocker, tmp_path: Path) -> None:
     mocker.patch("os.listdir", return_value=[])
-    Migrate.app = "foo"
+    migrate = Migrate("foo")
     expected_content = MIGRATE_TEMPLATE.format(upgrade_sql="", downgrade_sql="")
-    Migrate.migrate_location = tmp_path
+    migrate.migrate_location = tmp_path
 
-    migration_file = await Migrate.migrate("update", True)
+    migration_file = await migrate.migrate("update", True)
 
     f = tmp_path / migration_file
     assert f.read_text() == expected_content
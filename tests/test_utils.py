@@ -1,4 +1,9 @@
-from aerich.utils import get_dict_diff_by_key, import_py_file
+import subprocess  # nosec
+import sys
+
+from tortoise.backends.sqlite import SqliteClient
+
+from aerich.utils import create_connection, get_dict_diff_by_key, import_py_file, split_sql
 
 
 def test_import_py_file() -> None:
@@ -6,6 +11,23 @@ def test_import_py_file() -> None:
     assert getattr(m, "import_py_file", None)
 
 
+def test_tortoise_0_24_1_patch() -> None:
+    # Only import aerich.migrate in a new interpreter, aerich.command must not be needed
+    code = """
+import sys
+import tortoise
+tortoise.__version__ = "0.24.1"
+import aerich.migrate
+from tortoise.backends.base.schema_generator import BaseSchemaGenerator
+assert "aerich.command" not in sys.modules
+print(BaseSchemaGenerator._get_m2m_tables.__module__)
+"""
+    r = subprocess.run(  # nosec
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert r.stdout.strip() == "aerich.utils"
+
+
 class TestDiffFields:
     def test_the_same_through_order(self) -> None:
         old = [
@@ -162,3 +184,60 @@ class TestDiffFields:
             ("change", [0, "name"], ("admins", "admins_new")),
             ("change", [0, "name"], ("users", "users_new")),
         ]
+
+
+def test_split_sql() -> None:
+    assert split_sql("") == []
+    assert split_sql("SELECT 1") == ["SELECT 1"]
+    assert split_sql(" SELECT 1;;\n SELECT 2; -- done") == ["SELECT 1", "SELECT 2"]
+    assert split_sql("INSERT INTO t VALUES ('a;b', 'it''s;');SELECT \"x;y\" FROM `z;`;") == [
+        "INSERT INTO t VALUES ('a;b', 'it''s;')",
+        'SELECT "x;y" FROM `z;`',
+    ]
+    assert split_sql("/* a; */ SELECT 1; -- b;\nSELECT 2") == [
+        "/* a; */ SELECT 1",
+        "-- b;\nSELECT 2",
+    ]
+
+
+def test_split_sql_with_dialect() -> None:
+    sql = "SELECT $$a;b$$; SELECT $tag$ BEGIN x := 1; END; $tag$; SELECT E'it\\'s;'; SELECT $1"
+    assert split_sql(sql, "postgres") == [
+        "SELECT $$a;b$$",
+        "SELECT $tag$ BEGIN x := 1; END; $tag$",
+        "SELECT E'it\\'s;'",
+        "SELECT $1",
+    ]
+    assert split_sql("INSERT INTO t VALUES ('a\\';b', \"c\\\";d\"); # e;\nSELECT 1", "mysql") == [
+        "INSERT INTO t VALUES ('a\\';b', \"c\\\";d\")",
+        "# e;\nSELECT 1",
+    ]
+    assert split_sql("SELECT [a;b] FROM t; SELECT 1", "sqlite") == [
+        "SELECT [a;b] FROM t",
+        "SELECT 1",
+    ]
+
+
+def test_split_sql_compound_statement() -> None:
+    trigger = (
+        "CREATE TRIGGER tr AFTER INSERT ON foo BEGIN "
+        "UPDATE foo SET x = CASE WHEN 1 THEN 2 ELSE 3 END; DELETE FROM bar; END"
+    )
+    assert split_sql(f"SELECT 1; -- c\n{trigger}; BEGIN; SELECT 2", "sqlite") == [
+        "SELECT 1",
+        f"-- c\n{trigger}",
+        "BEGIN",
+        "SELECT 2",
+    ]
+    procedure = (
+        "CREATE DEFINER=`root`@`%` PROCEDURE p() BEGIN IF 1 THEN SELECT 1; END IF; "
+        "WHILE 0 DO SELECT 2; END WHILE; END"
+    )
+    assert split_sql(f"{procedure};\nSELECT 3;", "mysql") == [procedure, "SELECT 3"]
+
+
+def test_create_connection(tmp_path) -> None:
+    client = create_connection(f"sqlite://{tmp_path / 'shard.sqlite3'}", "default")
+    assert isinstance(client, SqliteClient)
+    assert client.connection_name == "default"
+    assert client.filename == str(tmp_path / "shard.sqlite3")